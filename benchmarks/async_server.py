@@ -0,0 +1,136 @@
+"""
+Benchmarking the throughput of the server when a client straggles, in the asynchronous
+mode and with round deadlines or over-selection, against plain synchronous rounds. The simulated clients have different speeds and
+are connected to the server in-process.
+
+Run from a directory with a configuration file, such as tests/:
+
+    python ../benchmarks/async_server.py
+"""
+import asyncio
+import pickle
+import time
+
+import torch
+
+from plato.clients import simple
+from plato.servers import base as base_server
+from plato.servers import fedavg as fedavg_server
+from plato.utils import serialization, streaming
+
+# The time it takes each client to train, with one straggler
+TRAINING_TIMES = [0.02, 0.02, 0.02, 0.3]
+TOTAL_UPDATES = 24
+
+
+class InnerProductModel(torch.nn.Module):
+    def __init__(self, n):
+        super().__init__()
+        self.layer = torch.nn.Linear(n, 1, bias=False)
+        self.layer.weight.data = torch.zeros(n)
+
+    def forward(self, x):
+        return self.layer(x)
+
+
+class TimedSocketIO:
+    """ Delivers the server's messages to simulated clients, which train for a fixed
+    amount of time and send their models back through the server's event handlers. """
+    def __init__(self, server):
+        self.events = base_server.ServerEvents(namespace='/',
+                                               plato_server=server)
+        self.chunks = {}
+        self.tasks = []
+
+    async def emit(self, event, data=None, room=None, callback=None):
+        if event == 'chunk':
+            self.chunks.setdefault(room, []).append(data['data'])
+            callback()
+        elif event == 'payload_done':
+            self.tasks.append(
+                asyncio.create_task(self.train(room, data['id'])))
+
+    async def train(self, sid, client_id):
+        weights = serialization.loads(bytearray().join(self.chunks.pop(sid)))
+        training_time = TRAINING_TIMES[int(sid) - 1]
+        await asyncio.sleep(training_time)
+
+        # Each client moves the model by one unit
+        weights = {name: weight + 1 for name, weight in weights.items()}
+        report = simple.Report(100, 0.5, training_time, 0)
+
+        await self.events.on_client_report(sid,
+                                           {'report': pickle.dumps(report)})
+
+        async def emit(event, data, callback):
+            await getattr(self.events, 'on_' + event)(sid, data)
+            callback()
+
+        await streaming.send_chunks(emit,
+                                    serialization.dumps(weights),
+                                    chunk_size=64)
+        await self.events.on_client_payload(sid, {'id': client_id})
+        await self.events.on_client_payload_done(sid, {'id': client_id})
+
+
+class BenchmarkServer(fedavg_server.Server):
+    """ A federated averaging server that stops after aggregating a number of updates. """
+    def __init__(self, **options):
+        super().__init__(model=InnerProductModel(10))
+        self.buffer_size = 2
+        self.total_clients = len(TRAINING_TIMES)
+        self.clients_per_round = len(TRAINING_TIMES)
+        for name, value in options.items():
+            setattr(self, name, value)
+        self.aggregated_updates = 0
+        self.done = asyncio.Event()
+        self.load_trainer()
+
+    async def process_reports(self):
+        self.aggregated_updates += len(self.updates)
+        await super().process_reports()
+
+    async def wrap_up(self):
+        if self.aggregated_updates >= TOTAL_UPDATES:
+            self.done.set()
+
+
+async def run_benchmark(**options):
+    """ Returns the number of client updates aggregated per second. """
+    server = BenchmarkServer(**options)
+    server.sio = TimedSocketIO(server)
+
+    started = time.perf_counter()
+    for client_id in range(1, len(TRAINING_TIMES) + 1):
+        await server.sio.events.on_client_alive(str(client_id),
+                                                {'id': client_id})
+    await server.done.wait()
+    elapsed = time.perf_counter() - started
+
+    for task in server.sio.tasks:
+        task.cancel()
+    await asyncio.gather(*server.sio.tasks, return_exceptions=True)
+
+    return server.aggregated_updates / elapsed
+
+
+def main():
+    """ Prints the throughput of the server in each mode. """
+    benchmarks = [('Synchronous', {}),
+                  ('Asynchronous', {
+                      'asynchronous_mode': True
+                  }), ('With a round deadline', {
+                      'round_deadline': 0.1
+                  }),
+                  ('With over-selection', {
+                      'clients_per_round': 3,
+                      'overselection': 0.5
+                  })]
+
+    for name, options in benchmarks:
+        throughput = asyncio.run(run_benchmark(**options))
+        print(f"{name}: {throughput:.1f} updates/s.")
+
+
+if __name__ == '__main__':
+    main()
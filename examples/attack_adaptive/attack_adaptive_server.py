@@ -10,8 +10,6 @@ Comparison to FedAtt, instead of using norm distance, this algorithm uses cosine
 similarity between the client and server parameters. It also applies softmax with
 temperatures.
 """
-from collections import OrderedDict
-
 import torch
 import torch.nn.functional as F
 
@@ -24,36 +22,24 @@ class Server(fedavg.Server):
         """Aggregate weight updates from the clients using attack-adaptive aggregation."""
         weights_received = self.extract_client_updates(updates)
 
-        # Performing attack-adaptive aggregation
-        att_update = {
-            name: self.trainer.zeros(weights.shape)
-            for name, weights in weights_received[0].items()
-        }
-
         # Extracting baseline model weights
-        baseline_weights = self.algorithm.extract_weights()
-
-        # Calculating attention
-        atts = OrderedDict()
-        for name, weight in baseline_weights.items():
-            atts[name] = self.trainer.zeros(len(weights_received))
-            for i, update in enumerate(weights_received):
-                delta = update[name]
-
-                # Calculating the cosine similarity
-                cos = torch.nn.CosineSimilarity(dim=0)
-                atts[name][i] = cos(torch.flatten(weight),
-                                    torch.flatten(delta))
-
-            # scaling factor for the temperature
-            scaling_factor = 10
-            atts[name] = F.softmax(atts[name] * scaling_factor, dim=0)
-
-        for name, weight in baseline_weights.items():
-            att_weight = self.trainer.zeros(weight.shape)
-            for i, update in enumerate(weights_received):
-                delta = update[name]
-                att_weight += delta.mul(atts[name][i])
-            att_update[name] = att_weight
-
-        return att_update
\ No newline at end of file
+        baseline = self.algorithm.flatten_weights(
+            self.algorithm.extract_weights())
+        deltas = self.algorithm.stack_weight_updates(weights_received)
+
+        # Performing attack-adaptive aggregation, with attention computed for
+        # all the clients at once in each layer
+        att_update = torch.empty_like(baseline)
+
+        # scaling factor for the temperature
+        scaling_factor = 10
+
+        for segment in self.algorithm.weights_layout().slices.values():
+            # Calculating the cosine similarity
+            atts = F.cosine_similarity(baseline[segment].unsqueeze(0),
+                                       deltas[:, segment],
+                                       dim=1)
+            atts = F.softmax(atts * scaling_factor, dim=0)
+            att_update[segment] = atts @ deltas[:, segment]
+
+        return self.algorithm.unflatten_weights(att_update)
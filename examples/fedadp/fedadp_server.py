@@ -9,12 +9,12 @@ in IEEE Transactions on Cognitive Communications and Networking (TCCN'21).
 https://ieeexplore.ieee.org/abstract/document/9442814
 """
 
-from plato.servers import fedavg
-
-import logging
-import numpy as np
 import math
 
+import torch
+
+from plato.servers import fedavg
+
 
 class Server(fedavg.Server):
     """A federated learning server using the FedAdp algorithm."""
@@ -42,18 +42,9 @@ class Server(fedavg.Server):
         # Extract weights udpates from the client updates
         weights_received = self.extract_client_updates(updates)
         
-        # Perform weighted averaging
-        avg_update = {
-            name: self.trainer.zeros(weights.shape)
-            for name, weights in weights_received[0].items()
-        }
-        
-        # Use adaptive weighted average  
-        for i, update in enumerate(weights_received):
-            for name, delta in update.items():
-                avg_update[name] += delta * self.adaptive_weighting[i]
-
-        return avg_update
+        # Use adaptive weighted average
+        return self.algorithm.aggregate_weight_updates(weights_received,
+                                                       self.adaptive_weighting)
 
     def calc_adaptive_weighting(self, updates, num_samples):
         """Compute the weights for model aggregation considering both node contribution and data size.""" 
@@ -72,22 +63,21 @@ class Server(fedavg.Server):
     
     def calc_contribution(self, updates):
         """Calculate the node contribution based on the angle between local gradient and global gradient."""
-        correlations, contribs = [None] * len(updates), [None] * len(updates)
+        contribs = [None] * len(updates)
         
         # Update the baseline model weights
-        curr_global_grads = self.process_grad(self.algorithm.extract_weights())
+        curr_global_grads = self.algorithm.flatten_weights(self.algorithm.extract_weights())
         if self.last_global_grads is None:
-            self.last_global_grads = np.zeros(len(curr_global_grads))
-        global_grads = np.subtract(curr_global_grads, self.last_global_grads)
+            self.last_global_grads = torch.zeros_like(curr_global_grads)
+        global_grads = curr_global_grads - self.last_global_grads
         self.last_global_grads = curr_global_grads
 
-        # Compute angles in radian between local and global gradients
-        for i, update in enumerate(updates):
-            local_grads = self.process_grad(update)
-            inner = np.inner(global_grads, local_grads)
-            norms = np.linalg.norm(global_grads) * np.linalg.norm(local_grads)
-            correlations[i] = np.arccos(np.clip(inner / norms, -1.0, 1.0))
-        
+        # Compute angles in radian between local and global gradients, for all clients at once
+        local_grads = self.algorithm.stack_weight_updates(updates)
+        inner = local_grads @ global_grads
+        norms = torch.linalg.norm(global_grads) * torch.linalg.norm(local_grads, dim=1)
+        correlations = torch.arccos(torch.clamp(inner / norms, -1.0, 1.0)).tolist()
+
         for i, correlation in enumerate(correlations):
             client_id = self.selected_clients[i]
             # Update the smoothed angle for all clients
@@ -98,14 +88,3 @@ class Server(fedavg.Server):
             contribs[i] = self.alpha * (1 - math.exp(-math.exp(-self.alpha * (self.local_correlations[client_id] - 1))))
             
         return contribs
-    
-    @staticmethod
-    def process_grad(grads):
-        """Convert gradients to a flattened 1-D array."""
-        grads = list(dict(sorted(grads.items(), key=lambda x: x[0].lower())).values())
-        
-        flattened = grads[0]
-        for i in range(1, len(grads)):
-            flattened = np.append(flattened, grads[i]) 
-        
-        return flattened
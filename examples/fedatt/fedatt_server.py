@@ -8,8 +8,6 @@ in the Proceedings of the 2019 International Joint Conference on Neural Networks
 
 https://arxiv.org/pdf/1812.07108.pdf
 """
-from collections import OrderedDict
-
 from plato.servers import fedavg
 
 import torch
@@ -23,7 +21,7 @@ class Server(fedavg.Server):
         self.epsilon = 1.0
         self.dp = 0.001
 
-    async def federated_averaging(self, updates):  
+    async def federated_averaging(self, updates):
         """Aggregate weight updates from the clients using FedAtt."""
         # Extract weights from the updates
         weights_received = self.extract_client_updates(updates)
@@ -42,27 +40,16 @@ class Server(fedavg.Server):
             epsilon: step size for aggregation
             dp: magnitude of normal noise in the randomization mechanism
         """
-        att_update = {
-            name: self.trainer.zeros(weights.shape)
-            for name, weights in weights_received[0].items()
-        }
-
-        atts = OrderedDict()
-        for name, weight in baseline_weights.items():
-            atts[name] = self.trainer.zeros(len(weights_received))
-            for i, update in enumerate(weights_received):
-                delta = update[name]
-                atts[name][i] = torch.linalg.norm(weight - delta)
-        
-        for name in baseline_weights.keys():
-            atts[name] = F.softmax(atts[name], dim=0)
+        baseline = self.algorithm.flatten_weights(baseline_weights)
+        deltas = self.algorithm.stack_weight_updates(weights_received)
+        att_update = torch.empty_like(baseline)
 
-        for name, weight in baseline_weights.items():
-            att_weight = self.trainer.zeros(weight.shape)
-            for i, update in enumerate(weights_received):
-                delta = update[name]
-                att_weight += torch.mul(weight - delta, atts[name][i])
+        # Attention is computed for all the clients at once in each layer
+        for segment in self.algorithm.weights_layout().slices.values():
+            distances = baseline[segment] - deltas[:, segment]
+            atts = F.softmax(torch.linalg.norm(distances, dim=1), dim=0)
+            att_update[segment] = -torch.mul(atts @ distances, self.epsilon)
 
-            att_update[name] = - torch.mul(att_weight, self.epsilon) + torch.mul(torch.randn(weight.shape), self.dp)
+        att_update += torch.mul(torch.randn(att_update.shape), self.dp)
 
-        return att_update
+        return self.algorithm.unflatten_weights(att_update)
@@ -41,8 +41,8 @@ class Server(fedavg.Server):
 
         return update
 
-    def customize_server_payload(self, payload, selected_client_id):
-        "Add server control variates into the server payload."
+    def customize_client_payload(self, payload, selected_client_id):
+        "Add the helpers of the selected client into the server payload."
         if self.helper_flag == 0:
             return payload
 
@@ -200,10 +200,6 @@ class Trainer(basic.Trainer):
 
         self.model.cpu()
 
-        model_type = config['model_name']
-        filename = f"{model_type}_{self.client_id}_{config['run_id']}.pth"
-        self.save_model(filename)
-
         if 'use_wandb' in config:
             run.finish()
 
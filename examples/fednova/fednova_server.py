@@ -9,8 +9,6 @@ Optimization", in the Proceedings of NeurIPS 2020.
 https://proceedings.neurips.cc/paper/2020/hash/564127c03caab942e503ee6f810f54fd-Abstract.html
 """
 
-from collections import OrderedDict
-
 from plato.servers import fedavg
 
 
@@ -28,26 +26,18 @@ class Server(fedavg.Server):
         # Extracting the number of local epoches, tau_i, from the updates
         local_epochs = [report.epochs for (report, __) in updates]
 
-        # Performing weighted averaging
-        avg_update = {
-            name: self.trainer.zeros(weights.shape)
-            for name, weights in weights_received[0].items()
-        }
-
         tau_eff = 0
-        for i, update in enumerate(weights_received):
-            report, __ = updates[i]
+        for i, (report, __) in enumerate(updates):
             num_samples = report.num_samples
             tau_eff_ = local_epochs[i] * num_samples / self.total_samples
             tau_eff += tau_eff_
 
-        for i, update in enumerate(weights_received):
-            report, __ = updates[i]
-            num_samples = report.num_samples
-
-            for name, delta in update.items():
-                # Use weighted average by the number of samples
-                avg_update[name] += delta * (num_samples / self.total_samples
-                                             ) * tau_eff / local_epochs[i]
+        # Performing weighted averaging by the number of samples, normalized by
+        # the number of local epochs
+        coefficients = [
+            (report.num_samples / self.total_samples) * tau_eff /
+            local_epochs[i] for i, (report, __) in enumerate(updates)
+        ]
 
-        return avg_update
+        return self.algorithm.aggregate_weight_updates(weights_received,
+                                                       coefficients)
@@ -45,6 +45,23 @@ class Algorithm(ABC):
 
         return updates
 
+    def aggregate_weight_updates(self, updates, coefficients):
+        """Compute the weighted sum of weight updates from the clients.
+
+        Arguments:
+        updates: The weight updates from the clients.
+        coefficients: The weight of each client's update in the sum.
+        """
+        aggregated_update = OrderedDict()
+        for update, coefficient in zip(updates, coefficients):
+            for name, delta in update.items():
+                if name in aggregated_update:
+                    aggregated_update[name] += delta * coefficient
+                else:
+                    aggregated_update[name] = delta * coefficient
+
+        return aggregated_update
+
     def update_weights(self, update):
         """ Update the existing model weights. """
         baseline_weights = self.extract_weights()
@@ -1,11 +1,18 @@
 """
 The federated averaging algorithm for PyTorch.
 """
+import torch
+
 from plato.algorithms import base
+from plato.utils import flat_weights
 
 
 class Algorithm(base.Algorithm):
     """PyTorch-based federated averaging algorithm, used by both the client and the server."""
+    def __init__(self, trainer):
+        super().__init__(trainer)
+        self.layout = None
+
     def extract_weights(self):
         """Extract weights from the model."""
         return self.model.cpu().state_dict()
@@ -13,3 +20,103 @@ class Algorithm(base.Algorithm):
     def load_weights(self, weights):
         """Load the model weights passed in as a parameter."""
         self.model.load_state_dict(weights, strict=True)
+
+    def weights_layout(self, weights=None):
+        """Returns the layout of the model weights in a flat vector, which is cached
+        as long as the names and shapes of the weights remain the same."""
+        if weights is None:
+            weights = self.extract_weights()
+
+        if self.layout is None or not self.layout.matches(weights):
+            self.layout = flat_weights.WeightsLayout(weights)
+
+        return self.layout
+
+    def flatten_weights(self, weights):
+        """Copy model weights, or weight updates, into a flat vector."""
+        return self.weights_layout().flatten(weights)
+
+    def unflatten_weights(self, vector):
+        """Returns named model weights, or weight updates, as views into a flat vector."""
+        return self.weights_layout().unflatten(vector)
+
+    def stack_weight_updates(self, updates):
+        """Returns the weight updates from the clients as a [clients, parameters] matrix."""
+        return self.weights_layout().stack(updates)
+
+    def compute_weight_updates(self, weights_received):
+        """Extract the weights received from the clients and compute the updates,
+        which are stored as the rows of a single [clients, parameters] matrix."""
+        baseline_weights = self.extract_weights()
+        layout = self.weights_layout(baseline_weights)
+
+        if not all(layout.matches(weights) for weights in weights_received):
+            return super().compute_weight_updates(weights_received)
+
+        if any(
+                isinstance(weights, flat_weights.CompressedUpdate)
+                for weights in weights_received):
+            # Compressed updates are kept as they are, to be added up during aggregation
+            baseline = layout.flatten(baseline_weights)
+            return [
+                weights
+                if isinstance(weights, flat_weights.CompressedUpdate) else
+                layout.unflatten(layout.flatten(weights) - baseline)
+                for weights in weights_received
+            ]
+
+        deltas = layout.stack(weights_received)
+        deltas -= layout.flatten(baseline_weights)
+
+        return flat_weights.WeightUpdates(deltas, layout)
+
+    def aggregate_weight_updates(self, updates, coefficients):
+        """Compute the weighted sum of weight updates from the clients with a single
+        matrix-vector product."""
+        layout = self.weights_layout()
+
+        if not (isinstance(updates, flat_weights.WeightUpdates)
+                and updates.layout is layout) and not all(
+                    layout.matches(update) for update in updates):
+            return super().aggregate_weight_updates(updates, coefficients)
+
+        if any(
+                isinstance(update, flat_weights.CompressedUpdate)
+                for update in updates):
+            # Compressed updates are added into the sum without densifying each of them:
+            # sparse updates are scattered, and low-rank updates multiplied out together
+            aggregated_update = torch.zeros(layout.size, dtype=layout.dtype)
+            low_rank_updates = []
+            low_rank_coefficients = []
+
+            for update, coefficient in zip(updates, coefficients):
+                if isinstance(update, flat_weights.SparseUpdate):
+                    layout.scatter_add(update, aggregated_update,
+                                       float(coefficient))
+                elif isinstance(update, flat_weights.LowRankUpdate):
+                    low_rank_updates.append(update)
+                    low_rank_coefficients.append(float(coefficient))
+                else:
+                    aggregated_update.add_(layout.flatten(update),
+                                           alpha=float(coefficient))
+
+            layout.add_low_rank(low_rank_updates, low_rank_coefficients,
+                                aggregated_update)
+
+            return layout.unflatten(aggregated_update)
+
+        coefficients = torch.as_tensor(coefficients, dtype=layout.dtype)
+        return layout.unflatten(coefficients @ layout.stack(updates))
+
+    def update_weights(self, update):
+        """ Update the existing model weights. """
+        baseline_weights = self.extract_weights()
+        layout = self.weights_layout(baseline_weights)
+
+        if not layout.matches(update):
+            return super().update_weights(update)
+
+        updated_weights = layout.flatten(baseline_weights)
+        updated_weights += layout.flatten(update)
+
+        return layout.unflatten(updated_weights, cast=True)
@@ -6,7 +6,6 @@ import asyncio
 import logging
 import os
 import pickle
-import sys
 import uuid
 from abc import abstractmethod
 from dataclasses import dataclass
@@ -14,7 +13,7 @@ from dataclasses import dataclass
 import socketio
 
 from plato.config import Config
-from plato.utils import s3
+from plato.utils import codecs, s3, serialization, streaming, weight_deltas
 
 
 @dataclass
@@ -54,7 +53,8 @@ class ClientEvents(socketio.AsyncClientNamespace):
 
     async def on_chunk(self, data):
         """ A chunk of data from the server arrived. """
-        await self.plato_client.chunk_arrived(data['data'])
+        await self.plato_client.chunk_arrived(data['data'], data['offset'],
+                                              data['size'])
 
     async def on_payload(self, data):
         """ A portion of the new payload from the server arrived. """
@@ -62,7 +62,7 @@ class ClientEvents(socketio.AsyncClientNamespace):
 
     async def on_payload_done(self, data):
         """ All of the new payload sent from the server arrived. """
-        await self.plato_client.payload_done(data['id'], data['s3_url'])
+        await self.plato_client.payload_done(data['id'], data.get('s3_url'))
 
 
 class Client:
@@ -70,8 +70,14 @@ class Client:
     def __init__(self) -> None:
         self.client_id = Config().args.id
         self.sio = None
-        self.chunks = []
+        self.chunks = streaming.Reassembler()
         self.server_payload = None
+        self.server_payload_size = 0
+        # The last global model received, against which the server may send a delta
+        self.global_model = None
+        self.global_model_version = None
+        self.model_version = None
+        self.base_version = None
         self.data_loaded = False  # is training data already loaded from the disk?
 
         if hasattr(Config().algorithm,
@@ -133,6 +139,8 @@ class Client:
     async def payload_to_arrive(self, response) -> None:
         """ Upon receiving a response from the server. """
         self.process_server_response(response)
+        self.model_version = response.get('model_version')
+        self.base_version = response.get('base_version')
 
         # Update (virtual) client id for client, trainer and algorithm
         if hasattr(Config().clients,
@@ -145,17 +153,20 @@ class Client:
         if not self.data_loaded:
             self.load_data()
 
-    async def chunk_arrived(self, data) -> None:
+    async def chunk_arrived(self, data, offset, size) -> None:
         """ Upon receiving a chunk of data from the server. """
-        self.chunks.append(data)
+        self.chunks.add(data, offset, size)
 
     async def payload_arrived(self, client_id) -> None:
         """ Upon receiving a portion of the new payload from the server. """
         assert client_id == self.client_id
 
-        payload = b''.join(self.chunks)
-        _data = pickle.loads(payload)
-        self.chunks = []
+        self.add_payload_portion(self.chunks.payload())
+
+    def add_payload_portion(self, payload) -> None:
+        """ Decoding a portion of the new payload from the server. """
+        self.server_payload_size += len(payload)
+        _data = codecs.loads(payload)
 
         if self.server_payload is None:
             self.server_payload = _data
@@ -166,21 +177,16 @@ class Client:
             self.server_payload.append(_data)
 
     async def payload_done(self, client_id, s3_url) -> None:
-        """ Upon receiving all the new payload from the server. """
-        payload_size = 0
-
-        if s3_url is None:
-            if isinstance(self.server_payload, list):
-                for _data in self.server_payload:
-                    payload_size += sys.getsizeof(pickle.dumps(_data))
-            elif isinstance(self.server_payload, dict):
-                for key, value in self.server_payload.items():
-                    payload_size += sys.getsizeof(pickle.dumps({key: value}))
-            else:
-                payload_size = sys.getsizeof(pickle.dumps(self.server_payload))
-        else:
-            self.server_payload = s3.receive_from_s3(s3_url)
-            payload_size = sys.getsizeof(pickle.dumps(self.server_payload))
+        """ Upon receiving all the new payload from the server, or the URLs of its
+        portions in the object store. """
+        if s3_url is not None:
+            loop = asyncio.get_running_loop()
+            for url in s3_url:
+                payload = await loop.run_in_executor(None,
+                                                     s3.get().receive, url)
+                self.add_payload_portion(payload)
+
+        payload_size = self.server_payload_size
 
         assert client_id == self.client_id
 
@@ -188,8 +194,19 @@ class Client:
             "[Client #%d] Received %s MB of payload data from the server.",
             client_id, round(payload_size / 1024**2, 2))
 
+        if self.base_version is not None:
+            # The server sent the global model as a delta against the last one received
+            assert self.base_version == self.global_model_version
+            self.server_payload = weight_deltas.decode(self.server_payload,
+                                                       self.global_model)
+
+        if self.model_version is not None:
+            self.global_model = self.server_payload
+            self.global_model_version = self.model_version
+
         self.load_payload(self.server_payload)
         self.server_payload = None
+        self.server_payload_size = 0
 
         report, payload = await self.train()
 
@@ -207,36 +224,53 @@ class Client:
         await self.send(payload)
 
     async def send_in_chunks(self, data) -> None:
-        """ Sending a bytes object in fixed-sized chunks to the client. """
-        step = 1024 ^ 2
-        chunks = [data[i:i + step] for i in range(0, len(data), step)]
-
-        for chunk in chunks:
-            await self.sio.emit('chunk', {'data': chunk})
+        """ Sending an encoded payload in fixed-sized chunks to the server. """
+        chunk_size = Config().server.chunk_size if hasattr(
+            Config().server, 'chunk_size') else streaming.CHUNK_SIZE
+        window = Config().server.chunk_window if hasattr(
+            Config().server, 'chunk_window') else streaming.WINDOW
+        timeout = Config().server.ping_timeout if hasattr(
+            Config().server, 'ping_timeout') else 360
+
+        await streaming.send_chunks(self.sio.emit,
+                                    data,
+                                    chunk_size=chunk_size,
+                                    window=window,
+                                    timeout=timeout)
 
         await self.sio.emit('client_payload', {'id': self.client_id})
 
     async def send(self, payload) -> None:
         """Sending the client payload to the server using either S3 or socket.io."""
-        if hasattr(Config().server,
-                   's3_endpoint_url') and hasattr(Config().server, 's3_bucket'):
+        store = s3.get()
+
+        if store is not None:
+            # Each portion of the payload is uploaded as an object
             unique_key = uuid.uuid4().hex[:6].upper()
-            payload_key = f'client_payload_{self.client_id}_{unique_key}'
-            s3_url = s3.send_to_s3(payload_key, payload)
-            data_size = sys.getsizeof(pickle.dumps(payload))
+            loop = asyncio.get_running_loop()
+            s3_url = []
+            data_size = 0
+
+            for i, data in enumerate(
+                    payload if isinstance(payload, list) else [payload]):
+                _data = codecs.dumps(data)
+                payload_key = f'client_payload_{self.client_id}_{unique_key}_{i}'
+                s3_url.append(await loop.run_in_executor(
+                    None, store.send, payload_key, _data))
+                data_size += serialization.nbytes(_data)
         else:
             s3_url = None
             if isinstance(payload, list):
                 data_size: int = 0
 
                 for data in payload:
-                    _data = pickle.dumps(data)
+                    _data = codecs.dumps(data)
                     await self.send_in_chunks(_data)
-                    data_size += sys.getsizeof(_data)
+                    data_size += serialization.nbytes(_data)
             else:
-                _data = pickle.dumps(payload)
+                _data = codecs.dumps(payload)
                 await self.send_in_chunks(_data)
-                data_size = sys.getsizeof(_data)
+                data_size = serialization.nbytes(_data)
 
         await self.sio.emit('client_payload_done', {'id': self.client_id, 's3_url': s3_url})
 
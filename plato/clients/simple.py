@@ -2,6 +2,7 @@
 A basic federated learning client who sends weight updates to the server.
 """
 
+import asyncio
 import logging
 import time
 from dataclasses import dataclass
@@ -11,6 +12,7 @@ from plato.config import Config
 from plato.datasources import registry as datasources_registry
 from plato.samplers import registry as samplers_registry
 from plato.trainers import registry as trainers_registry
+from plato.utils import update_compression
 
 from plato.clients import base
 
@@ -37,6 +39,9 @@ class Client(base.Client):
         self.trainset = None  # Training dataset
         self.testset = None  # Testing dataset
         self.sampler = None
+        # The model weights received from the server, from which the update is computed
+        # if updates are compressed
+        self.baseline_weights = None
 
         self.data_loading_time = None
         self.data_loading_time_sent = False
@@ -88,26 +93,54 @@ class Client(base.Client):
         """Loading the server model onto this client."""
         self.algorithm.load_weights(server_payload)
 
+        if update_compression.get() is not None:
+            self.baseline_weights = server_payload
+
+    async def disconnect(self):
+        """Disconnect from the server after training or testing failed. Virtual clients
+        have no connection; their failures are raised to the server simulating them."""
+        if self.sio is not None:
+            await self.sio.disconnect()
+
     async def train(self):
-        """The machine learning training workload on a client."""
+        """The machine learning training workload on a client.
+
+        Training, compression and testing run in a separate thread, so that the event
+        loop keeps answering the pings from the server meanwhile.
+        """
         logging.info("[Client #%d] Started training.", self.client_id)
+        loop = asyncio.get_running_loop()
 
         # Perform model training
         try:
-            training_time = self.trainer.train(self.trainset, self.sampler)
+            training_time = await loop.run_in_executor(None,
+                                                       self.trainer.train,
+                                                       self.trainset,
+                                                       self.sampler)
         except ValueError:
-            await self.sio.disconnect()
+            await self.disconnect()
+            raise
 
         # Extract model weights and biases
         weights = self.algorithm.extract_weights()
 
+        compressor = update_compression.get()
+        if compressor is not None:
+            # Sending the compressed update instead of the weights
+            weights = await loop.run_in_executor(None, compressor.compress,
+                                                 self.client_id, weights,
+                                                 self.baseline_weights)
+
         # Generate a report for the server, performing model testing if applicable
         if Config().clients.do_test:
-            accuracy = self.trainer.test(self.testset)
+            accuracy = await loop.run_in_executor(None, self.trainer.test,
+                                                  self.testset)
 
             if accuracy == 0:
                 # The testing process failed, disconnect from the server
-                await self.sio.disconnect()
+                await self.disconnect()
+                raise ValueError(
+                    f"Testing on client #{self.client_id} failed.")
 
             logging.info("[Client #{:d}] Test accuracy: {:.2f}%".format(
                 self.client_id, 100 * accuracy))
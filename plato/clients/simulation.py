@@ -0,0 +1,93 @@
+"""
+Simulating virtual clients within the server process.
+
+Rather than launching client processes that connect to the server with socket.io, a
+pool of client objects runs the workloads of all the virtual clients selected by the
+server, either one after another or on a pool of threads. The client objects share one
+copy of the datasource, each client object has one copy of the model, and the server
+and clients exchange payloads by reference, without encoding them.
+"""
+
+import asyncio
+import copy
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from plato.clients import registry as client_registry
+from plato.samplers import registry as samplers_registry
+
+
+class ClientPool:
+    """A pool of client objects, each of which simulates one virtual client at a time."""
+    def __init__(self, client=None, workers=1):
+        self.workers = workers
+        self.idle_clients = asyncio.Queue()
+        self.datasource = None
+
+        for __ in range(workers):
+            if client is None:
+                pool_client = client_registry.get()
+            else:
+                pool_client = copy.deepcopy(client)
+
+            self.idle_clients.put_nowait(pool_client)
+
+        # Virtual clients are trained in the event loop of the server if there is only
+        # one client object, and on a pool of threads otherwise
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers) if workers > 1 else None
+
+        # The tasks running virtual clients, referenced until they are done
+        self.tasks = set()
+
+        logging.info("[Server #%d] Simulating clients with %d client object(s).",
+                     os.getpid(), workers)
+
+    def schedule(self, coroutine):
+        """Schedule a coroutine running a virtual client."""
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def prepare(self, client, client_id):
+        """Set up a client object to run the workload of a virtual client."""
+        client.client_id = client_id
+        client.configure()
+
+        if not client.data_loaded:
+            # All the client objects share the datasource loaded by the first one
+            if self.datasource is not None and hasattr(client, 'datasource'):
+                client.datasource = self.datasource
+
+            client.load_data()
+
+            if self.datasource is None:
+                self.datasource = getattr(client, 'datasource', None)
+
+        elif getattr(client, 'sampler', None) is not None:
+            # Each virtual client trains on its own partition of the datasource
+            client.sampler = samplers_registry.get(client.datasource,
+                                                   client_id)
+
+    async def train(self, server_response, payload):
+        """Run the workload of a virtual client on the next idle client object, and
+        return its report and payload."""
+        client = await self.idle_clients.get()
+
+        try:
+            client.process_server_response(server_response)
+            self.prepare(client, server_response['id'])
+            client.load_payload(payload)
+
+            if self.executor is None:
+                report, client_payload = await client.train()
+            else:
+                report, client_payload = await asyncio.get_running_loop(
+                ).run_in_executor(self.executor, asyncio.run, client.train())
+
+            # The client object trains the next virtual client on the same model
+            return report, copy.deepcopy(client_payload)
+
+        finally:
+            self.idle_clients.put_nowait(client)
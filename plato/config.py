@@ -6,7 +6,6 @@ import argparse
 import logging
 import os
 import random
-import sqlite3
 from collections import OrderedDict, namedtuple
 
 import yaml
@@ -107,12 +106,6 @@ class Config:
                     server_type = Config.algorithm.type
                     Config.result_dir = f'./results/{datasource}/{model}/{server_type}/'
 
-            if hasattr(Config().trainer, 'max_concurrency'):
-                # Using a temporary SQLite database to limit the maximum number of concurrent
-                # trainers
-                Config.sql_connection = sqlite3.connect("/tmp/running_trainers.sqlitedb")
-                Config().cursor = Config.sql_connection.cursor()
-
             # Customizable dictionary of global parameters
             Config.params: dict = {}
 
@@ -20,6 +20,11 @@ class DataSource(base.DataSource):
             transforms.ToTensor(),
             transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
         ])
+        # The test set is not augmented, so that the same model is always tested alike
+        _test_transform = transforms.Compose([
+            transforms.ToTensor(),
+            transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
+        ])
         self.trainset = datasets.CIFAR10(root=_path,
                                          train=True,
                                          download=True,
@@ -27,7 +32,7 @@ class DataSource(base.DataSource):
         self.testset = datasets.CIFAR10(root=_path,
                                         train=False,
                                         download=True,
-                                        transform=_transform)
+                                        transform=_test_transform)
 
     def num_train_examples(self):
         return 50000
@@ -53,9 +53,26 @@ def get():
     if Config().data.datasource == 'YOLO':
         from plato.datasources import yolo
         return yolo.DataSource()
+    elif datasource_name in registered_datasources and hasattr(
+            Config().data, 'shared') and Config().data.shared:
+        from plato.datasources import shared
+        dataset = shared.DataSource(
+            registered_datasources[datasource_name].DataSource)
     elif datasource_name in registered_datasources:
         dataset = registered_datasources[datasource_name].DataSource()
     else:
         raise ValueError('No such data source: {}'.format(datasource_name))
 
+    if hasattr(Config().trainer, 'max_concurrency') and not hasattr(
+            Config().trainer, 'use_mindspore') and not hasattr(
+                Config().trainer, 'use_tensorflow'):
+        # The worker processes keep a single copy of the datasets for all the clients
+        from plato.datasources import shared
+        from plato.trainers import worker
+
+        key = datasource_name + '-' + shared.fingerprint(
+            registered_datasources[datasource_name])
+        worker.set_dataset_key(dataset.get_train_set(), key + '-train')
+        worker.set_dataset_key(dataset.get_test_set(), key + '-test')
+
     return dataset
@@ -0,0 +1,303 @@
+"""
+A data source whose decoded examples are shared by all the processes on a machine.
+
+The first process that loads the data source, typically the server, decodes all the
+examples of the underlying data source once, and writes them into array files along
+with their targets, classes and transforms. All the other processes then map these
+files read-only, so that the operating system keeps a single copy of the decoded
+dataset in memory, no matter how many clients are running on the machine. The
+transforms, including random augmentation, are still applied to each example as it is
+loaded, unless they can all be applied to a whole batch of images at once: flips,
+crops, conversion to tensors and normalization are then run as vectorized operations
+on each batch, without going through PIL.
+
+The array files are written to a directory under data_path by default, which can be
+changed with shared_path, such as to a directory under /dev/shm. Its name includes a
+hash of the code of the data source, which defines its transforms, and of the data
+configuration, so that the array files are written anew when either changes.
+"""
+import fcntl
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+from torchvision import transforms
+
+from plato.config import Config
+from plato.datasources import base
+
+
+def fingerprint(datasource) -> str:
+    """Returns a hash of the code of a data source class and of the data configuration,
+    apart from where the data source is shared."""
+    parameters = {
+        name: value
+        for name, value in Config().data._asdict().items()
+        if name not in ('shared', 'shared_path')
+    }
+    digest = hashlib.sha256(
+        inspect.getsource(inspect.getmodule(datasource)).encode())
+    digest.update(repr(sorted(parameters.items())).encode())
+    return digest.hexdigest()[:16]
+
+
+class BatchTransform:
+    """A composition of torchvision transforms applied to a batch of uint8 images in
+    the [batch, channels, height, width] layout, drawing the random augmentation of
+    each image independently."""
+    def __init__(self, steps):
+        self.steps = steps
+
+    @staticmethod
+    def from_transform(transform):
+        """Returns the batched equivalent of a transform, or None if some of its steps
+        can only be applied to each image separately."""
+        if transform is None:
+            return None
+
+        steps = []
+        for step in (transform.transforms if isinstance(
+                transform, transforms.Compose) else [transform]):
+            if isinstance(step, transforms.RandomHorizontalFlip):
+                steps.append(('flip', step.p))
+            elif isinstance(
+                    step, transforms.RandomCrop
+            ) and step.padding_mode == 'constant' and not step.pad_if_needed and isinstance(
+                    step.fill, (int, float)):
+                padding = step.padding or 0
+                if isinstance(padding, int):
+                    padding = [padding] * 4
+                elif len(padding) == 2:
+                    padding = [padding[0], padding[0], padding[1], padding[1]]
+                elif len(padding) == 4:
+                    padding = [padding[0], padding[2], padding[1], padding[3]]
+                else:
+                    return None
+                steps.append(('crop', tuple(step.size), padding, step.fill))
+            elif isinstance(step, transforms.CenterCrop):
+                steps.append(('center_crop', tuple(step.size)))
+            elif isinstance(step, transforms.ToTensor):
+                steps.append(('to_tensor', ))
+            elif isinstance(step, transforms.Normalize) and not step.inplace:
+                steps.append(('normalize', torch.as_tensor(step.mean),
+                              torch.as_tensor(step.std)))
+            else:
+                return None
+
+        return BatchTransform(steps)
+
+    @staticmethod
+    def crop(batch, top, left, size):
+        """Crops each image of a batch at its own offsets."""
+        height, width = size
+        rows = (top.view(-1, 1) + torch.arange(height)).view(-1, 1, height, 1)
+        columns = (left.view(-1, 1) + torch.arange(width)).view(-1, 1, 1, width)
+        images = torch.arange(batch.shape[0]).view(-1, 1, 1, 1)
+        channels = torch.arange(batch.shape[1]).view(1, -1, 1, 1)
+        return batch[images, channels, rows, columns]
+
+    def __call__(self, batch):
+        for step in self.steps:
+            if step[0] == 'flip':
+                flipped = torch.rand(batch.shape[0]) < step[1]
+                batch[flipped] = batch[flipped].flip(-1)
+            elif step[0] == 'crop':
+                (height, width), padding, fill = step[1:]
+                if any(padding):
+                    batch = F.pad(batch, padding, value=fill)
+                top = torch.randint(0, batch.shape[2] - height + 1,
+                                    (batch.shape[0], ))
+                left = torch.randint(0, batch.shape[3] - width + 1,
+                                     (batch.shape[0], ))
+                batch = self.crop(batch, top, left, (height, width))
+            elif step[0] == 'center_crop':
+                height, width = step[1]
+                top = int(round((batch.shape[2] - height) / 2.0))
+                left = int(round((batch.shape[3] - width) / 2.0))
+                batch = batch[:, :, top:top + height, left:left + width]
+            elif step[0] == 'to_tensor':
+                batch = batch.float().div_(255)
+            elif step[0] == 'normalize':
+                mean, std = step[1].view(1, -1, 1, 1), step[2].view(1, -1, 1, 1)
+                batch = (batch - mean) / std
+
+        return batch
+
+
+class SharedDataset(torch.utils.data.Dataset):
+    """A dataset whose examples are read from a memory-mapped array file."""
+    def __init__(self,
+                 path,
+                 classes,
+                 images,
+                 transform=None,
+                 target_transform=None):
+        self.path = path
+        self.classes = classes
+        self.images = images
+        self.transform = transform
+        self.target_transform = target_transform
+        self.targets = np.load(path + '_targets.npy')
+        self.batch_transform = BatchTransform.from_transform(
+            transform) if images else None
+
+        # The examples are mapped lazily, so that they are mapped again rather than
+        # copied when the dataset is sent to another process
+        self.examples = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['examples'] = None
+        return state
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __getitem__(self, index):
+        if self.examples is None:
+            self.examples = np.load(self.path + '.npy', mmap_mode='r')
+
+        if self.images:
+            example = Image.fromarray(np.array(self.examples[index]))
+        else:
+            example = torch.from_numpy(np.array(self.examples[index]))
+
+        target = int(self.targets[index])
+
+        if self.transform is not None:
+            example = self.transform(example)
+
+        if self.target_transform is not None:
+            target = self.target_transform(target)
+
+        return example, target
+
+    def __getitems__(self, indices):
+        """Returns the examples at a batch of indices, transformed together if the
+        transforms can be applied to the whole batch."""
+        if self.batch_transform is None:
+            return [self[index] for index in indices]
+
+        if self.examples is None:
+            self.examples = np.load(self.path + '.npy', mmap_mode='r')
+
+        indices = np.asarray(indices)
+        batch = torch.from_numpy(self.examples[indices])
+        # Images are stored as [height, width] or [height, width, channels]
+        batch = batch.unsqueeze(1) if batch.dim() == 3 else batch.permute(
+            0, 3, 1, 2)
+        batch = self.batch_transform(batch.contiguous())
+
+        targets = [int(target) for target in self.targets[indices]]
+        if self.target_transform is not None:
+            targets = [self.target_transform(target) for target in targets]
+
+        return list(zip(batch.unbind(0), targets))
+
+
+class DataSource(base.DataSource):
+    """A data source whose decoded examples are shared by all the processes."""
+    def __init__(self, datasource):
+        super().__init__()
+        path = Config().data.shared_path if hasattr(
+            Config().data, 'shared_path') else os.path.join(
+                Config().data.data_path, 'shared')
+        path = os.path.join(path, Config().data.datasource,
+                            fingerprint(datasource))
+        metadata_file = os.path.join(path, 'metadata.pkl')
+
+        if not os.path.exists(metadata_file):
+            os.makedirs(path, exist_ok=True)
+
+            # Only one process decodes the data source, while the others wait for it
+            with open(os.path.join(path, '.lock'), 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+                if not os.path.exists(metadata_file):
+                    DataSource.materialize(datasource(), path)
+
+        with open(metadata_file, 'rb') as metadata:
+            splits = pickle.load(metadata)
+
+        if splits['train'] is not None:
+            self.trainset = SharedDataset(os.path.join(path, 'train'),
+                                          **splits['train'])
+        if splits['test'] is not None:
+            self.testset = SharedDataset(os.path.join(path, 'test'),
+                                         **splits['test'])
+
+    @staticmethod
+    def materialize(datasource, path):
+        """Decodes all the examples of a data source into array files in a directory.
+        The metadata file is written last, so that it only exists once all the array
+        files are complete."""
+        logging.info("[%d] Writing the decoded data source to %s.", os.getpid(),
+                     path)
+        splits = {}
+
+        for split, dataset in [('train', datasource.get_train_set()),
+                               ('test', datasource.get_test_set())]:
+            if dataset is None:
+                splits[split] = None
+                continue
+
+            # The examples are stored before they are transformed
+            transform = getattr(dataset, 'transform', None)
+            target_transform = getattr(dataset, 'target_transform', None)
+            dataset.transform = None
+            dataset.target_transform = None
+
+            first_example, __ = dataset[0]
+            images = isinstance(first_example, Image.Image)
+            first_example = np.asarray(first_example)
+
+            examples_file = os.path.join(path, split + '.tmp.npy')
+            examples = np.lib.format.open_memmap(examples_file,
+                                                 mode='w+',
+                                                 dtype=first_example.dtype,
+                                                 shape=(len(dataset), ) +
+                                                 first_example.shape)
+            targets = np.empty(len(dataset), dtype=np.int64)
+
+            for index in range(len(dataset)):
+                example, target = dataset[index]
+                example = np.asarray(example)
+
+                if example.shape != first_example.shape:
+                    raise ValueError(
+                        'The examples in the data source cannot be shared, as '
+                        'they do not have the same shape.')
+
+                examples[index] = example
+                targets[index] = int(target)
+
+            examples.flush()
+            del examples
+
+            dataset.transform = transform
+            dataset.target_transform = target_transform
+
+            targets_file = os.path.join(path, split + '_targets.tmp.npy')
+            np.save(targets_file, targets)
+
+            os.replace(examples_file, os.path.join(path, split + '.npy'))
+            os.replace(targets_file, os.path.join(path,
+                                                  split + '_targets.npy'))
+
+            splits[split] = {
+                'classes': list(getattr(dataset, 'classes', [])),
+                'images': images,
+                'transform': transform,
+                'target_transform': target_transform
+            }
+
+        metadata_file = os.path.join(path, 'metadata.tmp.pkl')
+        with open(metadata_file, 'wb') as metadata:
+            pickle.dump(splits, metadata)
+        os.replace(metadata_file, os.path.join(path, 'metadata.pkl'))
@@ -36,10 +36,17 @@ class DataSource(base.DataSource):
             transforms.ToTensor(),
             transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
         ])
+        # The test set is not augmented, so that the same model is always tested alike
+        _test_transform = transforms.Compose([
+            transforms.Resize(299),
+            transforms.CenterCrop(299),
+            transforms.ToTensor(),
+            transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
+        ])
         self.trainset = datasets.ImageFolder(root=os.path.join(_path, 'train'),
                                              transform=_transform)
         self.testset = datasets.ImageFolder(root=os.path.join(_path, 'test'),
-                                            transform=_transform)
+                                            transform=_test_transform)
 
     def num_train_examples(self):
         return 100000
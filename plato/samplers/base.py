@@ -1,10 +1,12 @@
 """
 Base class for sampling data so that a dataset can be divided across the clients.
 """
+import hashlib
 import os
 from abc import abstractmethod
 
 from plato.config import Config
+from plato.samplers import partition_index
 
 
 class Sampler:
@@ -27,3 +29,37 @@ class Sampler:
     @abstractmethod
     def trainset_size(self):
         """Returns the length of the dataset after sampling. """
+
+    def partition(self, datasource, client_id):
+        """Returns the indices of the examples in the partition of a client. """
+        raise NotImplementedError
+
+    def partitions(self, datasource):
+        """Returns the partitions of all the clients. """
+        return [
+            self.partition(datasource, client_id)
+            for client_id in range(1, Config().clients.total_clients + 1)
+        ]
+
+    def load_partition(self, datasource, client_id):
+        """Returns the indices of the examples in the partition of a client, looked up
+        in the partition index of the dataset, which is built on first use. """
+        if not hasattr(Config().data, 'random_seed'):
+            # Without a fixed random seed, each process partitions the dataset its own way
+            return self.partition(datasource, client_id)
+
+        # The partitions depend on the sampler, the data configuration (including the
+        # random seed) and the number of clients
+        key = repr((type(self).__module__, Config().data,
+                    Config().clients.total_clients,
+                    datasource.num_train_examples()))
+        partition_path = Config().data.partition_path if hasattr(
+            Config().data, 'partition_path') else os.path.join(
+                Config().data.data_path, 'partitions')
+        path = os.path.join(
+            partition_path, '{}_{}'.format(
+                Config().data.datasource,
+                hashlib.sha1(key.encode()).hexdigest()[:16]))
+
+        index = partition_index.get(path, lambda: self.partitions(datasource))
+        return index.partition(int(client_id))
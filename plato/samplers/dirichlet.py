@@ -4,7 +4,7 @@ Samples data from a dataset, biased across labels according to the Dirichlet dis
 import random
 import numpy as np
 import torch
-from torch.utils.data import WeightedRandomSampler
+from torch.utils.data import SubsetRandomSampler
 from plato.config import Config
 
 from plato.samplers import base
@@ -17,38 +17,67 @@ class Sampler(base.Sampler):
         super().__init__()
         self.client_id = client_id
 
-        # Different clients should have a different bias across the labels
-        np.random.seed(self.random_seed * int(client_id))
-
         self.partition_size = Config().data.partition_size
 
         # Concentration parameter to be used in the Dirichlet distribution
-        concentration = Config().data.concentration if hasattr(
+        self.concentration = Config().data.concentration if hasattr(
             Config().data, 'concentration') else 1.0
 
-        # The list of labels (targets) for all the examples
-        target_list = datasource.targets()
-        class_list = datasource.classes()
+        self.subset_indices = self.load_partition(datasource, client_id)
+
+    def sample_weights(self, target_list, class_list, client_id):
+        """Returns the weight of each example in the partition of a client."""
+        # Different clients should have a different bias across the labels
+        np.random.seed(self.random_seed * int(client_id))
 
         target_proportions = np.random.dirichlet(
-            np.repeat(concentration, len(class_list)))
+            np.repeat(self.concentration, len(class_list)))
 
         if np.isnan(np.sum(target_proportions)):
             target_proportions = np.repeat(0, len(class_list))
             target_proportions[random.randint(0, len(class_list) - 1)] = 1
 
-        self.sample_weights = target_proportions[target_list]
+        return target_proportions[target_list]
+
+    def generator_seed(self, client_id):
+        """Returns the seed of the generator drawing the partition of a client."""
+        return self.random_seed
+
+    def draw_partition(self, target_list, class_list, client_id):
+        """Samples the partition of a client without replacement, using the weights
+        of the examples."""
+        gen = torch.Generator()
+        gen.manual_seed(self.generator_seed(client_id))
+
+        weights = torch.as_tensor(
+            self.sample_weights(target_list, class_list, client_id),
+            dtype=torch.double)
+        return torch.multinomial(weights,
+                                 self.partition_size,
+                                 replacement=False,
+                                 generator=gen).numpy()
+
+    def partitions(self, datasource):
+        # The list of labels (targets) for all the examples
+        target_list = np.asarray(datasource.targets())
+        class_list = datasource.classes()
+
+        return [
+            self.draw_partition(target_list, class_list, client_id)
+            for client_id in range(1, Config().clients.total_clients + 1)
+        ]
+
+    def partition(self, datasource, client_id):
+        return self.draw_partition(np.asarray(datasource.targets()),
+                                   datasource.classes(), client_id)
 
     def get(self):
         """Obtains an instance of the sampler. """
         gen = torch.Generator()
-        gen.manual_seed(self.random_seed)
+        gen.manual_seed(self.generator_seed(self.client_id))
 
-        # Samples without replacement using the sample weights
-        return WeightedRandomSampler(weights=self.sample_weights,
-                                     num_samples=self.partition_size,
-                                     replacement=False,
-                                     generator=gen)
+        return SubsetRandomSampler(np.asarray(self.subset_indices).tolist(),
+                                   generator=gen)
 
     def trainset_size(self):
         """Returns the length of the dataset after sampling. """
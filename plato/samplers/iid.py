@@ -15,9 +15,14 @@ class Sampler(base.Sampler):
     def __init__(self, datasource, client_id):
         super().__init__()
         self.client_id = client_id
-        dataset = datasource.get_train_set()
-        self.dataset_size = len(dataset)
-        indices = list(range(self.dataset_size))
+
+        # Compute the indices of data in the subset for this client
+        self.subset_indices = self.load_partition(datasource, client_id)
+
+    def partitions(self, datasource):
+        """Divides the shuffled dataset across all the clients at once."""
+        dataset_size = datasource.num_train_examples()
+        indices = list(range(dataset_size))
         np.random.seed(self.random_seed)
         np.random.shuffle(indices)
 
@@ -33,15 +38,20 @@ class Sampler(base.Sampler):
             indices = indices[:total_size]
         assert len(indices) == total_size
 
-        # Compute the indices of data in the subset for this client
-        self.subset_indices = indices[(int(self.client_id) -
-                                       1):total_size:total_clients]
+        return [
+            indices[client_index:total_size:total_clients]
+            for client_index in range(total_clients)
+        ]
+
+    def partition(self, datasource, client_id):
+        return self.partitions(datasource)[int(client_id) - 1]
 
     def get(self):
         """Obtains an instance of the sampler. """
         gen = torch.Generator()
         gen.manual_seed(self.random_seed)
-        return SubsetRandomSampler(self.subset_indices, generator=gen)
+        return SubsetRandomSampler(np.asarray(self.subset_indices).tolist(),
+                                   generator=gen)
 
     def trainset_size(self):
         """Returns the length of the dataset after sampling. """
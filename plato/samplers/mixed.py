@@ -26,12 +26,19 @@ class Sampler(dirichlet.Sampler):
 
         super().__init__(datasource, client_id)
 
+    def sample_weights(self, target_list, class_list, client_id):
+        weights = super().sample_weights(target_list, class_list, client_id)
+
         if int(client_id) not in self.non_iid_clients_list:
-            target_list = datasource.targets()
-            class_list = datasource.classes()
-            self.sample_weights = np.array([
+            weights = np.array([
                 1 / len(class_list) for _ in range(len(class_list))
             ])[target_list]
 
+        return weights
+
+    def generator_seed(self, client_id):
+        if int(client_id) not in self.non_iid_clients_list:
             # Different iid clients should have a different random seed for Generator
-            self.random_seed = self.random_seed * int(client_id)
+            return self.random_seed * int(client_id)
+
+        return self.random_seed
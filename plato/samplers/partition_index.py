@@ -0,0 +1,68 @@
+"""
+A precomputed index of the partitions of a dataset across all the clients.
+
+The index is computed once for each dataset, sampler, random seed and number of
+clients, by the first process that needs it, and written to two array files: the
+indices of the examples in all the partitions back to back, and the offset of the
+partition of each client. Every process then maps the files read-only and looks up the
+partition of any client in constant time, so that virtual clients are switched without
+partitioning the dataset again.
+"""
+import fcntl
+import os
+
+import numpy as np
+
+
+class PartitionIndex:
+    """The partitions of a dataset, mapped from the array files of an index."""
+    def __init__(self, path):
+        self.indices = np.load(os.path.join(path, 'indices.npy'),
+                               mmap_mode='r')
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'),
+                               mmap_mode='r')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def partition(self, client_id):
+        """Returns the indices of the examples in the partition of a client."""
+        return self.indices[self.offsets[client_id - 1]:self.
+                            offsets[client_id]]
+
+
+def build(path, partitions):
+    """Writes the array files of an index from the partitions of all the clients."""
+    offsets = np.zeros(len(partitions) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(partition) for partition in partitions])
+    indices = np.concatenate([
+        np.asarray(partition, dtype=np.int32) for partition in partitions
+    ]) if len(partitions) > 0 else np.zeros(0, dtype=np.int32)
+
+    # The offsets are written last, as their file marks a complete index
+    for name, array in [('indices', indices), ('offsets', offsets)]:
+        temp_path = os.path.join(path, '{}.{}.tmp.npy'.format(name, os.getpid()))
+        np.save(temp_path, array)
+        os.replace(temp_path, os.path.join(path, name + '.npy'))
+
+
+# The indices mapped in this process
+_indices = {}
+
+
+def get(path, compute_partitions) -> PartitionIndex:
+    """Returns the index in a directory, building it first with the partitions returned
+    by compute_partitions() if no other process has done so."""
+    if path not in _indices:
+        if not os.path.exists(os.path.join(path, 'offsets.npy')):
+            os.makedirs(path, exist_ok=True)
+
+            with open(os.path.join(path, '.lock'), 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+                if not os.path.exists(os.path.join(path, 'offsets.npy')):
+                    build(path, compute_partitions())
+
+        _indices[path] = PartitionIndex(path)
+
+    return _indices[path]
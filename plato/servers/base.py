@@ -2,18 +2,30 @@
 The base class for federated learning servers.
 """
 
+import asyncio
+import copy
+import functools
+import inspect
 import logging
+import math
 import multiprocessing as mp
 import os
 import pickle
-import sys
+import random
 import time
+import uuid
+import warnings
 from abc import abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import socketio
 from aiohttp import web
 from plato.client import run
+from plato.clients import simulation
 from plato.config import Config
+from plato.utils import (codecs, s3, serialization, streaming,
+                         trainer_scheduler, weight_deltas)
 
 
 class ServerEvents(socketio.AsyncNamespace):
@@ -42,8 +54,10 @@ class ServerEvents(socketio.AsyncNamespace):
         await self.plato_server.client_report_arrived(sid, data['report'])
 
     async def on_chunk(self, sid, data):
-        """ A chunk of data from the server arrived. """
-        await self.plato_server.client_chunk_arrived(sid, data['data'])
+        """ A chunk of data from the client arrived. """
+        await self.plato_server.client_chunk_arrived(sid, data['data'],
+                                                     data['offset'],
+                                                     data['size'])
 
     async def on_client_payload(self, sid, data):
         """ An existing client sends a new payload from local training. """
@@ -51,7 +65,13 @@ class ServerEvents(socketio.AsyncNamespace):
 
     async def on_client_payload_done(self, sid, data):
         """ An existing client finished sending its payloads from local training. """
-        await self.plato_server.client_payload_done(sid, data['id'])
+        await self.plato_server.client_payload_decoded(sid)
+
+        if data.get('s3_url') is not None:
+            await self.plato_server.client_objects_arrived(
+                sid, data['id'], data['s3_url'])
+        else:
+            await self.plato_server.client_payload_done(sid, data['id'])
 
 
 class Server:
@@ -72,18 +92,88 @@ class Server:
         self.reports = {}
         self.updates = []
         self.client_payload = {}
+        self.client_payload_size = {}
         self.client_chunks = {}
+        # The decoding of the payload portions from each client, which are decoded on
+        # the compute thread along with the other CPU-heavy stages of the server, so
+        # that the event loop keeps serving the clients in the meantime
+        self.client_decoding = {}
+        self.compute_executor = ThreadPoolExecutor(max_workers=1)
+        # The longest delay of the event loop in running a scheduled task in this round
+        self.loop_lag = 0
+        self.loop_monitor = None
+        # The sizes of the client payloads received in this round, as received and
+        # once decoded, from which the compression ratio is computed
+        self.uplink_bytes = 0
+        self.uplink_decoded_bytes = 0
+        self.trainer_scheduler = None
+        # The client objects simulating virtual clients within the server process
+        self.client_pool = None
+        # The server payload encoded for the current round
+        self.payload_cache = None
+        # The global model is sent as a delta against the version a client received
+        # last, if that version is among the last downlink_history versions kept
+        self.downlink_history = Config().server.downlink_history if hasattr(
+            Config().server, 'downlink_history') else 0
+        self.model_history = OrderedDict()
+        self.delta_cache = {}
+        # The server payloads uploaded to the object store in this round, with the URLs
+        # of their portions, which are shared by all the clients receiving them, and the
+        # sids of these clients; the objects expire at the end of the round, and are
+        # deleted once all their recipients have reported back or disconnected
+        self.broadcast_objects = {}
+        self.expired_objects = []
+        self.upload_lock = asyncio.Lock()
+        # The payloads are sent to up to dispatch_concurrency selected clients at a time,
+        # and the times at which the clients have received them are recorded
+        self.dispatch_concurrency = Config().server.dispatch_concurrency if hasattr(
+            Config().server, 'dispatch_concurrency') else 8
+        self.dispatch_times = []
+        # starting time of a global training round
+        self.round_start_time = 0
+
+        # More clients than clients_per_round can be selected in a synchronous round, which
+        # is closed once clients_per_round of them have reported back, or when its deadline
+        # (in seconds) expires; updates arriving later are discarded
+        self.overselection = Config().server.overselection if hasattr(
+            Config().server, 'overselection') else 0
+        self.round_deadline = Config().server.round_deadline if hasattr(
+            Config().server, 'round_deadline') else None
+        self.round_closed = False
+        self.reported_clients = []
+        # Clients that are still training for a round that has been closed
+        self.straggling_clients = set()
+        self.deadline_task = None
+
+        # In the asynchronous mode, the server aggregates as soon as a buffer of client
+        # updates is full, and keeps sending the latest model to idle clients
+        self.asynchronous_mode = hasattr(
+            Config().server, 'asynchronous') and Config().server.asynchronous
+        self.buffer_size = Config().server.buffer_size if hasattr(
+            Config().server, 'buffer_size') else None
+        self.staleness_exponent = Config().server.staleness_exponent if hasattr(
+            Config().server, 'staleness_exponent') else 0.5
+        # The clients currently training in the asynchronous mode, with the round in
+        # which they received the model, and the client training on their behalf
+        self.training_clients = {}
+        self.aggregation_lock = asyncio.Lock()
 
     def run(self, client=None, edge_server=None, edge_client=None):
         """Start a run loop for the server. """
-        # Remove the running trainers table from previous runs.
-        if not Config().is_edge_server() and hasattr(Config().trainer, 'max_concurrency'):
-            with Config().sql_connection:
-                Config().cursor.execute("DROP TABLE IF EXISTS trainers")
+        # The trainers of all the clients started by this server share max_concurrency
+        # training slots and worker processes, granted by a scheduler in this process
+        if not Config().is_edge_server() and hasattr(Config().trainer,
+                                                    'max_concurrency'):
+            self.trainer_scheduler = trainer_scheduler.start(
+                Config().trainer.max_concurrency)
 
         self.client = client
         self.configure()
 
+        if hasattr(Config().clients, 'in_process') and Config().clients.in_process:
+            asyncio.run(self.simulate_clients())
+            return
+
         if Config().is_central_server():
             # In cross-silo FL, the central server lets edge servers start first
             # Then starts their clients
@@ -100,6 +190,48 @@ class Server:
 
         self.start()
 
+    async def simulate_clients(self):
+        """ Simulate all the virtual clients within the server process, rather than
+        starting client processes that connect to a socket.io server. """
+        workers = Config().clients.in_process_workers if hasattr(
+            Config().clients, 'in_process_workers') else 1
+        self.client_pool = simulation.ClientPool(self.client, workers)
+
+        # Virtual clients have no connections; their sids only identify their payloads
+        for client_id in range(1, self.total_clients + 1):
+            self.clients[client_id] = {
+                'sid': f'virtual-{client_id}',
+                'last_contacted': time.perf_counter()
+            }
+
+        logging.info("[Server #%d] Starting training.", os.getpid())
+        await self.select_clients()
+
+        # Training proceeds as the virtual clients report back, until the server is closed
+        await asyncio.get_running_loop().create_future()
+
+    async def simulate_client(self, server_response, payload):
+        """ Run a selected virtual client, and process its report and payload as if they
+        had arrived from a client process. """
+        client_id = server_response['id']
+        sid = self.clients[client_id]['sid']
+
+        try:
+            report, client_payload = await self.client_pool.train(
+                server_response, payload)
+        except ValueError:
+            # A virtual client that failed is removed, as a client process would have
+            # disconnected
+            logging.exception("[Server #%d] Virtual client #%d failed.",
+                              os.getpid(), client_id)
+            await self.client_disconnected(sid)
+            return
+
+        self.reports[sid] = report
+        self.client_payload[sid] = client_payload
+        self.client_payload_size[sid] = 0
+        await self.client_payload_done(sid, client_id)
+
     def start(self, port=Config().server.port):
         """ Start running the socket.io server. """
         logging.info("Starting a server at address %s and port %s.",
@@ -107,7 +239,10 @@ class Server:
 
         ping_interval = Config().server.ping_interval if hasattr(
             Config().server, 'ping_interval') else 3600
+        ping_timeout = Config().server.ping_timeout if hasattr(
+            Config().server, 'ping_timeout') else 360
         self.sio = socketio.AsyncServer(ping_interval=ping_interval,
+                                        ping_timeout=ping_timeout,
                                         max_http_buffer_size=2**31)
         self.sio.register_namespace(
             ServerEvents(namespace='/', plato_server=self))
@@ -127,6 +262,8 @@ class Server:
                          os.getpid(), client_id)
         else:
             self.clients[client_id]['last_contacted'] = time.perf_counter()
+            # The client may have been restarted, without the model it received last
+            self.clients[client_id].pop('model_version', None)
             logging.info("[Server #%d] New contact from Client #%d received.",
                          os.getpid(), client_id)
 
@@ -134,6 +271,9 @@ class Server:
                 self.clients) >= self.clients_per_round:
             logging.info("[Server #%d] Starting training.", os.getpid())
             await self.select_clients()
+        elif self.asynchronous_mode and self.current_round > 0:
+            async with self.aggregation_lock:
+                await self.select_idle_clients()
 
     @staticmethod
     def start_clients(client=None,
@@ -185,12 +325,28 @@ class Server:
     async def select_clients(self):
         """Select a subset of the clients and send messages to them to start training."""
         self.updates = []
+        self.payload_cache = None
+        self.delta_cache = {}
+        self.expire_broadcast_objects()
+        self.dispatch_times = []
+        self.loop_lag = 0
+        self.uplink_bytes = 0
+        self.uplink_decoded_bytes = 0
         self.current_round += 1
+        self.round_start_time = time.perf_counter()
+
+        if self.loop_monitor is None:
+            self.loop_monitor = asyncio.ensure_future(self.monitor_loop_lag())
 
         logging.info("\n[Server #%d] Starting round %s/%s.", os.getpid(),
                      self.current_round,
                      Config().trainer.rounds)
 
+        if self.asynchronous_mode:
+            # Clients still training on earlier models are left undisturbed
+            await self.select_idle_clients()
+            return
+
         if hasattr(Config().clients, 'simulation') and Config(
         ).clients.simulation and not Config().is_central_server:
             # In the client simulation mode, the client pool for client selection contains
@@ -202,9 +358,22 @@ class Server:
             # the current set of clients that have contacted the server
             self.clients_pool = list(self.clients)
 
+        # Clients still training for a closed round are not selected until they report back
+        self.clients_pool = [
+            client_id for client_id in self.clients_pool
+            if client_id not in self.straggling_clients
+        ]
+
+        self.round_closed = False
+        self.reported_clients = []
         self.selected_clients = self.choose_clients()
 
+        if self.round_deadline is not None:
+            self.deadline_task = asyncio.ensure_future(
+                self.enforce_round_deadline(self.current_round))
+
         if len(self.selected_clients) > 0:
+            recipients = []
             for i, selected_client_id in enumerate(self.selected_clients):
                 if hasattr(Config().clients, 'simulation') and Config(
                 ).clients.simulation and not Config().is_central_server:
@@ -212,78 +381,440 @@ class Server:
                 else:
                     client_id = selected_client_id
 
-                sid = self.clients[client_id]['sid']
+                recipients.append((selected_client_id, client_id))
 
-                logging.info("[Server #%d] Selecting client #%d for training.",
-                             os.getpid(), selected_client_id)
+            await self.send_to_clients(recipients)
 
-                server_response = {'id': selected_client_id}
-                server_response = await self.customize_server_response(
-                    server_response)
+    def selection_size(self) -> int:
+        """ The number of clients to be selected in a synchronous round, which exceeds
+        clients_per_round with over-selection. """
+        selection_size = math.ceil(self.clients_per_round *
+                                   (1 + self.overselection))
 
-                # Sending the server response as metadata to the clients (payload to follow)
-                await self.sio.emit('payload_to_arrive',
-                                    {'response': server_response},
-                                    room=sid)
+        return min(selection_size, len(self.clients_pool), len(self.clients))
 
-                payload = self.algorithm.extract_weights()
-                payload = self.customize_server_payload(
-                    payload, selected_client_id)
+    async def enforce_round_deadline(self, round_number):
+        """ Close a synchronous round if it is still open when its deadline expires. """
+        await asyncio.sleep(self.round_deadline)
 
-                # Sending the server payload to the client
-                logging.info(
-                    "[Server #%d] Sending the current model to client #%d.",
-                    os.getpid(), selected_client_id)
-                await self.send(sid, payload, selected_client_id)
+        if self.current_round == round_number and not self.round_closed:
+            logging.info(
+                "[Server #%d] Round %d deadline expired with %d of %d client reports received.",
+                os.getpid(), round_number, len(self.updates),
+                len(self.selected_clients))
+            await self.close_round()
+
+    async def select_idle_clients(self):
+        """ Select clients that are not training in the asynchronous mode, and send the
+        current model to them, so that clients_per_round clients are always training. """
+        simulating_clients = hasattr(Config().clients, 'simulation'
+                                     ) and Config().clients.simulation
+        if simulating_clients:
+            # Virtual clients are simulated by the clients not training on behalf of others
+            self.clients_pool = list(range(1, 1 + self.total_clients))
+            busy_clients = [
+                training['client_id']
+                for training in self.training_clients.values()
+            ]
+            available_clients = [
+                client_id for client_id in self.clients
+                if client_id not in busy_clients
+            ]
+        else:
+            self.clients_pool = list(self.clients)
+            available_clients = None
+
+        idle_clients = [
+            client_id for client_id in self.clients_pool
+            if client_id not in self.training_clients
+        ]
+        vacancies = self.clients_per_round - len(self.training_clients)
+        if simulating_clients:
+            vacancies = min(vacancies, len(available_clients))
+
+        if self.selected_clients is None:
+            self.selected_clients = []
+
+        recipients = []
+        for selected_client_id in random.sample(
+                idle_clients, max(0, min(vacancies, len(idle_clients)))):
+            client_id = available_clients.pop(
+                0) if simulating_clients else selected_client_id
+
+            self.training_clients[selected_client_id] = {
+                'client_id': client_id,
+                'starting_round': self.current_round
+            }
+            self.selected_clients.append(selected_client_id)
+            recipients.append((selected_client_id, client_id))
 
-    async def send_in_chunks(self, data, sid, client_id) -> None:
-        """ Sending a bytes object in fixed-sized chunks to the client. """
-        step = 1024 ^ 2
-        chunks = [data[i:i + step] for i in range(0, len(data), step)]
+        await self.send_to_clients(recipients)
+
+    async def send_to_clients(self, recipients):
+        """ Send the server response and the current model to selected clients
+        concurrently, to at most dispatch_concurrency clients at a time, so that they
+        start training at about the same time. """
+        semaphore = asyncio.Semaphore(self.dispatch_concurrency)
 
-        for chunk in chunks:
-            await self.sio.emit('chunk', {'data': chunk}, room=sid)
+        async def dispatch(selected_client_id, client_id):
+            async with semaphore:
+                await self.send_to_client(selected_client_id, client_id)
+
+        await asyncio.gather(*[
+            dispatch(selected_client_id, client_id)
+            for selected_client_id, client_id in recipients
+        ])
+
+        if len(self.dispatch_times) > 1:
+            logging.info(
+                "[Server #%d] Clients started training within %.2f seconds of each other.",
+                os.getpid(), self.dispatch_skew())
+
+    async def run_compute(self, func, *args):
+        """ Running a CPU-heavy function on the compute thread, without blocking the
+        event loop while waiting for its result. """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.compute_executor,
+                                          functools.partial(func, *args))
+
+    async def monitor_loop_lag(self, interval=0.1):
+        """ Measuring how late the event loop wakes up a task sleeping for a fixed
+        interval, which is how long the loop was blocked. """
+        while True:
+            start_time = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.loop_lag = max(self.loop_lag,
+                                time.perf_counter() - start_time - interval)
+
+    def dispatch_skew(self) -> float:
+        """ The time between the first and the last client receiving the current model
+        in this round. """
+        if len(self.dispatch_times) == 0:
+            return 0
+
+        return max(self.dispatch_times) - min(self.dispatch_times)
+
+    async def send_to_client(self, selected_client_id, client_id):
+        """ Send the server response and the current model to a selected client. """
+        sid = self.clients[client_id]['sid']
+
+        logging.info("[Server #%d] Selecting client #%d for training.",
+                     os.getpid(), selected_client_id)
+
+        server_response = {'id': selected_client_id}
+        server_response = await self.customize_server_response(
+            server_response)
+
+        if self.client_pool is not None:
+            # Virtual clients receive a copy of the payload, taken while it is current
+            payload = self.prepare_server_payload(selected_client_id,
+                                                  copy.deepcopy)
+            self.client_pool.schedule(
+                self.simulate_client(server_response, payload))
+            return
+
+        data = self.encode_server_payload(selected_client_id)
+
+        if self.current_round in self.model_history:
+            server_response['model_version'] = self.current_round
+
+            base_version = self.clients[client_id].get('model_version')
+            if base_version in self.model_history:
+                server_response['base_version'] = base_version
+                data = self.encode_model_delta(base_version)
+
+        # Sending the server response as metadata to the clients (payload to follow)
+        await self.sio.emit('payload_to_arrive', {'response': server_response},
+                            room=sid)
+
+        # Sending the server payload to the client
+        logging.info("[Server #%d] Sending the current model to client #%d.",
+                     os.getpid(), selected_client_id)
+
+        # The client holds this version of the model only once it has received all of
+        # the payload, and holds no known version if the payload was cut short, unless
+        # a later payload has been sent to it in the meantime
+        client = self.clients[client_id]
+        client.pop('model_version', None)
+        dispatch = client['dispatch'] = object()
+        sent = False
+
+        try:
+            sent = await self.send_encoded(sid, data, selected_client_id)
+        finally:
+            if client.get('dispatch') is dispatch:
+                del client['dispatch']
+
+                if sent and 'model_version' in server_response:
+                    client['model_version'] = server_response['model_version']
+
+        if sent:
+            self.dispatch_times.append(time.perf_counter())
+
+    def encode_server_payload(self, selected_client_id):
+        """ Encoding the server payload to be sent to a selected client. """
+        return self.prepare_server_payload(selected_client_id,
+                                           self.encode_snapshot)
+
+    def encode_snapshot(self, payload) -> list:
+        """ Encoding a copy of a payload. The encoded buffers are views of the tensors
+        encoded, which must not change if the global model is updated while the payload
+        is still being sent to some of the clients. """
+        return self.encode_payload(copy.deepcopy(payload))
+
+    def prepare_server_payload(self, selected_client_id, encode):
+        """ Preparing the server payload for a selected client with an encoding function.
+
+        The global payload is identical for all the selected clients, so that it is
+        extracted and encoded only once in each round, unless the server overrides
+        customize_client_payload(), in which case it is encoded for each client.
+        """
+        if self.customizes_server_payload_per_client():
+            payload = self.algorithm.extract_weights()
+            payload = self.customize_server_payload(payload,
+                                                    selected_client_id)
+            return encode(payload)
+
+        if type(self).customize_client_payload is not (
+                Server.customize_client_payload):
+            payload = self.algorithm.extract_weights()
+            payload = self.customize_server_payload(payload)
+            payload = self.customize_client_payload(payload, selected_client_id)
+            return encode(payload)
+
+        if self.payload_cache is None:
+            payload = self.algorithm.extract_weights()
+            payload = self.customize_server_payload(payload)
+            self.payload_cache = encode(payload)
+
+            if self.downlink_history > 0 and weight_deltas.is_encodable(
+                    payload):
+                # Clients hold the model as decoded, which lossy codecs have changed
+                if encode == self.encode_snapshot and not codecs.is_lossless():
+                    payload = codecs.loads(
+                        bytearray().join(self.payload_cache[0]))
+
+                self.record_model_version(payload)
+
+        return self.payload_cache
+
+    def record_model_version(self, weights):
+        """ Keeping a copy of the global model sent in the current round, along with
+        the versions sent in the last downlink_history rounds. """
+        self.model_history[self.current_round] = OrderedDict(
+            (name, weight.detach().cpu().clone())
+            for name, weight in weights.items())
+
+        while len(self.model_history) > self.downlink_history + 1:
+            self.model_history.popitem(last=False)
+
+    def encode_model_delta(self, base_version):
+        """ Encoding the global model of the current round as a delta against an
+        earlier version, once for all the clients holding that version. """
+        if base_version not in self.delta_cache:
+            weights = self.model_history[self.current_round]
+            base_weights = self.model_history[base_version]
+
+            if weight_deltas.matches(weights, base_weights):
+                # Deltas are already compressed, and must not be changed by lossy codecs
+                delta = weight_deltas.encode(weights, base_weights)
+                self.delta_cache[base_version] = [serialization.dumps(delta)]
+            else:
+                self.delta_cache[base_version] = None
+
+        return self.delta_cache[base_version] or self.payload_cache
+
+    @staticmethod
+    def encode_payload(payload) -> list:
+        """ Encoding a payload, or each of its portions if it is a list, with the
+        codecs configured. """
+        if isinstance(payload, list):
+            return [codecs.dumps(data) for data in payload]
+
+        return [codecs.dumps(payload)]
+
+    async def send_in_chunks(self, data, sid, client_id) -> None:
+        """ Sending an encoded payload in fixed-sized chunks to the client. """
+        chunk_size = Config().server.chunk_size if hasattr(
+            Config().server, 'chunk_size') else streaming.CHUNK_SIZE
+        window = Config().server.chunk_window if hasattr(
+            Config().server, 'chunk_window') else streaming.WINDOW
+        timeout = Config().server.ping_timeout if hasattr(
+            Config().server, 'ping_timeout') else 360
+
+        await streaming.send_chunks(functools.partial(self.sio.emit,
+                                                      room=sid),
+                                    data,
+                                    chunk_size=chunk_size,
+                                    window=window,
+                                    timeout=timeout)
 
         await self.sio.emit('payload', {'id': client_id}, room=sid)
 
     async def send(self, sid, payload, client_id) -> None:
         """ Sending a new data payload to the client using socket.io. """
-        data_size = 0
+        await self.send_encoded(sid, self.encode_payload(payload), client_id)
+
+    async def upload_encoded(self, encoded_payload, sid) -> list:
+        """ Uploading an encoded payload to the object store once in each round for all
+        the clients receiving it, and returning the URLs of its portions. """
+        key = id(encoded_payload)
+
+        # Payloads are sent to clients concurrently, but uploaded only once
+        async with self.upload_lock:
+            if key not in self.broadcast_objects:
+                store = s3.get()
+                loop = asyncio.get_running_loop()
+                unique_key = uuid.uuid4().hex[:6].upper()
+                urls = []
+
+                for i, data in enumerate(encoded_payload):
+                    object_key = f'server_payload_{self.current_round}_{unique_key}_{i}'
+                    urls.append(await loop.run_in_executor(
+                        None, store.send, object_key, data))
+
+                # The payload is kept so that its id is not reused within the round
+                self.broadcast_objects[key] = {
+                    'payload': encoded_payload,
+                    'urls': urls,
+                    'recipients': []
+                }
+
+        self.broadcast_objects[key]['recipients'].append(sid)
+        return self.broadcast_objects[key]['urls']
+
+    def expire_broadcast_objects(self):
+        """ Expiring the server payloads uploaded in this round, which are not sent to
+        any more clients, and deleting the expired payloads no longer needed. """
+        self.expired_objects += self.broadcast_objects.values()
+        self.broadcast_objects = {}
+        self.delete_broadcast_objects()
+
+    def delete_broadcast_objects(self, all_objects=False):
+        """ Deleting the expired server payloads that all their recipients have
+        downloaded, or all of them. """
+        remaining_objects = []
+
+        for broadcast_object in self.expired_objects:
+            if broadcast_object['recipients'] and not all_objects:
+                remaining_objects.append(broadcast_object)
+            else:
+                for url in broadcast_object['urls']:
+                    s3.get().delete(url)
 
-        if isinstance(payload, list):
-            for data in payload:
-                _data = pickle.dumps(data)
-                await self.send_in_chunks(_data, sid, client_id)
-                data_size += sys.getsizeof(_data)
+        self.expired_objects = remaining_objects
 
+    def release_broadcast_objects(self, sid, disconnected=False):
+        """ Removing a client from the recipients of the oldest server payload sent to
+        it once it has reported back, as it has downloaded the payload to train, or from
+        the recipients of all the payloads sent to it once it has disconnected. """
+        for broadcast_object in self.expired_objects + list(
+                self.broadcast_objects.values()):
+            recipients = broadcast_object['recipients']
+
+            while sid in recipients:
+                recipients.remove(sid)
+
+                if not disconnected:
+                    self.delete_broadcast_objects()
+                    return
+
+        self.delete_broadcast_objects()
+
+    async def send_encoded(self, sid, encoded_payload, client_id) -> bool:
+        """ Sending an encoded payload to the client using either S3 or socket.io,
+        and returning whether the client has received all of it. """
+        data_size = 0
+        s3_url = None
+
+        if s3.get() is not None:
+            # All the clients receiving the same payload download the same objects
+            s3_url = await self.upload_encoded(encoded_payload, sid)
+            data_size = sum(
+                serialization.nbytes(data) for data in encoded_payload)
         else:
-            _data = pickle.dumps(payload)
-            await self.send_in_chunks(_data, sid, client_id)
-            data_size = sys.getsizeof(_data)
+            try:
+                for data in encoded_payload:
+                    await self.send_in_chunks(data, sid, client_id)
+                    data_size += serialization.nbytes(data)
+            except asyncio.TimeoutError:
+                logging.warning(
+                    "[Server #%d] Client #%d stopped acknowledging the payload.",
+                    os.getpid(), client_id)
+                return False
 
-        await self.sio.emit('payload_done', {'id': client_id}, room=sid)
+        await self.sio.emit('payload_done', {
+            'id': client_id,
+            's3_url': s3_url
+        }, room=sid)
 
         logging.info("[Server #%d] Sent %s MB of payload data to client #%d.",
                      os.getpid(), round(data_size / 1024**2, 2), client_id)
 
+        return True
+
     async def client_report_arrived(self, sid, report):
         """ Upon receiving a report from a client. """
         self.reports[sid] = pickle.loads(report)
+        self.release_broadcast_objects(sid)
         self.client_payload[sid] = None
-        self.client_chunks[sid] = []
+        self.client_payload_size[sid] = 0
+        self.client_chunks[sid] = streaming.Reassembler()
 
-    async def client_chunk_arrived(self, sid, data) -> None:
+    async def client_chunk_arrived(self, sid, data, offset, size) -> None:
         """ Upon receiving a chunk of data from a client. """
-        self.client_chunks[sid].append(data)
+        self.client_chunks[sid].add(data, offset, size)
 
     async def client_payload_arrived(self, sid, client_id):
         """ Upon receiving a portion of the payload from a client. """
-        assert len(
-            self.client_chunks[sid]) > 0 and client_id in self.selected_clients
-
-        payload = b''.join(self.client_chunks[sid])
-        _data = pickle.loads(payload)
-        self.client_chunks[sid] = []
+        if client_id in self.straggling_clients:
+            self.client_chunks[sid] = streaming.Reassembler()
+            return
+
+        assert self.client_chunks[sid].complete(
+        ) and client_id in self.selected_clients
+
+        # Portions are added to the payload in the order they arrived
+        self.client_decoding[sid] = asyncio.ensure_future(
+            self.decode_client_payload(sid, self.client_chunks[sid].payload(),
+                                       self.client_decoding.get(sid)))
+
+    async def decode_client_payload(self, sid, payload, previous=None):
+        """ Decoding a portion of the payload from a client on the compute thread, once
+        the previous portion has been added to the payload. """
+        if previous is not None:
+            await previous
+
+        _data = await self.run_compute(codecs.loads, payload)
+        self.add_client_payload_portion(sid, payload, _data)
+
+    async def client_payload_decoded(self, sid):
+        """ Waiting until all the portions of the payload received from a client have
+        been decoded. """
+        decoding = self.client_decoding.pop(sid, None)
+        if decoding is not None:
+            await decoding
+
+    async def client_objects_arrived(self, sid, client_id, urls):
+        """ Upon a client having uploaded all its payload to the object store. """
+        store = s3.get()
+        loop = asyncio.get_running_loop()
+
+        for url in urls:
+            if client_id not in self.straggling_clients:
+                payload = await loop.run_in_executor(None, store.receive, url)
+                await self.decode_client_payload(sid, payload)
+            await loop.run_in_executor(None, store.delete, url)
+
+        await self.client_payload_done(sid, client_id)
+
+    def add_client_payload_portion(self, sid, payload, _data):
+        """ Adding a decoded portion of the payload from a client. """
+        self.client_payload_size[sid] += len(payload)
+
+        self.uplink_bytes += len(payload)
+        self.uplink_decoded_bytes += serialization.nbytes(
+            serialization.dumps(_data))
 
         if self.client_payload[sid] is None:
             self.client_payload[sid] = _data
@@ -295,33 +826,105 @@ class Server:
 
     async def client_payload_done(self, sid, client_id):
         """ Upon receiving all the payload from a client. """
+        if client_id in self.straggling_clients:
+            # Updates arriving after their round has been closed are discarded
+            logging.info(
+                "[Server #%d] Discarded a late update from client #%d.",
+                os.getpid(), client_id)
+            self.straggling_clients.remove(client_id)
+            self.client_payload[sid] = None
+            return
+
         assert self.client_payload[sid] is not None
 
-        payload_size = 0
-        if isinstance(self.client_payload[sid], list):
-            for _data in self.client_payload[sid]:
-                payload_size += sys.getsizeof(pickle.dumps(_data))
-        else:
-            payload_size = sys.getsizeof(pickle.dumps(
-                self.client_payload[sid]))
+        payload_size = self.client_payload_size[sid]
 
         logging.info(
             "[Server #%d] Received %s MB of payload data from client #%d.",
             os.getpid(), round(payload_size / 1024**2, 2), client_id)
 
-        self.updates.append((self.reports[sid], self.client_payload[sid]))
+        if self.asynchronous_mode:
+            async with self.aggregation_lock:
+                await self.buffer_update(self.reports[sid],
+                                         self.client_payload[sid], client_id)
+            self.client_payload[sid] = None
+            return
+
+        self.reported_clients.append(client_id)
+        await self.store_update(self.reports[sid], self.client_payload[sid])
+        self.client_payload[sid] = None
+
+        if self.round_completed():
+            logging.info(
+                "[Server #%d] %d client reports received. Processing.",
+                os.getpid(), len(self.updates))
+            await self.close_round()
+
+    def round_completed(self) -> bool:
+        """ Whether enough client reports have arrived to close the current synchronous
+        round: from all the selected clients, or from clients_per_round of them if more
+        clients have been selected. """
+        reports_needed = len(self.selected_clients)
+        if self.clients_per_round > 0:
+            reports_needed = min(reports_needed, self.clients_per_round)
+
+        return not self.round_closed and len(self.updates) > 0 and len(
+            self.updates) >= reports_needed
+
+    async def close_round(self):
+        """ Close the current synchronous round, process the client reports received so far,
+        and start a new round. """
+        self.round_closed = True
+        self.straggling_clients.update(
+            client_id for client_id in self.selected_clients
+            if client_id not in self.reported_clients)
+
+        if len(self.updates) > 0:
+            await self.process_reports()
+        else:
+            logging.info(
+                "[Server #%d] No client reports received in round %d.",
+                os.getpid(), self.current_round)
+
+        await self.wrap_up()
+        await self.select_clients()
+
+    async def buffer_update(self, report, payload, client_id):
+        """ Buffer a client update in the asynchronous mode, aggregate the buffered updates
+        once the buffer is full, and send the current model to the idle clients. """
+        # The staleness of an update is the number of aggregations since its client
+        # received the model
+        training = self.training_clients.pop(client_id)
+        self.selected_clients.remove(client_id)
+        report.staleness = self.current_round - training['starting_round']
 
-        if len(self.updates) > 0 and len(self.updates) >= len(
-                self.selected_clients):
+        await self.store_update(report, payload)
+
+        buffer_size = self.buffer_size or self.clients_per_round
+        if len(self.updates) >= buffer_size:
             logging.info(
-                "[Server #%d] All %d client reports received. Processing.",
+                "[Server #%d] %d client updates buffered. Processing.",
                 os.getpid(), len(self.updates))
             await self.process_reports()
             await self.wrap_up()
             await self.select_clients()
+        else:
+            await self.select_idle_clients()
+
+    def staleness_factor(self, report) -> float:
+        """ The factor by which a client update is discounted given its staleness, which is
+        only reported in the asynchronous mode. """
+        staleness = getattr(report, 'staleness', 0)
+        return 1 / (1 + staleness)**self.staleness_exponent
+
+    async def store_update(self, report, payload):
+        """ Storing a client update until all the updates in this round have arrived. """
+        self.updates.append((report, payload))
 
     async def client_disconnected(self, sid):
         """ When a client disconnected it should be removed from its internal states. """
+        self.release_broadcast_objects(sid, disconnected=True)
+
         for client_id, client in dict(self.clients).items():
             if client['sid'] == sid:
                 del self.clients[client_id]
@@ -330,17 +933,28 @@ class Server:
                     "[Server #%d] Client #%d disconnected and removed from this server.",
                     os.getpid(), client_id)
 
-                if client_id in self.selected_clients:
+                if self.asynchronous_mode:
+                    async with self.aggregation_lock:
+                        for selected_client_id, training in dict(
+                                self.training_clients).items():
+                            if training['client_id'] == client_id:
+                                del self.training_clients[selected_client_id]
+                                self.selected_clients.remove(
+                                    selected_client_id)
+
+                        await self.select_idle_clients()
+
+                elif client_id in self.straggling_clients:
+                    self.straggling_clients.remove(client_id)
+
+                elif client_id in self.selected_clients:
                     self.selected_clients.remove(client_id)
 
-                    if len(self.updates) > 0 and len(self.updates) >= len(
-                            self.selected_clients):
+                    if self.round_completed():
                         logging.info(
-                            "[Server #%d] All %d client reports received. Processing.",
+                            "[Server #%d] %d client reports received. Processing.",
                             os.getpid(), len(self.updates))
-                        await self.process_reports()
-                        await self.wrap_up()
-                        await self.select_clients()
+                        await self.close_round()
 
     async def wrap_up(self):
         """Wrapping up when each round of training is done."""
@@ -360,7 +974,15 @@ class Server:
         """Closing the server."""
         logging.info("[Server #%d] Training concluded.", os.getpid())
         self.trainer.save_model()
-        await self.close_connections()
+
+        if self.client_pool is None:
+            await self.close_connections()
+
+        if s3.get() is not None:
+            # No more payloads are downloaded from the object store
+            self.expire_broadcast_objects()
+            self.delete_broadcast_objects(all_objects=True)
+
         os._exit(0)
 
     async def customize_server_response(self, server_response):
@@ -368,9 +990,29 @@ class Server:
         return server_response
 
     @abstractmethod
-    def customize_server_payload(self, payload, selected_client_id):
+    def customize_server_payload(self, payload):
         """Wrap up generating the server payload with any additional information."""
 
+    def customizes_server_payload_per_client(self) -> bool:
+        """ Whether the server overrides customize_server_payload() with the signature it
+        used to have, taking the ID of the selected client as well, in which case the
+        payload is encoded for each client. """
+        parameters = inspect.signature(
+            self.customize_server_payload).parameters
+        if len(parameters) < 2:
+            return False
+
+        warnings.warn(
+            f"{type(self).__name__}.customize_server_payload() taking the ID of the "
+            "selected client is deprecated; override customize_client_payload() to "
+            "customize the payload for each client.", DeprecationWarning)
+        return True
+
+    def customize_client_payload(self, payload, selected_client_id):
+        """Customize the server payload for a selected client. Servers overriding this
+        method encode the payload for each client, rather than once in each round."""
+        return payload
+
     @abstractmethod
     def configure(self):
         """ Configuring the server with initialization work. """
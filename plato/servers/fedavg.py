@@ -3,10 +3,12 @@ A simple federated learning server using federated averaging.
 """
 
 import asyncio
+import copy
 import logging
 import os
 import random
 import time
+from collections import OrderedDict
 
 import wandb
 from plato.algorithms import registry as algorithms_registry
@@ -33,6 +35,35 @@ class Server(base.Server):
         self.testset = None
         self.total_samples = 0
 
+        # Client updates can be folded into a running weighted sum as they arrive,
+        # so that they do not need to be kept until the end of a round
+        self.incremental_aggregation = hasattr(
+            Config().server, 'incremental_aggregation'
+        ) and Config().server.incremental_aggregation
+        self.update_sum = None
+
+        # The global models sent to clients that are still training in the asynchronous
+        # mode, keyed by the round in which they were sent
+        self.model_versions = {}
+
+        if self.incremental_aggregation and not self.uses_federated_averaging():
+            logging.warning(
+                "[Server #%d] Incremental aggregation is only supported by "
+                "federated averaging, and is therefore disabled.", os.getpid())
+            self.incremental_aggregation = False
+
+        # The global model can be tested every few rounds only, and in the background
+        # while the next round goes on, on a snapshot of its weights
+        self.eval_every_n_rounds = Config().server.eval_every_n_rounds if hasattr(
+            Config().server, 'eval_every_n_rounds') else 1
+        self.background_evaluation = hasattr(
+            Config().server, 'background_evaluation'
+        ) and Config().server.background_evaluation
+        # The trainer testing the snapshots, and the last of the steps run in order in
+        # the background: testing snapshots and recording the results of their rounds
+        self.evaluation_trainer = None
+        self.evaluation = None
+
         self.total_clients = Config().clients.total_clients
         self.clients_per_round = Config().clients.per_round
 
@@ -40,9 +71,6 @@ class Server(base.Server):
             "[Server #%d] Started training on %s clients with %s per round.",
             os.getpid(), self.total_clients, self.clients_per_round)
 
-        # starting time of a global training round
-        self.round_start_time = 0
-
         if hasattr(Config(), 'results'):
             recorded_items = Config().results.types
             self.recorded_items = ['round'] + [
@@ -93,8 +121,72 @@ class Server(base.Server):
     def choose_clients(self):
         """Choose a subset of the clients to participate in each round."""
         # Select clients randomly
-        assert self.clients_per_round <= len(self.clients_pool)
-        return random.sample(self.clients_pool, self.clients_per_round)
+        assert self.clients_per_round <= len(self.clients_pool) + len(
+            self.straggling_clients)
+        return random.sample(self.clients_pool, self.selection_size())
+
+    def uses_federated_averaging(self):
+        """Whether this server aggregates client updates using unmodified federated averaging."""
+        return all(
+            getattr(type(self), method) is getattr(Server, method)
+            for method in ('aggregate_weights', 'federated_averaging',
+                           'extract_client_updates'))
+
+    async def select_idle_clients(self):
+        """Select idle clients in the asynchronous mode, keeping a copy of the current
+        model until all the clients it was sent to have reported back."""
+        if self.current_round not in self.model_versions:
+            self.model_versions[self.current_round] = copy.deepcopy(
+                self.algorithm.extract_weights())
+
+        await super().select_idle_clients()
+
+        starting_rounds = [
+            training['starting_round']
+            for training in self.training_clients.values()
+        ]
+        for version in list(self.model_versions):
+            if version != self.current_round and version not in starting_rounds:
+                del self.model_versions[version]
+
+    def rebase_weights(self, weights, starting_round):
+        """Shift the weights trained from an earlier global model onto the current one, so
+        that the update computed from them is the client's own update."""
+        starting_weights = self.model_versions[starting_round]
+        current_weights = self.algorithm.extract_weights()
+
+        return OrderedDict(
+            (name, weight - starting_weights[name] + current_weights[name])
+            for name, weight in weights.items())
+
+    async def store_update(self, report, payload):
+        """Store a client update, or fold it into the running weighted sum of updates
+        if updates are aggregated incrementally."""
+        staleness = getattr(report, 'staleness', 0)
+        if staleness > 0 and isinstance(payload, dict):
+            # A stale update is computed against the model its client started from
+            payload = self.rebase_weights(payload,
+                                          self.current_round - staleness)
+
+        if self.incremental_aggregation:
+            await self.run_compute(self.accumulate_update, report, payload)
+            payload = None
+
+        await super().store_update(report, payload)
+
+    def accumulate_update(self, report, payload):
+        """Add a client update, weighted by its number of samples (and discounted by its
+        staleness), to the running sum."""
+        update = self.algorithm.compute_weight_updates([payload])
+        weight = report.num_samples * self.staleness_factor(report)
+        weighted_update = self.algorithm.aggregate_weight_updates(
+            update, [weight])
+
+        if self.update_sum is None:
+            self.update_sum = dict(weighted_update)
+        else:
+            for name, delta in weighted_update.items():
+                self.update_sum[name] += delta
 
     def extract_client_updates(self, updates):
         """Extract the model weight updates from client updates."""
@@ -104,35 +196,37 @@ class Server(base.Server):
     async def aggregate_weights(self, updates):
         """Aggregate the reported weight updates from the selected clients."""
         update = await self.federated_averaging(updates)
-        updated_weights = self.algorithm.update_weights(update)
-        self.algorithm.load_weights(updated_weights)
+        updated_weights = await self.run_compute(self.algorithm.update_weights,
+                                                 update)
+        await self.run_compute(self.algorithm.load_weights, updated_weights)
 
     async def federated_averaging(self, updates):
         """Aggregate weight updates from the clients using federated averaging."""
-        weights_received = self.extract_client_updates(updates)
-
         # Extract the total number of samples
         self.total_samples = sum(
             [report.num_samples for (report, __) in updates])
 
-        # Perform weighted averaging
-        avg_update = {
-            name: self.trainer.zeros(weights.shape)
-            for name, weights in weights_received[0].items()
-        }
-
-        for i, update in enumerate(weights_received):
-            report, __ = updates[i]
-            num_samples = report.num_samples
+        if self.update_sum is not None:
+            # The weighted sum of updates has been computed as they arrived
+            avg_update = {
+                name: total / self.total_samples
+                for name, total in self.update_sum.items()
+            }
+            self.update_sum = None
+            return avg_update
 
-            for name, delta in update.items():
-                # Use weighted average by the number of samples
-                avg_update[name] += delta * (num_samples / self.total_samples)
+        weights_received = await self.run_compute(self.extract_client_updates,
+                                                  updates)
 
-            # Yield to other tasks in the server
-            await asyncio.sleep(0)
+        # Perform weighted averaging by the number of samples, discounting stale updates
+        # in the asynchronous mode
+        coefficients = [
+            report.num_samples * self.staleness_factor(report) /
+            self.total_samples for (report, __) in updates
+        ]
 
-        return avg_update
+        return await self.run_compute(self.algorithm.aggregate_weight_updates,
+                                      weights_received, coefficients)
 
     async def process_reports(self):
         """Process the client reports by aggregating their weights."""
@@ -145,7 +239,13 @@ class Server(base.Server):
             logging.info(
                 '[Server #{:d}] Average client accuracy: {:.2f}%.'.format(
                     os.getpid(), 100 * self.accuracy))
-        else:
+        elif self.background_evaluation:
+            if self.evaluated_round():
+                # The snapshot is tested once the earlier ones have been tested
+                self.run_after_evaluations(
+                    self.test_snapshot, self.current_round,
+                    copy.deepcopy(self.algorithm.extract_weights()))
+        elif self.evaluated_round():
             # Testing the updated model directly at the server
             self.accuracy = await self.trainer.server_test(self.testset)
 
@@ -153,11 +253,86 @@ class Server(base.Server):
                 '[Server #{:d}] Global model accuracy: {:.2f}%\n'.format(
                     os.getpid(), 100 * self.accuracy))
 
-        if hasattr(Config().trainer, 'use_wandb'):
+        if hasattr(Config().trainer, 'use_wandb'
+                   ) and self.evaluation is None and self.evaluated_round():
             wandb.log({"accuracy": self.accuracy})
 
         await self.wrap_up_processing_reports()
 
+    def evaluated_round(self) -> bool:
+        """Whether the global model is tested in the current round, by the clients or
+        at the server."""
+        return Config().clients.do_test or (
+            self.current_round % self.eval_every_n_rounds == 0) or (
+                self.current_round >= Config().trainer.rounds)
+
+    def run_after_evaluations(self, step, *args):
+        """Run a step in the background once the earlier ones are done, so that
+        snapshots are tested, and the results of their rounds recorded, in order."""
+        previous = self.evaluation
+
+        async def run():
+            if previous is not None:
+                await previous
+
+            try:
+                await step(*args)
+            except Exception:  # pylint: disable=broad-except
+                logging.exception(
+                    "[Server #%d] Failed to evaluate the global model in the "
+                    "background.", os.getpid())
+
+        self.evaluation = asyncio.ensure_future(run())
+
+    async def test_snapshot(self, round_number, weights):
+        """Test a snapshot of the global model taken at the end of a round."""
+        if self.evaluation_trainer is None:
+            self.evaluation_trainer = copy.deepcopy(self.trainer)
+
+        self.evaluation_trainer.model.load_state_dict(weights)
+        self.accuracy = await self.evaluation_trainer.server_test(self.testset)
+
+        logging.info(
+            '[Server #{:d}] Global model accuracy in round {:d}: {:.2f}%\n'.format(
+                os.getpid(), round_number, 100 * self.accuracy))
+
+        if hasattr(Config().trainer, 'use_wandb'):
+            wandb.log({"accuracy": self.accuracy})
+
+    async def write_results(self, result_csv_file, new_row):
+        """Record the results of a round, with the accuracy of its snapshot if one was
+        tested in the background."""
+        if 'accuracy' in self.recorded_items:
+            index = self.recorded_items.index('accuracy')
+            if new_row[index] != '':
+                new_row[index] = self.accuracy * 100
+
+        csv_processor.write_csv(result_csv_file, new_row)
+
+    async def reach_target_accuracy(self):
+        """Close the server if the last snapshot tested in the background has reached the
+        target accuracy."""
+        target_accuracy = Config().trainer.target_accuracy
+
+        if target_accuracy and self.accuracy >= target_accuracy:
+            logging.info("[Server #%d] Target accuracy reached.", os.getpid())
+            await self.close()
+
+    async def wrap_up(self):
+        """Wrapping up when each round of training is done, checking the target accuracy
+        once the global model of this round has been tested if it is tested in the
+        background."""
+        if self.evaluation is None:
+            await super().wrap_up()
+            return
+
+        self.run_after_evaluations(self.reach_target_accuracy)
+
+        if self.current_round >= Config().trainer.rounds:
+            # The results of the last rounds are recorded before the server is closed
+            await self.evaluation
+            await super().wrap_up()
+
     async def wrap_up_processing_reports(self):
         """Wrap up processing the reports with any additional work."""
 
@@ -168,19 +343,30 @@ class Server(base.Server):
                     'round':
                     self.current_round,
                     'accuracy':
-                    self.accuracy * 100,
+                    self.accuracy * 100 if self.evaluated_round() else '',
                     'training_time':
                     max([
                         report.training_time for (report, __) in self.updates
                     ]),
                     'round_time':
-                    time.perf_counter() - self.round_start_time
+                    time.perf_counter() - self.round_start_time,
+                    'compression_ratio':
+                    self.uplink_decoded_bytes /
+                    self.uplink_bytes if self.uplink_bytes > 0 else 1,
+                    'dispatch_skew':
+                    self.dispatch_skew(),
+                    'loop_lag':
+                    self.loop_lag
                 }[item]
                 new_row.append(item_value)
 
             result_csv_file = Config().result_dir + 'result.csv'
 
-            csv_processor.write_csv(result_csv_file, new_row)
+            if self.evaluation is None:
+                csv_processor.write_csv(result_csv_file, new_row)
+            else:
+                self.run_after_evaluations(self.write_results, result_csv_file,
+                                           new_row)
 
     @staticmethod
     def accuracy_averaging(reports):
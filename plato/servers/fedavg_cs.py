@@ -150,7 +150,14 @@ class Server(fedavg.Server):
                         report.training_time for (report, __) in self.updates
                     ]),
                     'round_time':
-                    time.perf_counter() - self.round_start_time
+                    time.perf_counter() - self.round_start_time,
+                    'compression_ratio':
+                    self.uplink_decoded_bytes /
+                    self.uplink_bytes if self.uplink_bytes > 0 else 1,
+                    'dispatch_skew':
+                    self.dispatch_skew(),
+                    'loop_lag':
+                    self.loop_lag
                 }[item]
                 new_row.append(item_value)
 
@@ -2,14 +2,11 @@
 Base class for trainers.
 """
 
-import os
-import random
-import sqlite3
-import time
 from abc import ABC, abstractmethod
 from typing import Tuple
 
 from plato.config import Config
+from plato.utils.trainer_scheduler import TokenClient
 
 
 class Trainer(ABC):
@@ -17,35 +14,13 @@ class Trainer(ABC):
     def __init__(self):
         self.device = Config().device()
         self.client_id = 0
-
-    @staticmethod
-    def run_sql_statement(statement: str, params: tuple = None):
-        """ Run a particular command with a SQLite database connection. """
-        while True:
-            try:
-                with Config().sql_connection:
-                    if params is None:
-                        Config().cursor.execute(statement)
-                    else:
-                        Config().cursor.execute(statement, params)
-
-                    return_value = Config().cursor.fetchone()
-                    if return_value is not None:
-                        return return_value[0]
-                break
-            except sqlite3.OperationalError:
-                time.sleep(random.random() * 2)
+        # The training slot granted to this trainer by the trainer scheduler
+        self.training_slot = None
 
     def set_client_id(self, client_id):
-        """ Setting the client ID and initialize the shared database table for controlling
-            the maximum concurrency with respect to the number of training clients.
-        """
+        """ Setting the client ID. """
         self.client_id = client_id
 
-        if hasattr(Config().trainer, 'max_concurrency'):
-            Trainer.run_sql_statement(
-                "CREATE TABLE IF NOT EXISTS trainers (run_id int)")
-
     @abstractmethod
     def save_model(self, filename=None):
         """Saving the model to a file. """
@@ -56,69 +31,20 @@ class Trainer(ABC):
         """Loading pre-trained model weights from a file. """
         raise "load_model() not implemented."
 
-    @staticmethod
-    def save_accuracy(accuracy, filename=None):
-        """Saving the test accuracy to a file."""
-        model_dir = Config().params['model_dir']
-        model_name = Config().trainer.model_name
-
-        if not os.path.exists(model_dir):
-            os.makedirs(model_dir)
-
-        if filename is not None:
-            accuracy_path = f"{model_dir}{filename}"
-        else:
-            accuracy_path = f'{model_dir}{model_name}.acc'
-
-        with open(accuracy_path, 'w') as file:
-            file.write(str(accuracy))
-
-    @staticmethod
-    def load_accuracy(filename=None):
-        """Loading the test accuracy from a file."""
-        model_dir = Config().params['model_dir']
-        model_name = Config().trainer.model_name
-
-        if filename is not None:
-            accuracy_path = f"{model_dir}{filename}"
-        else:
-            accuracy_path = f'{model_dir}{model_name}.acc'
-
-        with open(accuracy_path, 'r') as file:
-            accuracy = float(file.read())
-
-        return accuracy
-
     def start_training(self):
-        """Add to the list of running trainers if max_concurrency has not yet
-        been reached."""
-        time.sleep(random.random() * 2)
-        trainer_count = Trainer.run_sql_statement(
-            "SELECT COUNT(*) FROM trainers")
-
-        while trainer_count >= Config().trainer.max_concurrency:
-            time.sleep(random.random() * 2)
-            trainer_count = Trainer.run_sql_statement(
-                "SELECT COUNT(*) FROM trainers")
+        """Wait for one of the max_concurrency training slots on this machine, which are
+        granted by the trainer scheduler in the order they were requested."""
+        if hasattr(Config().trainer, 'max_concurrency'):
+            self.training_slot = TokenClient.acquire()
 
-        Trainer.run_sql_statement("INSERT INTO trainers VALUES (?)",
-                                  (self.client_id, ))
+    def stop_training(self):
+        """Free the training slot, so that the next trainer waiting for one may start."""
+        if hasattr(Config().trainer, 'max_concurrency'):
+            TokenClient.release(self.training_slot)
 
     def pause_training(self):
-        """Remove from the list of running trainers."""
-        Trainer.run_sql_statement("DELETE FROM trainers WHERE run_id = (?)",
-                                  (self.client_id, ))
-
-        model_name = Config().trainer.model_name
-        model_dir = Config().params['model_dir']
-        model_file = f"{model_dir}{model_name}_{self.client_id}_{Config().params['run_id']}.pth"
-        accuracy_file = f"{model_dir}{model_name}_{self.client_id}_{Config().params['run_id']}.acc"
-
-        if os.path.exists(model_file):
-            os.remove(model_file)
-
-        if os.path.exists(accuracy_file):
-            os.remove(accuracy_file)
+        """Free the training slot once training or testing is done."""
+        self.stop_training()
 
     @abstractmethod
     def train(self, trainset, sampler, cut_layer=None) -> Tuple[bool, float]:
@@ -3,7 +3,6 @@ The training and testing loops for PyTorch.
 """
 import asyncio
 import logging
-import multiprocessing as mp
 import os
 import time
 
@@ -13,7 +12,7 @@ import torch.nn as nn
 import wandb
 from plato.config import Config
 from plato.models import registry as models_registry
-from plato.trainers import base
+from plato.trainers import base, evaluation, loaders, worker
 from plato.utils import optimizers
 
 
@@ -39,6 +38,29 @@ class Trainer(base.Trainer):
         else:
             self.model = model
 
+        # The data loaders kept across rounds, along with their worker processes
+        self.data_loaders = loaders.Loaders()
+
+        # The test set tested on the server, with its examples and labels as tensors
+        self.test_cache = None
+        # The processes testing shards of the test set on the server
+        self.test_pool = None
+
+    def __getstate__(self):
+        """The data loaders and the test set kept on the server are not sent along
+        with the trainer."""
+        state = self.__dict__.copy()
+        state['data_loaders'] = loaders.Loaders()
+        state['test_cache'] = None
+        state['test_pool'] = None
+        return state
+
+    def run_in_worker(self, method, config, dataset, *args):
+        """Runs a training or testing loop in the worker process granted to this trainer
+        as its training slot."""
+        return worker.run(self.training_slot, method, self, config, dataset,
+                          *args)
+
     def zeros(self, shape):
         """Returns a PyTorch zero tensor with the given shape."""
         # This should only be called from a server
@@ -88,8 +110,7 @@ class Trainer(base.Trainer):
 
     def train_process(self, config, trainset, sampler, cut_layer=None):
         """The main training loop in a federated learning workload, run in
-          a separate process with a new CUDA context, so that CUDA memory
-          can be released after the training completes.
+          a worker process of the machine if max_concurrency is set.
 
         Arguments:
         self: the trainer itself.
@@ -120,11 +141,14 @@ class Trainer(base.Trainer):
                     train_loader = self.train_loader(batch_size, trainset,
                                                      sampler.get(), cut_layer)
                 else:
-                    train_loader = torch.utils.data.DataLoader(
-                        dataset=trainset,
-                        shuffle=False,
-                        batch_size=batch_size,
-                        sampler=sampler.get())
+                    train_loader = self.data_loaders.get(
+                        'train',
+                        trainset,
+                        batch_size,
+                        sampler=sampler.get,
+                        partition=(type(sampler).__module__,
+                                   getattr(sampler, 'client_id', None),
+                                   sampler.trainset_size()))
 
                 iterations_per_epoch = np.ceil(len(trainset) /
                                                batch_size).astype(int)
@@ -201,11 +225,6 @@ class Trainer(base.Trainer):
 
         self.model.cpu()
 
-        if 'max_concurrency' in config:
-            model_type = config['model_name']
-            filename = f"{model_type}_{self.client_id}_{config['run_id']}.pth"
-            self.save_model(filename)
-
         if 'use_wandb' in config:
             run.finish()
 
@@ -228,29 +247,11 @@ class Trainer(base.Trainer):
             self.start_training()
             tic = time.perf_counter()
 
-            if mp.get_start_method(allow_none=True) != 'spawn':
-                mp.set_start_method('spawn', force=True)
-
-            train_proc = mp.Process(target=Trainer.train_process,
-                                    args=(
-                                        self,
-                                        config,
-                                        trainset,
-                                        sampler,
-                                        cut_layer,
-                                    ))
-            train_proc.start()
-            train_proc.join()
-
-            model_name = Config().trainer.model_name
-            filename = f"{model_name}_{self.client_id}_{Config().params['run_id']}.pth"
-
             try:
-                self.load_model(filename)
-            except OSError as error:  # the model file is not found, training failed
-                if hasattr(Config().trainer, 'max_concurrency'):
-                    self.run_sql_statement("DELETE FROM trainers WHERE run_id = (?)",
-                                        (self.client_id, ))
+                self.run_in_worker('train_process', config, trainset, sampler,
+                                   cut_layer)
+            except (RuntimeError, EOFError, OSError) as error:
+                self.stop_training()
                 raise ValueError(f"Training on client {self.client_id} failed.") from error
 
             toc = time.perf_counter()
@@ -265,8 +266,8 @@ class Trainer(base.Trainer):
         return training_time
 
     def test_process(self, config, testset):
-        """The testing loop, run in a separate process with a new CUDA context,
-        so that CUDA memory can be released after the training completes.
+        """The testing loop, run in a worker process of the machine if
+        max_concurrency is set.
 
         Arguments:
         config: a dictionary of configuration parameters.
@@ -281,36 +282,18 @@ class Trainer(base.Trainer):
             if callable(custom_test):
                 accuracy = self.test_model(config, testset)
             else:
-                test_loader = torch.utils.data.DataLoader(
-                    testset, batch_size=config['batch_size'], shuffle=False)
-
-                correct = 0
-                total = 0
-
-                with torch.no_grad():
-                    for examples, labels in test_loader:
-                        examples, labels = examples.to(self.device), labels.to(
-                            self.device)
-
-                        outputs = self.model(examples)
-
-                        _, predicted = torch.max(outputs.data, 1)
-                        total += labels.size(0)
-                        correct += (predicted == labels).sum().item()
-
-                accuracy = correct / total
+                test_loader = self.data_loaders.get(
+                    'test', testset,
+                    config.get('test_batch_size', config['batch_size']))
+                accuracy = evaluation.count_correct(
+                    self.model, test_loader, self.device) / len(testset)
         except Exception as testing_exception:
             logging.info("Testing on client #%d failed.", self.client_id)
             raise testing_exception
 
         self.model.cpu()
 
-        if 'max_concurrency' in config:
-            model_name = config['model_name']
-            filename = f"{model_name}_{self.client_id}_{config['run_id']}.acc"
-            Trainer.save_accuracy(accuracy, filename)
-        else:
-            return accuracy
+        return accuracy
 
     def test(self, testset) -> float:
         """Testing the model using the provided test dataset.
@@ -324,23 +307,10 @@ class Trainer(base.Trainer):
         if hasattr(Config().trainer, 'max_concurrency'):
             self.start_training()
 
-            if mp.get_start_method(allow_none=True) != 'spawn':
-                mp.set_start_method('spawn', force=True)
-
-            proc = mp.Process(target=Trainer.test_process,
-                            args=(
-                                self,
-                                config,
-                                testset,
-                            ))
-            proc.start()
-            proc.join()
-
             try:
-                model_name = Config().trainer.model_name
-                filename = f"{model_name}_{self.client_id}_{Config().params['run_id']}.acc"
-                accuracy = Trainer.load_accuracy(filename)
-            except OSError as error:  # the model file is not found, training failed
+                accuracy = self.run_in_worker('test_process', config, testset)
+            except (RuntimeError, EOFError, OSError) as error:
+                self.stop_training()
                 raise ValueError(f"Testing on client #{self.client_id} failed.") from error
 
             self.pause_training()
@@ -350,7 +320,8 @@ class Trainer(base.Trainer):
         return accuracy
 
     async def server_test(self, testset):
-        """Testing the model on the server using the provided test dataset.
+        """Testing the model on the server using the provided test dataset, in a
+        separate thread so that the server keeps serving its clients meanwhile.
 
         Arguments:
         testset: The test dataset.
@@ -358,6 +329,17 @@ class Trainer(base.Trainer):
         config = Config().trainer._asdict()
         config['run_id'] = Config().params['run_id']
 
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.server_test_process,
+                                          config, testset)
+
+    def server_test_process(self, config, testset):
+        """The testing loop on the server.
+
+        Arguments:
+        config: a dictionary of configuration parameters.
+        testset: The test dataset.
+        """
         self.model.to(self.device)
         self.model.eval()
 
@@ -366,24 +348,59 @@ class Trainer(base.Trainer):
         if callable(custom_test):
             return self.test_model(config, testset)
 
-        test_loader = torch.utils.data.DataLoader(
-            testset, batch_size=config['batch_size'], shuffle=False)
+        batch_size = config.get('test_batch_size', config['batch_size'])
+        test_tensors = self.test_tensors(testset, batch_size)
+
+        if test_tensors is None:
+            test_loader = self.data_loaders.get('test', testset, batch_size)
+            return evaluation.count_correct(self.model, test_loader,
+                                            self.device) / len(testset)
+
+        examples, labels = test_tensors
+        processes = Config().server.test_processes if hasattr(
+            Config().server, 'test_processes') else 1
+
+        if processes > 1 and self.device == 'cpu':
+            if self.test_pool is None:
+                self.test_pool = evaluation.pool(processes)
+
+            threads = max(1, torch.get_num_threads() // processes)
+            shards = [
+                self.test_pool.submit(evaluation.count_correct_shard,
+                                      self.model, shard_examples, shard_labels,
+                                      batch_size, threads)
+                for shard_examples, shard_labels in zip(
+                    torch.tensor_split(examples, processes),
+                    torch.tensor_split(labels, processes))
+            ]
+            correct = sum(shard.result() for shard in shards)
+        else:
+            correct = evaluation.count_correct(
+                self.model, evaluation.split(examples, labels, batch_size),
+                self.device)
 
-        correct = 0
-        total = 0
+        return correct / len(labels)
 
-        with torch.no_grad():
-            for examples, labels in test_loader:
-                examples, labels = examples.to(self.device), labels.to(
-                    self.device)
+    def test_tensors(self, testset, batch_size):
+        """Returns the examples and the labels of the test set tested on the server as
+        two tensors, which are built on first use and kept in shared memory, or None if
+        the test set is not kept in memory.
 
-                outputs = self.model(examples)
+        Arguments:
+        testset: The test dataset.
+        batch_size: The batch size used to load the test set.
+        """
+        if self.test_cache is None or self.test_cache[0] is not testset:
+            max_size = Config().server.test_cache_size if hasattr(
+                Config().server,
+                'test_cache_size') else evaluation.TEST_CACHE_SIZE
+            test_tensors = evaluation.tensorize(testset, batch_size,
+                                                max_size * 1024**2)
 
-                _, predicted = torch.max(outputs.data, 1)
-                total += labels.size(0)
-                correct += (predicted == labels).sum().item()
+            if test_tensors is not None:
+                for tensor in test_tensors:
+                    tensor.share_memory_()
 
-                # Yield to other tasks in the server
-                await asyncio.sleep(0)
+            self.test_cache = (testset, test_tensors)
 
-        return correct / total
+        return self.test_cache[1]
@@ -0,0 +1,106 @@
+"""
+Evaluating models on test sets kept in memory as tensors.
+
+A test set is loaded and transformed once, into one tensor holding all its examples and
+one holding all its labels, which are then reused to test the model in each round.
+This assumes that the test set is transformed deterministically, as the test sets of
+all the datasources are. Test sets whose tensors would be larger than test_cache_size
+(in MB) in the server configuration are loaded anew in each round instead.
+
+Models are tested under torch.inference_mode, in batches of test_batch_size examples in
+the trainer configuration. On servers testing on CPUs, the test set can also be
+divided into shards tested concurrently by a pool of test_processes processes, among
+which the available threads are divided.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import torch
+import torch.multiprocessing as mp
+
+from plato.trainers import loaders
+
+# The default limit on the size of the tensors of a test set kept in memory, in MB
+TEST_CACHE_SIZE = 1024
+
+
+def tensorize(dataset, batch_size, max_size):
+    """Returns the examples and the labels of a dataset as two tensors, or None if
+    they are not tensors or if their size would exceed max_size bytes."""
+    loader = torch.utils.data.DataLoader(dataset,
+                                         batch_size=batch_size,
+                                         shuffle=False,
+                                         **loaders.options())
+    examples = []
+    labels = []
+
+    for batch_examples, batch_labels in loader:
+        if not torch.is_tensor(batch_examples) or not torch.is_tensor(
+                batch_labels):
+            return None
+
+        if len(examples) == 0 and batch_examples.element_size(
+        ) * batch_examples[0].nelement() * len(dataset) > max_size:
+            return None
+
+        examples.append(batch_examples)
+        labels.append(batch_labels)
+
+    return torch.cat(examples), torch.cat(labels)
+
+
+def count_correct(model, batches, device) -> int:
+    """Returns the number of examples in batches of examples and labels which the model
+    classifies correctly."""
+    correct = 0
+
+    with torch.inference_mode():
+        for examples, labels in batches:
+            examples, labels = examples.to(device), labels.to(device)
+            outputs = model(examples)
+
+            _, predicted = torch.max(outputs, 1)
+            correct += (predicted == labels).sum().item()
+
+    return correct
+
+
+def split(examples, labels, batch_size):
+    """Yields the batches of examples and labels kept as tensors."""
+    for start in range(0, len(examples), batch_size):
+        yield examples[start:start + batch_size], labels[start:start +
+                                                         batch_size]
+
+
+def count_correct_shard(model, examples, labels, batch_size, threads) -> int:
+    """Returns the number of examples in a shard of a test set which the model
+    classifies correctly, in a process of the pool testing the shards."""
+    torch.set_num_threads(threads)
+    return count_correct(model, split(examples, labels, batch_size), 'cpu')
+
+
+def watch_parent(parent_pid):
+    """Exits once the process that started this one has exited."""
+    while os.getppid() == parent_pid:
+        time.sleep(1)
+
+    os._exit(0)
+
+
+def start_watching_parent(parent_pid):
+    """Starts watching the process that started this one from a daemon thread, as the
+    processes of a pool are not told when the process owning the pool exits without
+    shutting it down, as servers do."""
+    threading.Thread(target=watch_parent, args=(parent_pid, ),
+                     daemon=True).start()
+
+
+def pool(processes):
+    """Returns a pool of processes testing shards of test sets, which receive tensors
+    through shared memory."""
+    return ProcessPoolExecutor(max_workers=processes,
+                               mp_context=mp.get_context('spawn'),
+                               initializer=start_watching_parent,
+                               initargs=(os.getpid(), ))
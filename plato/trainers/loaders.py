@@ -0,0 +1,112 @@
+"""
+Data loaders for the trainers, configured in the trainer configuration and reused
+across rounds.
+
+The loaders are configured with:
+    num_workers: the number of processes loading batches for each loader, or auto for
+        the available cores divided among the clients training at the same time on
+        this machine. The default is 0, where batches are loaded in the training process.
+    prefetch_factor: the number of batches loaded in advance by each worker.
+    persistent_workers: whether the workers are kept running between epochs, and
+        between rounds as the loader is reused. The default is true with workers.
+    pin_memory: whether batches are copied into pinned memory, for faster transfers to
+        CUDA devices.
+"""
+import multiprocessing as mp
+import os
+
+import torch
+
+from plato.config import Config
+
+
+def available_cores() -> int:
+    """Returns the number of cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+def num_workers() -> int:
+    """Returns the number of worker processes of each loader."""
+    workers = Config().trainer.num_workers if hasattr(Config().trainer,
+                                                      'num_workers') else 0
+
+    if workers == 'auto':
+        # The cores are shared by the clients training at the same time, each of which
+        # keeps a core for its own training loop
+        if hasattr(Config().trainer, 'max_concurrency'):
+            colocated_clients = Config().trainer.max_concurrency
+        else:
+            colocated_clients = Config().clients.per_round
+
+        workers = max(0, available_cores() // max(1, colocated_clients) - 1)
+
+    if workers > 0 and mp.current_process().daemon:
+        # The worker processes of trainers, which are daemonic, cannot start processes
+        # of their own, and load batches themselves
+        workers = 0
+
+    return int(workers)
+
+
+def options() -> dict:
+    """Returns the options of the data loaders in the trainer configuration."""
+    workers = num_workers()
+    loader_options = {
+        'num_workers':
+        workers,
+        'pin_memory':
+        hasattr(Config().trainer, 'pin_memory') and Config().trainer.pin_memory
+    }
+
+    if workers > 0:
+        loader_options['persistent_workers'] = Config(
+        ).trainer.persistent_workers if hasattr(
+            Config().trainer, 'persistent_workers') else True
+
+        if hasattr(Config().trainer, 'prefetch_factor'):
+            loader_options['prefetch_factor'] = Config().trainer.prefetch_factor
+
+    return loader_options
+
+
+class Loaders:
+    """The data loaders of a trainer, one of each kind, such as 'train' or 'test'.
+
+    A loader with persistent workers is kept and reused as long as it loads the same
+    dataset for the same partition with the same batch size, so that its workers are
+    started only once. Other loaders are cheap to create, and are created anew.
+    """
+    def __init__(self):
+        self.loaders = {}
+
+    def get(self, kind, dataset, batch_size, sampler=None, partition=None):
+        """Returns a data loader of a kind for a dataset.
+
+        Arguments:
+        kind: the kind of loader.
+        dataset: the dataset to load.
+        batch_size: the batch size.
+        sampler: a function returning the sampler of the loader, if any.
+        partition: a key identifying the partition drawn by the sampler.
+        """
+        key = (id(dataset), batch_size, partition)
+
+        if kind in self.loaders and self.loaders[kind][1] == key:
+            return self.loaders[kind][0]
+
+        loader = torch.utils.data.DataLoader(
+            dataset=dataset,
+            shuffle=False,
+            batch_size=batch_size,
+            sampler=sampler() if sampler is not None else None,
+            **options())
+
+        if loader.persistent_workers:
+            self.loaders[kind] = (loader, key)
+        else:
+            self.loaders.pop(kind, None)
+
+        return loader
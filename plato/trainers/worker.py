@@ -0,0 +1,206 @@
+"""
+The worker processes running the training and testing loops of the trainers on a
+machine, used when max_concurrency is specified.
+
+The server starts a pool of max_concurrency worker processes, each serving requests on
+a Unix domain socket, and the trainer scheduler grants them to the trainers as their
+training slots: a trainer holding a slot sends its requests to that worker process.
+Thus no more than max_concurrency processes hold models and datasets, or a CUDA
+context, however many clients are running on the machine.
+
+The model weights are exchanged through shared memory: the trainer moves its model to
+shared memory and sends itself with each request, which only transfers handles to the
+weights. Once the request completes, the worker copies the weights back into shared
+memory if they have been moved elsewhere, such as to a GPU. Datasets are only sent to
+a worker process that does not have them yet, and each keeps the last datasets_kept it
+received. The datasets of the data sources in the registry are the same in all the
+clients on a machine with the same data configuration, so they are kept under the name
+and fingerprint of their data source, and a single copy of them serves all the clients.
+"""
+import logging
+import multiprocessing as mp
+import os
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from multiprocessing.connection import Client, Listener
+
+import torch
+
+from plato.trainers import evaluation
+
+# The number of datasets kept in each worker process, unless datasets_kept is specified
+DATASETS_KEPT = 4
+
+# The datasets in this process which could not be given a key as an attribute, along
+# with their keys, kept alive so that their IDs are not reused
+_unnamed_datasets = {}
+
+
+def set_dataset_key(dataset, key):
+    """Sets the key under which the worker processes keep a dataset, which is shared by
+    the same dataset in all the processes on the machine."""
+    if dataset is not None:
+        try:
+            dataset.worker_key = key
+        except AttributeError:
+            pass
+
+
+def dataset_key(dataset):
+    """Returns the key under which the worker processes keep a dataset, drawing one for
+    this process if it was not given any."""
+    key = getattr(dataset, 'worker_key', None)
+    if key is None:
+        key = uuid.uuid4().hex
+        try:
+            dataset.worker_key = key
+        except AttributeError:
+            key = _unnamed_datasets.setdefault(id(dataset), (dataset, key))[1]
+    return key
+
+
+def serve(address, parent_pid, ready, datasets_kept):
+    """The main loop of a worker process, serving the trainers granted it one at a time,
+    until the process that started it is gone."""
+    evaluation.start_watching_parent(parent_pid)
+
+    # The socket of a worker process that was restarted is left behind
+    if os.path.exists(address):
+        os.unlink(address)
+
+    listener = Listener(address,
+                        family='AF_UNIX',
+                        authkey=mp.current_process().authkey)
+    ready.set()
+    datasets = OrderedDict()
+
+    while True:
+        try:
+            connection = listener.accept()
+        except (mp.AuthenticationError, OSError):
+            continue
+
+        with connection:
+            try:
+                serve_request(connection, datasets, datasets_kept)
+            except (EOFError, OSError):
+                pass
+
+        # The memory cached on the GPU is released between requests
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+
+def serve_request(connection, datasets, datasets_kept):
+    """Runs trainer.method(config, dataset, *args) for a trainer, asking for the dataset
+    first if it is not kept in this worker process."""
+    method, trainer, config, key, dataset, args = connection.recv()
+
+    if dataset is None and key not in datasets:
+        connection.send(('missing', None))
+        method, trainer, config, key, dataset, args = connection.recv()
+
+    if dataset is not None:
+        datasets[key] = dataset
+        if len(datasets) > datasets_kept:
+            datasets.popitem(last=False)
+
+    datasets.move_to_end(key)
+    shared_weights = trainer.model.state_dict()
+
+    try:
+        result = getattr(trainer, method)(config, datasets[key], *args)
+
+        for name, weight in trainer.model.state_dict().items():
+            if weight.data_ptr() != shared_weights[name].data_ptr():
+                shared_weights[name].copy_(weight)
+
+    except Exception:  # pylint: disable=broad-except
+        logging.info("Worker process #%d failed.", mp.current_process().pid)
+        connection.send(('failed', traceback.format_exc()))
+    else:
+        connection.send(('done', result))
+
+
+def run(address, method, trainer, config, dataset, *args):
+    """Runs trainer.method(config, dataset, *args) in the worker process listening on
+    the given address, and returns its result."""
+    key = dataset_key(dataset)
+    trainer.model.share_memory()
+
+    with Client(address, family='AF_UNIX',
+                authkey=mp.current_process().authkey) as connection:
+        connection.send((method, trainer, config, key, None, args))
+        status, result = connection.recv()
+
+        if status == 'missing':
+            connection.send((method, trainer, config, key, dataset, args))
+            status, result = connection.recv()
+
+    if status == 'failed':
+        raise RuntimeError(result)
+
+    return result
+
+
+class Pool:
+    """The worker processes of a machine, each listening on a socket in a private
+    directory, which are restarted if they exit."""
+    def __init__(self, processes, datasets_kept=DATASETS_KEPT):
+        self.datasets_kept = datasets_kept
+        self.context = mp.get_context('spawn')
+        directory = tempfile.mkdtemp(prefix='plato_')
+        self.addresses = [
+            os.path.join(directory, f'worker_{index}.sock')
+            for index in range(processes)
+        ]
+        self.processes = [None] * processes
+
+    def start(self):
+        """Start the worker processes, and return once they are all listening."""
+        starting = [
+            self.start_worker(index) for index in range(len(self.addresses))
+        ]
+        for index, ready in enumerate(starting):
+            self.wait_until_ready(index, ready)
+
+        threading.Thread(target=self.watch, daemon=True).start()
+
+    def start_worker(self, index):
+        """Start the worker process listening on the address with the given index, and
+        return the event it sets once listening."""
+        ready = self.context.Event()
+        self.processes[index] = self.context.Process(
+            target=serve,
+            args=(self.addresses[index], os.getpid(), ready,
+                  self.datasets_kept),
+            daemon=True)
+        self.processes[index].start()
+        return ready
+
+    def wait_until_ready(self, index, ready):
+        """Wait until the worker process with the given index is listening."""
+        while not ready.wait(1):
+            if not self.processes[index].is_alive():
+                raise RuntimeError(
+                    f"Worker process #{self.processes[index].pid} failed to start."
+                )
+
+    def watch(self):
+        """Restart the worker processes which have exited, such as after running out of
+        memory, so that their training slots remain usable."""
+        while True:
+            time.sleep(1)
+
+            for index, process in enumerate(self.processes):
+                if not process.is_alive():
+                    logging.warning("Worker process #%d exited; restarting it.",
+                                    process.pid)
+                    try:
+                        self.wait_until_ready(index, self.start_worker(index))
+                    except RuntimeError as error:
+                        logging.warning(error)
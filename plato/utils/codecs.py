@@ -0,0 +1,363 @@
+"""
+A pipeline of codecs applied to the payloads exchanged between clients and servers.
+
+The pipeline is configured as a list of codec names in the algorithm configuration,
+such as codecs: [fp16, qsgd_4bit, zstd], and is applied in order when a payload is
+sent. Tensor codecs replace each floating-point tensor in the payload with its encoded
+form, and are followed by any byte codecs, which compress the serialized payload
+losslessly. Encoded payloads are self-describing, so that they are decoded by the
+receiver regardless of its own configuration.
+
+Tensor codecs:
+    fp16, bf16: half-precision floating point.
+    int8, int4, int2, int1: quantization between the minimum and the maximum of each
+        output channel, with the quantized values bit-packed.
+    qsgd_8bit, qsgd_4bit, qsgd_2bit: stochastic, unbiased quantization of buckets of
+        512 values relative to their L2 norms (QSGD), with the signed values bit-packed.
+
+Byte codecs:
+    zlib, zstd: lossless compression, where zstd requires the zstandard package.
+"""
+import zlib
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import torch
+
+from plato.config import Config
+from plato.utils import serialization
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# A tensor replaced by the fields of its encoded form
+Encoded = namedtuple('Encoded', ['codec', 'fields'])
+
+# A serialized payload compressed by a byte codec
+Compressed = namedtuple('Compressed', ['codec', 'data'])
+
+
+def pack(values, bits):
+    """Packs unsigned integers smaller than 2 ** bits into bytes, where bits is
+    1, 2, 4 or 8."""
+    values = values.to(torch.uint8)
+
+    if bits == 8:
+        return values
+
+    per_byte = 8 // bits
+    values = torch.cat([values,
+                        values.new_zeros(-len(values) % per_byte)]).view(
+                            -1, per_byte)
+    shifts = torch.arange(0, 8, bits, dtype=torch.uint8)
+
+    return (values << shifts).sum(dim=1, dtype=torch.uint8)
+
+
+def unpack(packed, bits, count):
+    """Unpacks count unsigned integers of the given number of bits from bytes."""
+    if bits == 8:
+        return packed[:count]
+
+    shifts = torch.arange(0, 8, bits, dtype=torch.uint8)
+    values = (packed.unsqueeze(1) >> shifts) & (2**bits - 1)
+
+    return values.flatten()[:count]
+
+
+class TensorCodec:
+    """Base class for codecs encoding each floating-point tensor in a payload."""
+    name = None
+    lossless = False
+
+    def applies(self, tensor) -> bool:
+        """Whether this codec encodes the tensor."""
+        return tensor.is_floating_point() and tensor.numel() > 0
+
+    def encode(self, tensor) -> dict:
+        """Returns the fields of the encoded tensor."""
+        raise NotImplementedError
+
+    def decode(self, fields):
+        """Returns the tensor decoded from its fields."""
+        raise NotImplementedError
+
+
+class HalfPrecision(TensorCodec):
+    """Converting tensors to a 16-bit floating-point data type."""
+    def __init__(self, name, dtype):
+        self.name = name
+        self.dtype = dtype
+
+    def applies(self, tensor) -> bool:
+        return super().applies(tensor) and tensor.element_size() > 2
+
+    def encode(self, tensor) -> dict:
+        return {
+            'tensor': tensor.detach().to(self.dtype),
+            'dtype': str(tensor.dtype).split('.')[-1]
+        }
+
+    def decode(self, fields):
+        return fields['tensor'].to(getattr(torch, fields['dtype']))
+
+
+class ChannelQuantizer(TensorCodec):
+    """Quantizing each output channel of a tensor, which is its first dimension,
+    uniformly between its minimum and maximum values."""
+    def __init__(self, bits):
+        self.name = f'int{bits}'
+        self.bits = bits
+
+    def encode(self, tensor) -> dict:
+        channels = tensor.detach().float().reshape(
+            tensor.shape[0] if tensor.dim() > 1 else 1, -1)
+
+        low = channels.min(dim=1, keepdim=True).values
+        scale = (channels.max(dim=1, keepdim=True).values - low) / (
+            2**self.bits - 1)
+        scale[scale == 0] = 1
+
+        levels = ((channels - low) / scale).round_()
+
+        return {
+            'levels': pack(levels.flatten(), self.bits),
+            'low': low.flatten(),
+            'scale': scale.flatten(),
+            'shape': tuple(tensor.shape),
+            'dtype': str(tensor.dtype).split('.')[-1]
+        }
+
+    def decode(self, fields):
+        channels = len(fields['low'])
+        count = int(np.prod(fields['shape'], dtype=np.int64))
+        levels = unpack(fields['levels'], self.bits,
+                        count).view(channels, -1).float()
+        values = levels * fields['scale'].unsqueeze(1) + fields['low'].unsqueeze(
+            1)
+
+        return values.view(fields['shape']).to(getattr(torch, fields['dtype']))
+
+
+class QSGD(TensorCodec):
+    """Stochastic quantization of a tensor to 2 ** (bits - 1) - 1 levels of magnitude
+    relative to the L2 norm of each bucket of its values, with a sign, which is
+    unbiased in expectation.
+
+    Reference: D. Alistarh et al., "QSGD: Communication-Efficient SGD via Gradient
+    Quantization and Encoding," NeurIPS 2017.
+    """
+    def __init__(self, bits, bucket_size=512):
+        self.name = f'qsgd_{bits}bit'
+        self.bits = bits
+        self.levels = 2**(bits - 1) - 1
+        self.bucket_size = bucket_size
+
+        # The rounding of each process is independent of the others
+        self.generator = torch.Generator()
+        self.generator.seed()
+
+    def encode(self, tensor) -> dict:
+        values = tensor.detach().float().flatten()
+        buckets = torch.cat(
+            [values, values.new_zeros(-len(values) % self.bucket_size)]).view(
+                -1, self.bucket_size)
+        norms = buckets.norm(dim=1, keepdim=True)
+
+        scaled = buckets.abs() / norms.clamp(min=torch.finfo().tiny) * self.levels
+        levels = scaled.floor()
+        levels += torch.rand(scaled.shape,
+                             generator=self.generator) < scaled - levels
+        levels *= buckets.sign()
+
+        return {
+            'levels': pack(levels.flatten() + self.levels, self.bits),
+            'norms': norms.flatten(),
+            'shape': tuple(tensor.shape),
+            'dtype': str(tensor.dtype).split('.')[-1]
+        }
+
+    def decode(self, fields):
+        count = int(np.prod(fields['shape'], dtype=np.int64))
+        levels = unpack(fields['levels'], self.bits,
+                        len(fields['norms']) * self.bucket_size).float()
+        values = (levels.view(-1, self.bucket_size) - self.levels) * (
+            fields['norms'].unsqueeze(1) / self.levels)
+
+        return values.flatten()[:count].view(fields['shape']).to(
+            getattr(torch, fields['dtype']))
+
+
+class ByteCodec:
+    """Base class for codecs compressing a serialized payload losslessly."""
+    name = None
+    lossless = True
+
+    def compress(self, buffers) -> bytes:
+        """Returns the compressed concatenation of the buffers."""
+        raise NotImplementedError
+
+    def decompress(self, data) -> bytes:
+        """Returns the decompressed data."""
+        raise NotImplementedError
+
+
+class Zlib(ByteCodec):
+    """Compressing payloads with zlib."""
+    name = 'zlib'
+
+    def compress(self, buffers) -> bytes:
+        compressor = zlib.compressobj(1)
+        compressed = [compressor.compress(buffer) for buffer in buffers]
+        compressed.append(compressor.flush())
+        return b''.join(compressed)
+
+    def decompress(self, data) -> bytes:
+        return zlib.decompress(data)
+
+
+class Zstd(ByteCodec):
+    """Compressing payloads with Zstandard."""
+    name = 'zstd'
+
+    def __init__(self):
+        if zstandard is None:
+            raise ValueError(
+                'The zstd codec requires the zstandard package to be installed.')
+
+    def compress(self, buffers) -> bytes:
+        compressor = zstandard.ZstdCompressor().compressobj()
+        compressed = [compressor.compress(buffer) for buffer in buffers]
+        compressed.append(compressor.flush())
+        return b''.join(compressed)
+
+    def decompress(self, data) -> bytes:
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+registered_codecs = OrderedDict([
+    ('fp16', lambda: HalfPrecision('fp16', torch.float16)),
+    ('bf16', lambda: HalfPrecision('bf16', torch.bfloat16)),
+    ('int8', lambda: ChannelQuantizer(8)),
+    ('int4', lambda: ChannelQuantizer(4)),
+    ('int2', lambda: ChannelQuantizer(2)),
+    ('int1', lambda: ChannelQuantizer(1)),
+    ('qsgd_8bit', lambda: QSGD(8)),
+    ('qsgd_4bit', lambda: QSGD(4)),
+    ('qsgd_2bit', lambda: QSGD(2)),
+    ('zlib', Zlib),
+    ('zstd', Zstd),
+])
+
+# The codecs instantiated so far, reused for encoding and decoding
+_codecs = {}
+
+
+def get_codec(name):
+    """Get the codec with the provided name."""
+    if name not in _codecs:
+        if name not in registered_codecs:
+            raise ValueError('No such codec: {}'.format(name))
+
+        _codecs[name] = registered_codecs[name]()
+
+    return _codecs[name]
+
+
+def get(names=None) -> list:
+    """Get the pipeline of codecs with the provided names, or the pipeline in the
+    algorithm configuration if no names are provided."""
+    if names is None:
+        names = Config().algorithm.codecs if hasattr(Config().algorithm,
+                                                     'codecs') else []
+
+        if isinstance(names, str):
+            names = [name.strip() for name in names.split(',')]
+
+    pipeline = [get_codec(name) for name in names]
+
+    for codec, next_codec in zip(pipeline, pipeline[1:]):
+        if isinstance(codec, ByteCodec) and isinstance(next_codec, TensorCodec):
+            raise ValueError(
+                'Tensor codecs must precede byte codecs, but {} follows {}.'.
+                format(next_codec.name, codec.name))
+
+    return pipeline
+
+
+def is_lossless(pipeline=None) -> bool:
+    """Whether a payload is decoded exactly as it was before being encoded."""
+    if pipeline is None:
+        pipeline = get()
+
+    return all(codec.lossless for codec in pipeline)
+
+
+def _map_tensors(obj, function):
+    """Applies a function to each tensor in a payload, including the fields of
+    encoded tensors."""
+    if isinstance(obj, torch.Tensor):
+        return function(obj)
+
+    if isinstance(obj, Encoded):
+        return Encoded(obj.codec, _map_tensors(obj.fields, function))
+
+    if isinstance(obj, dict):
+        return type(obj)(
+            (key, _map_tensors(value, function)) for key, value in obj.items())
+
+    if isinstance(obj, (list, tuple)) and not hasattr(obj, '_fields'):
+        return type(obj)(_map_tensors(item, function) for item in obj)
+
+    return obj
+
+
+def _decode_tensors(obj):
+    """Decodes the encoded tensors in a payload, innermost encodings first."""
+    if isinstance(obj, Encoded):
+        return get_codec(obj.codec).decode(_decode_tensors(obj.fields))
+
+    if isinstance(obj, dict):
+        return type(obj)(
+            (key, _decode_tensors(value)) for key, value in obj.items())
+
+    if isinstance(obj, (list, tuple)) and not hasattr(obj, '_fields'):
+        return type(obj)(_decode_tensors(item) for item in obj)
+
+    return obj
+
+
+def dumps(payload, pipeline=None) -> list:
+    """Encodes a payload with a pipeline of codecs, and then serializes it as a list
+    of buffers."""
+    if pipeline is None:
+        pipeline = get()
+
+    for codec in pipeline:
+        if isinstance(codec, TensorCodec):
+            payload = _map_tensors(
+                payload, lambda tensor, codec=codec: Encoded(
+                    codec.name, codec.encode(tensor))
+                if codec.applies(tensor) else tensor)
+
+    encoded = serialization.dumps(payload)
+
+    for codec in pipeline:
+        if isinstance(codec, ByteCodec):
+            compressed = np.frombuffer(codec.compress(encoded), dtype=np.uint8)
+            encoded = serialization.dumps(Compressed(codec.name, compressed))
+
+    return encoded
+
+
+def loads(data):
+    """Deserializes a payload from a bytes-like object, and decodes it."""
+    payload = serialization.loads(data)
+
+    while isinstance(payload, Compressed):
+        payload = serialization.loads(
+            bytearray(get_codec(payload.codec).decompress(payload.data)))
+
+    return _decode_tensors(payload)
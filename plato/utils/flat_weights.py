@@ -0,0 +1,174 @@
+"""
+Flattening model weights into contiguous vectors, so that updates from many clients
+can be aggregated with a few batched PyTorch operations on a [clients, parameters]
+matrix, rather than with Python loops over the clients and the tensors in each model.
+
+Compressed updates are added into flat vectors directly: sparse updates, which only
+contain some of the values of each tensor, are scattered, and low-rank updates from all
+the clients are multiplied out with a single matrix product for each tensor.
+"""
+
+from collections import OrderedDict
+from collections.abc import Sequence
+
+import torch
+
+
+class CompressedUpdate:
+    """Base class for model weight updates sent in a compressed form."""
+    def names(self):
+        """Returns the names of the weights included in the update."""
+        raise NotImplementedError
+
+
+class SparseUpdate(CompressedUpdate):
+    """A model weight update with only some of its values: for each tensor, the indices
+    of these values in the flattened tensor, and the values. All the other values of the
+    update are zeros."""
+    def __init__(self, indices, values):
+        self.indices = indices
+        self.values = values
+
+    def names(self):
+        return list(self.indices)
+
+
+class LowRankUpdate(CompressedUpdate):
+    """A model weight update in which each tensor reshaped to a [rows, columns] matrix
+    is approximated by the product of factors P [rows, rank] and Q [columns, rank]
+    transposed, except for the tensors that are included as they are."""
+    def __init__(self, factors, values):
+        self.factors = factors
+        self.values = values
+
+    def names(self):
+        return list(self.factors) + list(self.values)
+
+
+class WeightsLayout:
+    """The layout of named model weights in a flat vector: the offset, shape and
+    data type of each tensor."""
+    def __init__(self, weights):
+        self.names = list(weights.keys())
+        self.shapes = OrderedDict()
+        self.dtypes = OrderedDict()
+        self.slices = OrderedDict()
+
+        offset = 0
+        for name, weight in weights.items():
+            self.shapes[name] = weight.shape
+            self.dtypes[name] = weight.dtype
+            self.slices[name] = slice(offset, offset + weight.numel())
+            offset += weight.numel()
+
+        self.size = offset
+
+        # All the weights are stored as floating point numbers in the flat vector
+        floating_dtypes = [
+            dtype for dtype in self.dtypes.values() if dtype.is_floating_point
+        ]
+        self.dtype = torch.float64 if torch.float64 in floating_dtypes else torch.float32
+
+    def matches(self, weights) -> bool:
+        """Whether the weights provided can be flattened with this layout."""
+        if isinstance(weights, CompressedUpdate):
+            return all(name in self.slices for name in weights.names())
+
+        return len(weights) == len(self.names) and all(
+            name in weights and weights[name].shape == shape
+            for name, shape in self.shapes.items())
+
+    def flatten(self, weights, out=None):
+        """Copies the weights into a flat vector."""
+        if out is None:
+            out = torch.empty(self.size, dtype=self.dtype)
+
+        if isinstance(weights, SparseUpdate):
+            out.zero_()
+            return self.scatter_add(weights, out)
+
+        if isinstance(weights, LowRankUpdate):
+            out.zero_()
+            return self.add_low_rank([weights], [1], out)
+
+        for name, segment in self.slices.items():
+            out[segment].copy_(weights[name].reshape(-1))
+
+        return out
+
+    def scatter_add(self, update, out, alpha=1):
+        """Adds a sparse update, multiplied by alpha, into a flat vector."""
+        if len(update.indices) > 0:
+            indices = torch.cat([
+                indices.reshape(-1).long() + self.slices[name].start
+                for name, indices in update.indices.items()
+            ])
+            values = torch.cat([
+                update.values[name].reshape(-1).to(self.dtype)
+                for name in update.indices
+            ])
+            out.index_add_(0, indices, values, alpha=alpha)
+
+        return out
+
+    def add_low_rank(self, updates, coefficients, out):
+        """Adds the weighted sum of low-rank updates into a flat vector. The factors of
+        each tensor from all the updates are concatenated, so that the sum is computed
+        with one matrix product, without computing each update separately."""
+        factors = OrderedDict()
+
+        for update, coefficient in zip(updates, coefficients):
+            for name, (p_factor, q_factor) in update.factors.items():
+                p_factors, q_factors = factors.setdefault(name, ([], []))
+                p_factors.append(p_factor.to(self.dtype) * coefficient)
+                q_factors.append(q_factor.to(self.dtype))
+
+            for name, value in update.values.items():
+                out[self.slices[name]].add_(value.reshape(-1).to(self.dtype),
+                                            alpha=coefficient)
+
+        for name, (p_factors, q_factors) in factors.items():
+            product = torch.cat(p_factors, dim=1) @ torch.cat(q_factors,
+                                                               dim=1).t()
+            out[self.slices[name]] += product.reshape(-1)
+
+        return out
+
+    def stack(self, weights_list):
+        """Copies the weights from each client into a row of a [clients, parameters] matrix."""
+        if isinstance(weights_list, WeightUpdates) and weights_list.layout is self:
+            return weights_list.matrix
+
+        matrix = torch.empty(len(weights_list), self.size, dtype=self.dtype)
+        for row, weights in zip(matrix, weights_list):
+            self.flatten(weights, out=row)
+
+        return matrix
+
+    def unflatten(self, vector, cast=False):
+        """Returns the named weights as views into a flat vector, cast back to their
+        original data types if requested."""
+        weights = OrderedDict()
+
+        for name, segment in self.slices.items():
+            weight = vector[segment].view(self.shapes[name])
+            weights[name] = weight.to(self.dtypes[name]) if cast else weight
+
+        return weights
+
+
+class WeightUpdates(Sequence):
+    """Weight updates from multiple clients, stored as the rows of a [clients, parameters]
+    matrix. Each item is a dictionary of named views into its row."""
+    def __init__(self, matrix, layout):
+        self.matrix = matrix
+        self.layout = layout
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return WeightUpdates(self.matrix[index], self.layout)
+
+        return self.layout.unflatten(self.matrix[index])
@@ -1,75 +1,282 @@
 """
-Utilities to transmit Python objects to and from an S3-compatible object storage service.
+Utilities to transmit payloads to and from an S3-compatible object storage service, or
+a local directory standing in for one.
+
+Payloads are uploaded as the buffers produced by the codecs, without joining them:
+to S3 in parts of s3_part_size bytes uploaded concurrently, reusing one pooled client
+per process, and downloaded with parallel ranged requests into a preallocated buffer,
+from which they are decoded directly.
+
+The object store is configured in the server configuration with s3_endpoint_url and
+s3_bucket. An endpoint URL such as file:///tmp/plato selects a local directory, in
+which the bucket is a subdirectory, so that payloads can be exchanged through the file
+system without an S3 service.
+
+Otherwise, with shared_memory in the server configuration, the server and the client
+processes it starts on the same machine exchange payloads through files in shared
+memory, which the receiver maps rather than reads, so that each payload is written
+once and never pickled or sent over a socket.
 """
 
+import io
+import mmap
+import os
 import pickle
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
+from urllib.parse import urlparse
 
 import boto3
-import botocore
+import botocore.config
+import botocore.exceptions
 import requests
+from boto3.s3.transfer import TransferConfig
 
 from plato.config import Config
 
+# The default size of each part of the payloads uploaded or downloaded
+PART_SIZE = 8 * 1024**2
+# The default number of parts uploaded or downloaded concurrently
+MAX_CONCURRENCY = 10
 
-def send_to_s3(object_key, object_to_send) -> str:
-    """ Sends an object to an S3-compatible object storage service.
 
-        All S3-related credentials, such as the access key and the secret key,
-        are assumed to be stored in ~/.aws/credentials by using the 'aws configure'
-        command.
+class BuffersReader(io.RawIOBase):
+    """A readable file-like object over a sequence of buffers, read in order."""
+    def __init__(self, buffers):
+        super().__init__()
+        self.buffers = [memoryview(buffer).cast('B') for buffer in buffers]
+        self.index = 0
+        self.offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        buffer = memoryview(buffer).cast('B')
+        size = 0
+
+        while size < len(buffer) and self.index < len(self.buffers):
+            current = self.buffers[self.index]
+            count = min(len(buffer) - size, len(current) - self.offset)
+            buffer[size:size + count] = current[self.offset:self.offset + count]
+            size += count
+            self.offset += count
+
+            if self.offset == len(current):
+                self.index += 1
+                self.offset = 0
+
+        return size
+
+
+class ObjectStore:
+    """Base class for the stores to which payloads are uploaded, and from which they
+    are downloaded with the URLs returned."""
+    def send(self, object_key, buffers) -> str:
+        """Uploads the buffers of an encoded payload as one object, and returns its URL."""
+        raise NotImplementedError
+
+    def receive(self, url) -> bytearray:
+        """Downloads an object into a buffer."""
+        raise NotImplementedError
+
+    def delete(self, url) -> None:
+        """Deletes an object that is no longer needed."""
+        raise NotImplementedError
 
-        Returns: A presigned URL for use later to retrieve the data.
+
+class S3ObjectStore(ObjectStore):
+    """An S3-compatible object storage service.
+
+    All S3-related credentials, such as the access key and the secret key, are assumed
+    to be stored in ~/.aws/credentials by using the 'aws configure' command.
     """
-    if hasattr(Config().server,
-                   's3_endpoint_url') and hasattr(Config().server, 's3_bucket'):
-        s3_client = boto3.client('s3', endpoint_url=Config().server.s3_endpoint_url)
+    def __init__(self, endpoint_url, bucket, part_size=PART_SIZE,
+                 max_concurrency=MAX_CONCURRENCY):
+        self.bucket = bucket
+        self.part_size = part_size
+        self.s3_client = boto3.session.Session().client(
+            's3',
+            endpoint_url=endpoint_url,
+            config=botocore.config.Config(
+                max_pool_connections=2 * max_concurrency))
+        self.transfer_config = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    def send(self, object_key, buffers) -> str:
+        try:
+            self.s3_client.upload_fileobj(BuffersReader(buffers),
+                                          self.bucket,
+                                          object_key,
+                                          Config=self.transfer_config)
+        except botocore.exceptions.ClientError as error:
+            raise ValueError(
+                'Error occurred sending data to S3: {}'.format(error)) from error
+
+        return 's3://{}/{}'.format(self.bucket, object_key)
+
+    def get_range(self, bucket, object_key, start, end):
+        """Returns the response to a request for a range of bytes of an object."""
+        return self.s3_client.get_object(Bucket=bucket,
+                                         Key=object_key,
+                                         Range='bytes={}-{}'.format(
+                                             start, end - 1))
+
+    def receive(self, url) -> bytearray:
+        parsed_url = urlparse(url)
+        bucket, object_key = parsed_url.netloc, parsed_url.path.lstrip('/')
 
         try:
-            # Does the object key exist already in S3?
-            s3_client.head_object(Bucket=Config().server.s3_bucket, Key=object_key)
-        except botocore.exceptions.ClientError:
-            try:
-                # Only send the object if the key does not exist yet
-                _data = pickle.dumps(object_to_send)
+            # The first part also tells the size of the object
+            response = self.get_range(bucket, object_key, 0, self.part_size)
+            size = int(
+                re.match(r'bytes \d+-\d+/(\d+)',
+                         response['ContentRange']).group(1))
+
+            buffer = bytearray(size)
+            view = memoryview(buffer)
+            first_part = response['Body'].read()
+            view[:len(first_part)] = first_part
+
+            def receive_part(start):
+                end = min(start + self.part_size, size)
+                view[start:end] = self.get_range(bucket, object_key, start,
+                                                 end)['Body'].read()
 
-                put_url = s3_client.generate_presigned_url(
-                        ClientMethod='put_object',
-                        Params={'Bucket': Config().server.s3_bucket, 'Key': object_key},
-                        ExpiresIn=300)
-                response = requests.put(put_url, data=_data)
+            list(
+                self.executor.map(receive_part,
+                                  range(len(first_part), size,
+                                        self.part_size)))
+        except botocore.exceptions.ClientError as error:
+            raise ValueError('Error occurred receiving data from S3: {}'.format(
+                error)) from error
 
-                if response.status_code != 200:
-                    raise ValueError('Error occurred sending data: status code = {}'.format(
-                        response.status_code)) from None
+        return buffer
 
-            except botocore.exceptions.ClientError as error:
-                raise ValueError('Error occurred sending data to S3: {}'.format(error)) from error
+    def delete(self, url) -> None:
+        parsed_url = urlparse(url)
+        self.s3_client.delete_object(Bucket=parsed_url.netloc,
+                                     Key=parsed_url.path.lstrip('/'))
 
-            except botocore.exceptions.ParamValidationError as error:
-                raise ValueError('Incorrect parameters: {}'.format(error)) from error
 
-        get_url = s3_client.generate_presigned_url(
-            ClientMethod='get_object',
-            Params={'Bucket': Config().server.s3_bucket, 'Key': object_key},
-            ExpiresIn=300)
+class FileObjectStore(ObjectStore):
+    """A local directory standing in for an object storage service, shared by the
+    clients and the server running on the same machine or on a shared file system."""
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        os.makedirs(self.path, exist_ok=True)
 
-        return get_url
+    def send(self, object_key, buffers) -> str:
+        path = os.path.join(self.path, object_key)
 
-    raise ValueError('s3_endpoint_url and s3_bucket are not found in the configuration.')
+        # Objects appear in full, or not at all
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'wb') as file:
+            for buffer in buffers:
+                file.write(buffer)
+        os.replace(temp_path, path)
 
-def receive_from_s3(presigned_url) -> Any:
-    """ Retrieves an object from an S3-compatible object storage service.
+        return 'file://' + path
 
-        All S3-related credentials, such as the access key and the secret key,
-        are assumed to be stored in ~/.aws/credentials by using the 'aws configure'
-        command.
+    def receive(self, url) -> bytearray:
+        path = urlparse(url).path
+
+        with open(path, 'rb') as file:
+            buffer = bytearray(os.fstat(file.fileno()).st_size)
+            file.readinto(buffer)
+
+        return buffer
+
+    def delete(self, url) -> None:
+        try:
+            os.remove(urlparse(url).path)
+        except FileNotFoundError:
+            pass
+
+
+class SharedMemoryObjectStore(FileObjectStore):
+    """A directory in shared memory, such as /dev/shm, whose files are mapped by the
+    receiver. Payloads are decoded on top of private copy-on-write mappings, so that
+    none of their data is copied unless it is modified."""
+    def receive(self, url) -> mmap.mmap:
+        with open(urlparse(url).path, 'rb') as file:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+
+
+# The object store of this process, whose connections are reused for all payloads
+_store = None
+
+
+def get() -> ObjectStore:
+    """Get the object store in the server configuration, or None if payloads are sent
+    using socket.io."""
+    global _store
+
+    if _store is None and hasattr(Config().server, 'shared_memory') and Config(
+    ).server.shared_memory and not hasattr(Config().server, 's3_bucket'):
+        # The server and its clients share a directory named after the server's port
+        shared_path = '/dev/shm' if os.path.isdir(
+            '/dev/shm') else tempfile.gettempdir()
+        _store = SharedMemoryObjectStore(
+            os.path.join(shared_path, 'plato-{}'.format(Config().server.port)))
+
+    if _store is None and hasattr(Config().server,
+                                  's3_endpoint_url') and hasattr(
+                                      Config().server, 's3_bucket'):
+        endpoint_url = Config().server.s3_endpoint_url
+        bucket = Config().server.s3_bucket
+
+        if endpoint_url.startswith('file://'):
+            _store = FileObjectStore(
+                os.path.join(urlparse(endpoint_url).path, bucket))
+        else:
+            part_size = Config().server.s3_part_size if hasattr(
+                Config().server, 's3_part_size') else PART_SIZE
+            max_concurrency = Config().server.s3_max_concurrency if hasattr(
+                Config().server, 's3_max_concurrency') else MAX_CONCURRENCY
+            _store = S3ObjectStore(endpoint_url, bucket, part_size,
+                                   max_concurrency)
+
+    return _store
+
+
+def send_to_s3(object_key, object_to_send) -> str:
+    """ Sends an object to the object store in the configuration.
+
+        Returns: A URL for use later to retrieve the data.
+    """
+    if get() is None:
+        raise ValueError(
+            's3_endpoint_url and s3_bucket are not found in the configuration.')
+
+    return get().send(object_key, [pickle.dumps(object_to_send)])
+
+
+# The session for presigned URLs, whose connections are reused
+_session = None
+
+
+def receive_from_s3(url) -> Any:
+    """ Retrieves an object sent with send_to_s3(), or from a presigned URL.
 
         Returns: The object to be retrieved.
     """
-    response = requests.get(presigned_url)
-    if response.status_code == 200:
+    global _session
+
+    if urlparse(url).scheme in ('http', 'https'):
+        if _session is None:
+            _session = requests.Session()
+
+        response = _session.get(url)
+        if response.status_code != 200:
+            raise ValueError(
+                'Error occurred receiving data: request status code = {}'.
+                format(response.status_code))
         return pickle.loads(response.content)
-    else:
-        raise ValueError('Error occurred sending data: request status code = {}'.format(
-            response.status_code))
+
+    return pickle.loads(get().receive(url))
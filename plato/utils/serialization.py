@@ -0,0 +1,192 @@
+"""
+A tensor-aware wire format for payloads exchanged between clients and servers.
+
+A payload is encoded as a small header, followed by the raw contiguous buffers of
+all the tensors (or NumPy arrays) found in the payload. The header contains the
+payload with each tensor replaced by a reference, as well as the data type, shape,
+and location of every tensor buffer. The tensor buffers are memoryviews of the
+tensors' own storage, so that no copies are made while encoding. On the receiving
+side, tensors are rebuilt with torch.frombuffer() on top of the received bytes,
+again without making any copies.
+"""
+
+import io
+import pickle
+import struct
+
+import numpy as np
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+MAGIC = b'PLT1'
+PREAMBLE = struct.Struct('<4sQ')
+
+# Tensor buffers are aligned so that they can be used in-place by the receiver
+ALIGNMENT = 64
+
+
+def _padding(size) -> int:
+    """Returns the number of bytes needed to align the given size."""
+    return -size % ALIGNMENT
+
+
+def _is_tensor(obj) -> bool:
+    """Whether the object is a dense PyTorch tensor that can be sent as a raw buffer."""
+    return torch is not None and isinstance(
+        obj, torch.Tensor
+    ) and obj.layout == torch.strided and not obj.is_quantized
+
+
+def _is_array(obj) -> bool:
+    """Whether the object is a NumPy array that can be sent as a raw buffer."""
+    return isinstance(obj, np.ndarray) and not obj.dtype.hasobject
+
+
+class _Pickler(pickle.Pickler):
+    """A pickler that moves tensor and array data out of the pickled stream."""
+    def __init__(self, file, buffers, descriptors):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.buffers = buffers
+        self.descriptors = descriptors
+
+    def persistent_id(self, obj):
+        if _is_tensor(obj):
+            tensor = obj.detach().cpu().contiguous()
+            descriptor = ('tensor', str(tensor.dtype).split('.')[-1],
+                          tuple(tensor.shape), obj.requires_grad,
+                          isinstance(obj, torch.nn.Parameter))
+            if tensor.numel() > 0:
+                buffer = memoryview(tensor.reshape(-1).view(
+                    torch.uint8).numpy())
+            else:
+                buffer = memoryview(b'')
+        elif _is_array(obj):
+            array = np.ascontiguousarray(obj)
+            descriptor = ('ndarray', array.dtype.str, array.shape, False,
+                          False)
+            buffer = memoryview(array.reshape(-1).view(np.uint8))
+        else:
+            return None
+
+        self.descriptors.append(descriptor + (len(buffer), ))
+        self.buffers.append(buffer)
+        return len(self.descriptors) - 1
+
+
+class _Unpickler(pickle.Unpickler):
+    """An unpickler that rebuilds tensors and arrays on top of a received buffer."""
+    def __init__(self, file, data, descriptors, offsets):
+        super().__init__(file)
+        self.data = data
+        self.descriptors = descriptors
+        self.offsets = offsets
+
+    def persistent_load(self, pid):
+        kind, dtype, shape, requires_grad, is_parameter, size = self.descriptors[
+            pid]
+        offset = self.offsets[pid]
+
+        if kind == 'ndarray':
+            return np.frombuffer(self.data, dtype=np.uint8, count=size,
+                                 offset=offset).view(dtype).reshape(shape)
+
+        dtype = getattr(torch, dtype)
+        if size == 0:
+            tensor = torch.empty(shape, dtype=dtype)
+        else:
+            tensor = torch.frombuffer(self.data,
+                                      dtype=torch.uint8,
+                                      count=size,
+                                      offset=offset).view(dtype).reshape(shape)
+
+        if is_parameter:
+            return torch.nn.Parameter(tensor, requires_grad=requires_grad)
+
+        return tensor.requires_grad_(requires_grad)
+
+
+def dumps(payload) -> list:
+    """Encodes a payload as a list of buffers, without copying any tensor data.
+
+    The buffers are to be sent (or written) back to back; their concatenation is
+    the encoded payload.
+    """
+    buffers = []
+    descriptors = []
+    stream = io.BytesIO()
+    _Pickler(stream, buffers, descriptors).dump(payload)
+
+    header = pickle.dumps((stream.getvalue(), descriptors),
+                          protocol=pickle.HIGHEST_PROTOCOL)
+    preamble = PREAMBLE.pack(MAGIC, len(header))
+
+    encoded = [preamble, header]
+    size = len(preamble) + len(header)
+    for buffer in buffers:
+        padding = _padding(size)
+        if padding > 0:
+            encoded.append(bytes(padding))
+        encoded.append(buffer)
+        size += padding + len(buffer)
+
+    return encoded
+
+
+def loads(data):
+    """Decodes a payload from a bytes-like object.
+
+    Tensors in the decoded payload share memory with the data provided, which
+    should therefore be a writable buffer (such as a bytearray) if the tensors
+    are to be modified in-place.
+    """
+    magic, header_size = PREAMBLE.unpack_from(data)
+
+    if magic != MAGIC:
+        raise ValueError('Unrecognized payload format.')
+
+    header_start = PREAMBLE.size
+    skeleton, descriptors = pickle.loads(
+        memoryview(data)[header_start:header_start + header_size])
+
+    offsets = []
+    size = header_start + header_size
+    for descriptor in descriptors:
+        size += _padding(size)
+        offsets.append(size)
+        size += descriptor[-1]
+
+    return _Unpickler(io.BytesIO(skeleton), data, descriptors,
+                      offsets).load()
+
+
+def nbytes(buffers) -> int:
+    """Returns the total size of an encoded payload in bytes."""
+    return sum(memoryview(buffer).nbytes for buffer in buffers)
+
+
+def chunks(buffers, chunk_size):
+    """Slices an encoded payload into chunks of at most chunk_size bytes each."""
+    chunk = bytearray()
+
+    for buffer in buffers:
+        view = memoryview(buffer).cast('B')
+
+        while len(view) > 0:
+            if len(chunk) == 0 and len(view) >= chunk_size:
+                yield bytes(view[:chunk_size])
+                view = view[chunk_size:]
+                continue
+
+            room = chunk_size - len(chunk)
+            chunk += view[:room]
+            view = view[room:]
+
+            if len(chunk) == chunk_size:
+                yield bytes(chunk)
+                chunk = bytearray()
+
+    if len(chunk) > 0:
+        yield bytes(chunk)
@@ -0,0 +1,81 @@
+"""
+Streaming encoded payloads between clients and servers as chunks over socket.io.
+
+Each chunk carries its offset in the payload and the size of the entire payload, so
+that the receiver reassembles the payload in a buffer preallocated once the first
+chunk arrives, regardless of the order in which chunks are handled. The receiver
+acknowledges each chunk, and the sender keeps at most a window of chunks in flight,
+so that it neither floods the connection nor moves on before all of the chunks have
+been received.
+"""
+
+import asyncio
+
+from plato.utils import serialization
+
+# The default size of each chunk in bytes
+CHUNK_SIZE = 1024**2
+
+# The default number of chunks in flight without an acknowledgement
+WINDOW = 8
+
+
+class Reassembler:
+    """Reassembles a payload from the chunks received."""
+    def __init__(self):
+        self.buffer = None
+        self.received = 0
+
+    def add(self, data, offset, size) -> None:
+        """Copy a chunk into place, allocating the buffer for the payload first if
+        this is the first chunk of the payload."""
+        if self.buffer is None:
+            self.buffer = bytearray(size)
+
+        self.buffer[offset:offset + len(data)] = data
+        self.received += len(data)
+
+    def complete(self) -> bool:
+        """Whether all the chunks of the payload have been received."""
+        return self.buffer is not None and self.received == len(self.buffer)
+
+    def payload(self) -> bytearray:
+        """Returns the reassembled payload, and starts over for the next one."""
+        assert self.complete()
+
+        payload = self.buffer
+        self.buffer = None
+        self.received = 0
+        return payload
+
+
+async def send_chunks(emit,
+                      encoded_payload,
+                      chunk_size=CHUNK_SIZE,
+                      window=WINDOW,
+                      timeout=None) -> None:
+    """Send an encoded payload as 'chunk' events with emit(event, data, callback),
+    waiting for an acknowledgement whenever window chunks are in flight, and for all
+    the remaining acknowledgements at the end.
+
+    Raises asyncio.TimeoutError if no acknowledgement arrives within timeout seconds.
+    """
+    size = serialization.nbytes(encoded_payload)
+    credits = asyncio.Semaphore(window)
+
+    def acknowledged(*__):
+        credits.release()
+
+    offset = 0
+    for chunk in serialization.chunks(encoded_payload, chunk_size):
+        await asyncio.wait_for(credits.acquire(), timeout)
+        await emit('chunk', {
+            'data': chunk,
+            'offset': offset,
+            'size': size
+        },
+                   callback=acknowledged)
+        offset += len(chunk)
+
+    for __ in range(window):
+        await asyncio.wait_for(credits.acquire(), timeout)
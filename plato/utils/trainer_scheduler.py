@@ -0,0 +1,164 @@
+"""
+A local scheduler that limits the number of trainers running concurrently on a machine
+to max_concurrency, as specified in the trainer configuration.
+
+The server hosts a token server on a Unix domain socket, with max_concurrency tokens,
+which are the training slots on the machine. For PyTorch trainers, each token is the
+address of one of the worker processes running the training and testing loops.
+Before training or testing, a trainer requests a token and blocks until it is granted.
+Tokens are granted in the order they were requested, as soon as one is returned, and
+the tokens held by a trainer are returned automatically if its connection is closed,
+such as when its process exits. Clients started on their own, rather than by a server,
+start a token server of their own, which only schedules the trainers in their process.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+from collections import deque
+from multiprocessing.connection import Client, Listener
+
+from plato.config import Config
+from plato.trainers import worker
+
+# The environment variable through which client processes find the token server
+ADDRESS_VARIABLE = 'PLATO_TRAINER_SCHEDULER'
+
+
+def start(slots):
+    """Start a token server granting the given number of training slots, along with the
+    worker processes behind them for PyTorch trainers, and return it."""
+    if hasattr(Config().trainer, 'use_mindspore') or hasattr(
+            Config().trainer, 'use_tensorflow'):
+        # These trainers train in their own processes
+        pool = None
+        tokens = [None] * slots
+    else:
+        datasets_kept = Config().trainer.datasets_kept if hasattr(
+            Config().trainer, 'datasets_kept') else worker.DATASETS_KEPT
+        pool = worker.Pool(slots, datasets_kept)
+        pool.start()
+        tokens = pool.addresses
+
+    token_server = TokenServer(tokens)
+    token_server.pool = pool
+    token_server.start()
+    return token_server
+
+
+class TokenServer:
+    """A token server granting each of the given tokens to one trainer at a time."""
+    def __init__(self, tokens):
+        self.available = deque(tokens)
+        self.waiting = deque()
+        self.holders = {}
+        self.lock = threading.Lock()
+        # The worker processes whose addresses are the tokens, if any
+        self.pool = None
+
+        # The socket is placed in a private directory, only accessible to this user
+        self.address = os.path.join(tempfile.mkdtemp(prefix='plato_'),
+                                    'trainers.sock')
+        self.listener = Listener(self.address, family='AF_UNIX')
+
+    def start(self):
+        """Start serving in the background, and publish the address of the token server
+        to the processes started after this point."""
+        os.environ[ADDRESS_VARIABLE] = self.address
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        """Accept connections from trainers."""
+        while True:
+            connection = self.listener.accept()
+            threading.Thread(target=self.serve,
+                             args=(connection, ),
+                             daemon=True).start()
+
+    def serve(self, connection):
+        """Serve the requests from a trainer until its connection is closed."""
+        try:
+            while True:
+                request = connection.recv()
+
+                with self.lock:
+                    if request == 'acquire':
+                        self.waiting.append(connection)
+
+                    elif request[0] == 'release' and request[1] in self.holders.get(
+                            connection, []):
+                        self.holders[connection].remove(request[1])
+                        self.available.append(request[1])
+
+                    self.grant_tokens()
+
+        except (EOFError, OSError):
+            pass
+
+        with self.lock:
+            if connection in self.waiting:
+                self.waiting.remove(connection)
+
+            self.available.extend(self.holders.pop(connection, []))
+            self.grant_tokens()
+
+        connection.close()
+
+    def grant_tokens(self):
+        """Grant the free tokens to the trainers that have been waiting the longest.
+        Must be called with the lock held."""
+        while len(self.waiting) > 0 and len(self.available) > 0:
+            connection = self.waiting.popleft()
+
+            try:
+                connection.send(self.available[0])
+            except OSError:
+                continue
+
+            self.holders.setdefault(connection, []).append(
+                self.available.popleft())
+
+
+class TokenClient:
+    """The connections of the trainers in a process to the token server, one for each
+    thread, as a thread waits on its connection until it is granted a token."""
+    local = threading.local()
+    lock = threading.Lock()
+    # The token server started in this process, if none had been started by a server
+    token_server = None
+
+    @classmethod
+    def connect(cls):
+        """Return the connection of this thread to the token server. If no server has
+        started a token server, one is started in this process for its trainers."""
+        if getattr(cls.local, 'connection', None) is None:
+            with cls.lock:
+                if os.environ.get(ADDRESS_VARIABLE) is None:
+                    logging.info(
+                        "[Process #%d] Starting a trainer scheduler for the trainers in "
+                        "this process, as none was started by a server.",
+                        os.getpid())
+                    cls.token_server = start(Config().trainer.max_concurrency)
+
+            cls.local.connection = Client(os.environ[ADDRESS_VARIABLE],
+                                          family='AF_UNIX')
+            cls.local.tokens = []
+
+        return cls.local.connection
+
+    @classmethod
+    def acquire(cls):
+        """Block until a token is granted by the token server, and return it."""
+        connection = cls.connect()
+        connection.send('acquire')
+        token = connection.recv()
+        cls.local.tokens.append(token)
+        return token
+
+    @classmethod
+    def release(cls, token):
+        """Return a token acquired in this thread to the token server."""
+        if token in getattr(cls.local, 'tokens', []):
+            cls.local.tokens.remove(token)
+            cls.local.connection.send(('release', token))
@@ -0,0 +1,174 @@
+"""
+Compressing the model updates sent by clients, with error feedback.
+
+Rather than its model weights, a client sends a compressed form of its update, which is
+the difference between the weights it trained and the weights it received. Whatever
+the compression leaves out of the update is kept by the client as its residual, and is
+added back to its update in the next round it is selected, so that no part of an
+update is lost, only delayed.
+
+The compression is configured in the algorithm configuration:
+    update_compression: topk, where topk_fraction (0.01 by default) is the fraction of
+        the values in each tensor that are sent: those with the largest magnitudes.
+    update_compression: powersgd, where each tensor reshaped to a matrix is sent as
+        factors of rank powersgd_rank (4 by default).
+"""
+import math
+from collections import OrderedDict
+
+import torch
+
+from plato.config import Config
+from plato.utils.flat_weights import LowRankUpdate, SparseUpdate
+
+
+class ErrorFeedback:
+    """The residuals left out of the compressed updates, for each client."""
+    def __init__(self):
+        self.residuals = {}
+
+    def add_residual(self, client_id, update):
+        """Adds the residual of a client to its update, in place."""
+        residual = self.residuals.pop(client_id, None)
+
+        if residual is not None:
+            for name, delta in update.items():
+                if name in residual:
+                    delta += residual[name]
+
+        return update
+
+    def keep_residual(self, client_id, residual):
+        """Keeps the part of an update that has not been sent."""
+        self.residuals[client_id] = residual
+
+
+class TopK:
+    """Sending the values with the largest magnitudes in each tensor of an update."""
+    def __init__(self, fraction):
+        self.fraction = fraction
+        self.error_feedback = ErrorFeedback()
+
+    def compress(self, client_id, weights, baseline_weights):
+        """Returns the sparse update of a client from its trained weights and the
+        weights it started from."""
+        update = OrderedDict(
+            (name, weight.detach().cpu() - baseline_weights[name])
+            for name, weight in weights.items())
+        self.error_feedback.add_residual(client_id, update)
+
+        indices = OrderedDict()
+        values = OrderedDict()
+        residual = OrderedDict()
+
+        for name, delta in update.items():
+            flat_delta = delta.reshape(-1)
+
+            if not delta.is_floating_point() or flat_delta.numel() == 0:
+                # Integer tensors, such as the number of batches tracked, are sent in full
+                indices[name] = torch.arange(flat_delta.numel(),
+                                             dtype=torch.int32)
+                values[name] = flat_delta
+                continue
+
+            k = max(1, math.ceil(self.fraction * flat_delta.numel()))
+            top_indices = flat_delta.abs().topk(k, sorted=False).indices
+
+            indices[name] = top_indices.to(torch.int32)
+            values[name] = flat_delta[top_indices]
+
+            flat_delta[top_indices] = 0
+            residual[name] = delta
+
+        self.error_feedback.keep_residual(client_id, residual)
+
+        return SparseUpdate(indices, values)
+
+
+class PowerSGD:
+    """Approximating each tensor of an update, reshaped to a [rows, columns] matrix M,
+    with factors P [rows, rank] and Q [columns, rank] such that M is close to P Q^T, as
+    computed with one step of power iteration starting from the Q of the client in the
+    previous round it was selected. Tensors that would not be smaller once factored are
+    sent as they are.
+
+    Reference: T. Vogels et al., "PowerSGD: Practical Low-Rank Gradient Compression
+    for Distributed Optimization," NeurIPS 2019.
+    """
+    def __init__(self, rank):
+        self.rank = rank
+        self.error_feedback = ErrorFeedback()
+        # The Q factors of each client, from which power iteration starts next time
+        self.q_factors = {}
+        self.generator = torch.Generator()
+        self.generator.manual_seed(1)
+
+    def compress(self, client_id, weights, baseline_weights):
+        """Returns the low-rank update of a client from its trained weights and the
+        weights it started from."""
+        update = OrderedDict(
+            (name, weight.detach().cpu() - baseline_weights[name])
+            for name, weight in weights.items())
+        self.error_feedback.add_residual(client_id, update)
+
+        q_factors = self.q_factors.setdefault(client_id, {})
+        factors = OrderedDict()
+        values = OrderedDict()
+        residual = OrderedDict()
+
+        for name, delta in update.items():
+            if delta.is_floating_point() and delta.dim() >= 2:
+                matrix = delta.reshape(delta.shape[0], -1)
+                rows, columns = matrix.shape
+                rank = min(self.rank, rows, columns)
+
+                if (rows + columns) * rank < rows * columns:
+                    q_factor = q_factors.get(name)
+                    if q_factor is None or q_factor.shape != (columns, rank):
+                        q_factor = torch.randn(columns,
+                                               rank,
+                                               dtype=matrix.dtype,
+                                               generator=self.generator)
+
+                    p_factor = torch.linalg.qr(matrix @ q_factor).Q
+                    q_factor = matrix.t() @ p_factor
+
+                    q_factors[name] = q_factor
+                    factors[name] = (p_factor, q_factor)
+                    residual[name] = (matrix - p_factor @
+                                      q_factor.t()).view(delta.shape)
+                    continue
+
+            values[name] = delta
+
+        self.error_feedback.keep_residual(client_id, residual)
+
+        return LowRankUpdate(factors, values)
+
+
+# The compressor in this process, shared by all the clients it runs so that the
+# residual of each client is kept across rounds
+_compressor = None
+
+
+def get():
+    """Get the update compressor in the algorithm configuration, or None if client
+    updates are not compressed."""
+    global _compressor
+
+    if _compressor is None and hasattr(Config().algorithm,
+                                       'update_compression'):
+        method = Config().algorithm.update_compression
+
+        if method == 'topk':
+            fraction = Config().algorithm.topk_fraction if hasattr(
+                Config().algorithm, 'topk_fraction') else 0.01
+            _compressor = TopK(fraction)
+        elif method == 'powersgd':
+            rank = Config().algorithm.powersgd_rank if hasattr(
+                Config().algorithm, 'powersgd_rank') else 4
+            _compressor = PowerSGD(rank)
+        else:
+            raise ValueError('No such update compression: {}'.format(method))
+
+    return _compressor
@@ -0,0 +1,69 @@
+"""
+Encoding a version of the model weights as a delta against an earlier version, so that
+a client already holding the earlier version only receives what has changed.
+
+The delta of each tensor is the bitwise XOR of the two versions, which restores the
+newer version exactly, rather than an arithmetic difference that would be subject to
+rounding errors accumulating over rounds. Where weights change little, their sign,
+exponent and leading mantissa bits do not change, so that the XOR is mostly zero bits
+and is compressed well with zlib. Tensors that have not changed are left out.
+"""
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+# The integer types with the same sizes as the data types of the weights
+_BIT_TYPES = {1: torch.uint8, 2: torch.int16, 4: torch.int32, 8: torch.int64}
+
+
+def _bits(tensor):
+    """Returns the bits of a tensor as integers of the same size."""
+    return tensor.detach().cpu().contiguous().view(
+        _BIT_TYPES[tensor.element_size()])
+
+
+def is_encodable(weights) -> bool:
+    """Whether a payload consists of named weights that can be delta-encoded."""
+    return isinstance(weights, dict) and all(
+        isinstance(weight, torch.Tensor) and not weight.is_complex()
+        for weight in weights.values())
+
+
+def matches(weights, base) -> bool:
+    """Whether the weights have the same names, shapes and data types as the base."""
+    return weights.keys() == base.keys() and all(
+        weight.shape == base[name].shape and weight.dtype == base[name].dtype
+        for name, weight in weights.items())
+
+
+def encode(weights, base):
+    """Encodes the weights as a delta against the base weights."""
+    delta = OrderedDict()
+
+    for name, weight in weights.items():
+        bits = _bits(weight) ^ _bits(base[name])
+
+        if bits.any():
+            delta[name] = np.frombuffer(zlib.compress(bits.numpy().tobytes(),
+                                                      1),
+                                        dtype=np.uint8)
+
+    return delta
+
+
+def decode(delta, base):
+    """Decodes the weights from a delta against the base weights."""
+    weights = OrderedDict()
+
+    for name, weight in base.items():
+        if name in delta:
+            bits = _bits(weight)
+            changes = torch.frombuffer(bytearray(zlib.decompress(delta[name])),
+                                       dtype=bits.dtype).view(bits.shape)
+            weights[name] = (bits ^ changes).view(weight.dtype)
+        else:
+            weights[name] = weight
+
+    return weights
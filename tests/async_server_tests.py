@@ -0,0 +1,351 @@
+"""
+Unit tests for the server when a client straggles, in the asynchronous mode and with
+round deadlines or over-selection, against plain synchronous rounds. The simulated
+clients are connected to the server in-process. The throughput of the server in these
+modes is measured by benchmarks/async_server.py.
+"""
+import asyncio
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+import torch
+
+from plato.clients import simple
+from plato.servers import base as base_server
+from plato.servers import fedavg as fedavg_server
+from plato.utils import codecs, s3, serialization, streaming
+
+TOTAL_CLIENTS = 4
+TOTAL_UPDATES = 24
+# The client which only reports once released
+STRAGGLER = 4
+
+
+class InnerProductModel(torch.nn.Module):
+    def __init__(self, n):
+        super().__init__()
+        self.layer = torch.nn.Linear(n, 1, bias=False)
+        self.layer.weight.data = torch.zeros(n)
+
+    def forward(self, x):
+        return self.layer(x)
+
+
+class LocalSocketIO:
+    """ Delivers the server's messages to simulated clients, which send their models
+    back through the server's event handlers right away, apart from the straggler, which
+    waits until it is released. """
+    def __init__(self, server):
+        self.events = base_server.ServerEvents(namespace='/',
+                                               plato_server=server)
+        self.chunks = {}
+        self.tasks = []
+        self.released = asyncio.Event()
+
+    async def emit(self, event, data=None, room=None, callback=None):
+        if event == 'chunk':
+            self.chunks.setdefault(room, []).append(data['data'])
+            callback()
+        elif event == 'payload_done':
+            self.tasks.append(
+                asyncio.create_task(self.train(room, data['id'])))
+
+    async def train(self, sid, client_id):
+        weights = serialization.loads(bytearray().join(self.chunks.pop(sid)))
+        if client_id == STRAGGLER:
+            await self.released.wait()
+        else:
+            await asyncio.sleep(0)
+
+        # Each client moves the model by one unit
+        weights = {name: weight + 1 for name, weight in weights.items()}
+        report = simple.Report(100, 0.5, 0, 0)
+
+        await self.events.on_client_report(sid,
+                                           {'report': pickle.dumps(report)})
+
+        async def emit(event, data, callback):
+            await getattr(self.events, 'on_' + event)(sid, data)
+            callback()
+
+        await streaming.send_chunks(emit,
+                                    serialization.dumps(weights),
+                                    chunk_size=64)
+        await self.events.on_client_payload(sid, {'id': client_id})
+        await self.events.on_client_payload_done(sid, {'id': client_id})
+
+
+class BenchmarkServer(fedavg_server.Server):
+    """ A federated averaging server that stops after aggregating a number of updates. """
+    def __init__(self, **options):
+        super().__init__(model=InnerProductModel(10))
+        self.buffer_size = 2
+        self.total_clients = TOTAL_CLIENTS
+        self.clients_per_round = TOTAL_CLIENTS
+        for name, value in options.items():
+            setattr(self, name, value)
+        self.aggregated_updates = 0
+        # The clients whose updates arrived, in order
+        self.reported = []
+        # The clients whose updates were buffered, with their staleness
+        self.staleness = []
+        # The number of updates received and of clients selected in each round, once
+        # the next round has started
+        self.closed_rounds = []
+        self.done = asyncio.Event()
+        self.load_trainer()
+
+    async def client_payload_done(self, sid, client_id):
+        self.reported.append(client_id)
+        await super().client_payload_done(sid, client_id)
+
+    async def buffer_update(self, report, payload, client_id):
+        await super().buffer_update(report, payload, client_id)
+        self.staleness.append((client_id, report.staleness))
+
+    async def close_round(self):
+        closed_round = (len(self.updates), len(self.selected_clients))
+        await super().close_round()
+        self.closed_rounds.append(closed_round)
+
+    async def process_reports(self):
+        self.aggregated_updates += len(self.updates)
+        await super().process_reports()
+
+    async def wrap_up(self):
+        if self.aggregated_updates >= TOTAL_UPDATES:
+            self.done.set()
+
+
+async def start_clients(server):
+    """ Connects the clients to the server, which starts training them, with the
+    straggler only reporting once released. """
+    server.sio = LocalSocketIO(server)
+    for client_id in range(1, TOTAL_CLIENTS + 1):
+        await server.sio.events.on_client_alive(str(client_id),
+                                                {'id': client_id})
+
+
+async def wait_until(condition):
+    """ Lets the clients and the server run until a condition holds. """
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0)
+
+    await asyncio.wait_for(poll(), timeout=10)
+
+
+async def stop_clients(server):
+    """ Stops the clients still training. """
+    for task in server.sio.tasks:
+        task.cancel()
+    await asyncio.gather(*server.sio.tasks, return_exceptions=True)
+
+
+class AsyncServerTest(unittest.TestCase):
+    def test_straggler(self):
+        """ A straggler holds back the other clients in synchronous rounds, but not in the
+        asynchronous mode, in which its update arrives later, discounted as stale. """
+        async def run(server):
+            await start_clients(server)
+            await wait_until(lambda: len(server.reported) == TOTAL_CLIENTS - 1)
+            # The synchronous round cannot close until the straggler reports
+            for __ in range(10):
+                await asyncio.sleep(0)
+            self.assertEqual(0, server.aggregated_updates)
+            self.assertEqual(1, server.current_round)
+            await stop_clients(server)
+
+        asyncio.run(run(BenchmarkServer()))
+
+        async def run_async(server):
+            await start_clients(server)
+            await wait_until(lambda: server.aggregated_updates >= TOTAL_UPDATES)
+            self.assertNotIn(STRAGGLER, server.reported)
+
+            server.sio.released.set()
+            await wait_until(lambda: STRAGGLER in dict(server.staleness))
+            await stop_clients(server)
+
+        server = BenchmarkServer(asynchronous_mode=True)
+        asyncio.run(run_async(server))
+
+        self.assertEqual(
+            0, min(staleness for __, staleness in server.staleness))
+        self.assertGreater(dict(server.staleness)[STRAGGLER], 0)
+
+    def test_stale_updates(self):
+        """ A stale update is the client's own update, discounted by its staleness. """
+        server = BenchmarkServer(asynchronous_mode=True)
+        server.current_round = 1
+        server.model_versions[1] = {
+            name: weight.clone()
+            for name, weight in server.algorithm.extract_weights().items()
+        }
+        server.algorithm.load_weights(
+            {'layer.weight': torch.full((10, ), 4.)})
+        server.current_round = 3
+
+        report = simple.Report(100, 0.5, 0, 0)
+        report.staleness = 2
+        weights = {'layer.weight': torch.ones(10)}
+        asyncio.run(server.store_update(report, weights))
+
+        update = asyncio.run(server.federated_averaging(server.updates))
+        self.assertTrue(
+            torch.allclose(update['layer.weight'],
+                           torch.ones(10) / 3**server.staleness_exponent))
+
+
+class RoundDeadlineTest(unittest.TestCase):
+    def run_rounds(self, server, rounds):
+        """ Runs the server until a number of rounds have been closed, with the
+        straggler never reporting. """
+        async def run():
+            await start_clients(server)
+            await wait_until(lambda: len(server.closed_rounds) >= rounds)
+            await stop_clients(server)
+
+        asyncio.run(run())
+
+    def test_round_deadline(self):
+        """ A round is closed without the straggler once its deadline expires, and the
+        straggler is not selected again until it reports back. """
+        server = BenchmarkServer(round_deadline=0.5)
+        self.run_rounds(server, 1)
+
+        self.assertEqual((3, 4), server.closed_rounds[0])
+        self.assertEqual({STRAGGLER}, server.straggling_clients)
+        self.assertNotIn(STRAGGLER, server.selected_clients)
+
+    def test_overselection(self):
+        """ A round is closed once clients_per_round of the selected clients report back,
+        and clients still training are not selected again. """
+        server = BenchmarkServer(clients_per_round=3, overselection=0.5)
+        self.run_rounds(server, 2)
+
+        # Training starts once three clients have connected, and all four are
+        # selected in the next round
+        self.assertEqual([(3, 3), (3, 4)], server.closed_rounds[:2])
+        self.assertEqual({STRAGGLER}, server.straggling_clients)
+        self.assertNotIn(STRAGGLER, server.selected_clients)
+
+    def test_payload_snapshot(self):
+        """ The payload of a round is not changed when the global model is updated while
+        it is still being sent to some of the clients. """
+        server = BenchmarkServer()
+        data = server.encode_server_payload(1)
+        server.algorithm.load_weights(
+            {'layer.weight': torch.full((10, ), 4.)})
+
+        self.assertTrue(
+            torch.equal(torch.zeros(10),
+                        codecs.loads(bytearray().join(data[0]))['layer.weight']))
+
+    def test_model_version(self):
+        """ A client holds the version of the model sent to it only once it has received
+        all of the payload. """
+        server = BenchmarkServer(downlink_history=1)
+        server.sio = LocalSocketIO(server)
+        server.clients[1] = {'sid': '1'}
+        server.current_round = 1
+
+        async def send_encoded(sid, data, client_id):
+            return True
+
+        server.send_encoded = send_encoded
+        asyncio.run(server.send_to_client(1, 1))
+        self.assertEqual(1, server.clients[1].get('model_version'))
+
+        async def send_encoded_cut_short(sid, data, client_id):
+            await asyncio.sleep(0)
+            raise ConnectionError
+
+        server.send_encoded = send_encoded_cut_short
+        with self.assertRaises(ConnectionError):
+            asyncio.run(server.send_to_client(1, 1))
+        self.assertNotIn('model_version', server.clients[1])
+
+
+class ClientPayloadServer(BenchmarkServer):
+    """ A server sending each client the global model scaled by its ID. """
+    def customize_client_payload(self, payload, selected_client_id):
+        return {
+            name: weight + selected_client_id
+            for name, weight in payload.items()
+        }
+
+
+class LegacyPayloadServer(BenchmarkServer):
+    """ A server customizing the payload for each client with the signature that
+    customize_server_payload() used to have. """
+    def customize_server_payload(self, payload, selected_client_id):
+        return {
+            name: weight + selected_client_id
+            for name, weight in payload.items()
+        }
+
+
+class ServerPayloadTest(unittest.TestCase):
+    def test_client_payload(self):
+        """ The payload is encoded once in each round for all the clients, unless the
+        server customizes it for each client. """
+        server = BenchmarkServer()
+        self.assertIs(server.encode_server_payload(1),
+                      server.encode_server_payload(2))
+
+        server = ClientPayloadServer()
+        for client_id in (1, 2):
+            data = server.encode_server_payload(client_id)
+            self.assertTrue(
+                torch.equal(
+                    torch.full((10, ), float(client_id)),
+                    codecs.loads(bytearray().join(data[0]))['layer.weight']))
+
+    def test_legacy_server_payload(self):
+        """ A server overriding customize_server_payload() with the ID of the selected
+        client still has its payload encoded for each client, with a warning. """
+        server = LegacyPayloadServer()
+        for client_id in (1, 2):
+            with self.assertWarns(DeprecationWarning):
+                data = server.encode_server_payload(client_id)
+            self.assertTrue(
+                torch.equal(
+                    torch.full((10, ), float(client_id)),
+                    codecs.loads(bytearray().join(data[0]))['layer.weight']))
+
+
+class BroadcastObjectsTest(unittest.TestCase):
+    def test_expiry(self):
+        """ A server payload in the object store is deleted only once all the clients it
+        was sent to have reported back or disconnected, however many rounds later. """
+        server = BenchmarkServer()
+        report = pickle.dumps(simple.Report(100, 0.5, 0, 0))
+
+        async def run(directory):
+            data = server.encode_server_payload(1)
+            for sid in ('1', '2', '3'):
+                await server.upload_encoded(data, sid)
+
+            for __ in range(3):
+                server.expire_broadcast_objects()
+            await server.client_report_arrived('1', report)
+            self.assertEqual(1, len(os.listdir(directory)))
+
+            await server.client_disconnected('2')
+            self.assertEqual(1, len(os.listdir(directory)))
+
+            await server.client_report_arrived('3', report)
+            self.assertEqual([], os.listdir(directory))
+
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch.object(s3, '_store',
+                                   s3.FileObjectStore(directory)):
+                asyncio.run(run(directory))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Unit tests for testing the global model in the background while the next round goes on.
+"""
+import asyncio
+import unittest
+from unittest import mock
+
+import torch
+
+from plato.algorithms import fedavg as fedavg_alg
+from plato.clients import simple
+from plato.config import Config
+from plato.servers import fedavg as fedavg_server
+from plato.trainers import basic
+
+
+class WeightTrainer(basic.Trainer):
+    """A trainer whose test accuracy is the weight of its model in percent, after a
+    delay."""
+    async def server_test(self, testset):
+        await asyncio.sleep(0.01)
+        return self.model.weight.item() / 100
+
+
+async def run_rounds(server, rounds):
+    """Updates the global model in each round, without waiting for the snapshots taken
+    at the end of each round to be tested."""
+    written = []
+    with mock.patch.object(fedavg_server.csv_processor,
+                           'write_csv',
+                           side_effect=lambda __, row: written.append(row)):
+        for round_number in range(1, rounds + 1):
+            server.current_round = round_number
+            server.updates = [(simple.Report(1, 0, 0, 0), None)]
+            server.round_start_time = 0
+            server.algorithm.load_weights(
+                {'weight': torch.tensor([[float(round_number)]])})
+
+            with mock.patch.object(server, 'aggregate_weights'):
+                await server.process_reports()
+            if server.background_evaluation:
+                server.run_after_evaluations(server.reach_target_accuracy)
+
+        if server.evaluation is not None:
+            await server.evaluation
+
+    return written
+
+
+class BackgroundEvaluationTest(unittest.TestCase):
+    """Tests for attributing the accuracy of snapshots to their rounds."""
+    def setUp(self):
+        super().setUp()
+        __ = Config()
+        Config().clients = Config().clients._replace(do_test=False)
+        Config().results = Config.namedtuple_from_dict(
+            {'types': 'accuracy'})
+        Config().result_dir = ''
+
+        self.server = fedavg_server.Server(model=torch.nn.Linear(1, 1, bias=False))
+        self.server.trainer = WeightTrainer(model=self.server.model)
+        self.server.algorithm = fedavg_alg.Algorithm(self.server.trainer)
+        self.server.background_evaluation = True
+        self.server.recorded_items = ['round', 'accuracy']
+
+    def test_rounds(self):
+        """The results of each round are recorded in order, with the accuracy of its
+        snapshot only in the rounds in which one was tested."""
+        self.server.eval_every_n_rounds = 2
+        written = asyncio.run(run_rounds(self.server, 4))
+        self.assertEqual([[1, ''], [2, 2.0], [3, ''], [4, 4.0]], written)
+
+    def test_rounds_in_sync(self):
+        """The accuracy is only recorded in the rounds in which the global model was
+        tested, including the last one, when it is tested before the next round."""
+        self.server.background_evaluation = False
+        self.server.eval_every_n_rounds = 3
+        written = asyncio.run(run_rounds(self.server, 5))
+        self.assertEqual([[1, ''], [2, ''], [3, 3.0], [4, ''], [5, 5.0]],
+                         written)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Unit tests for the pipeline of codecs applied to payloads.
+"""
+import unittest
+from collections import OrderedDict
+
+import torch
+
+from plato.utils import codecs, serialization
+
+
+def round_trip(payload, names):
+    """Returns the payload decoded after encoding it with the codecs, and the size of
+    the encoded payload."""
+    encoded = codecs.dumps(payload, codecs.get(names))
+    return codecs.loads(bytearray().join(encoded)), serialization.nbytes(encoded)
+
+
+class CodecsTest(unittest.TestCase):
+    """Tests for encoding and decoding payloads with codecs."""
+    def setUp(self):
+        super().setUp()
+        torch.manual_seed(1)
+        self.weights = OrderedDict([
+            ('conv.weight', torch.randn(16, 3, 3, 3)),
+            ('conv.bias', torch.randn(16)),
+            ('bn.num_batches_tracked', torch.tensor(5)),
+            ('fc.weight', torch.randn(10, 1000)),
+        ])
+        self.size = serialization.nbytes(serialization.dumps(self.weights))
+
+    def test_bit_packing(self):
+        """Integers are packed into bytes and unpacked exactly."""
+        for bits in [1, 2, 4, 8]:
+            values = torch.randint(0, 2**bits, (1001, ), dtype=torch.uint8)
+            packed = codecs.pack(values, bits)
+            self.assertEqual((1001 * bits + 7) // 8, len(packed))
+            self.assertTrue(
+                torch.equal(values, codecs.unpack(packed, bits, len(values))))
+
+    def test_lossless(self):
+        """Payloads are decoded exactly with byte codecs, with the same structure."""
+        payload = [self.weights, {'round': 3}]
+        decoded, __ = round_trip(payload, ['zlib'])
+
+        self.assertEqual({'round': 3}, decoded[1])
+        self.assertIsInstance(decoded[0], OrderedDict)
+        for name, weight in self.weights.items():
+            self.assertTrue(torch.equal(weight, decoded[0][name]))
+
+    def test_quantization(self):
+        """Quantization errors are bounded by half a step within each channel, and
+        integer tensors are left as they are."""
+        for bits in [8, 4, 2, 1]:
+            decoded, size = round_trip(self.weights, [f'int{bits}'])
+            self.assertLess(size, self.size * (bits + 1) / 32)
+
+            for name, weight in self.weights.items():
+                self.assertEqual(weight.dtype, decoded[name].dtype)
+                self.assertEqual(weight.shape, decoded[name].shape)
+
+            channels = self.weights['fc.weight']
+            step = (channels.max(dim=1).values -
+                    channels.min(dim=1).values) / (2**bits - 1)
+            error = (decoded['fc.weight'] - channels).abs().max(dim=1).values
+            self.assertTrue(torch.all(error <= step / 2 + 1e-5))
+            self.assertTrue(
+                torch.equal(self.weights['bn.num_batches_tracked'],
+                            decoded['bn.num_batches_tracked']))
+
+    def test_qsgd(self):
+        """QSGD is unbiased, and exact for tensors with a single nonzero value."""
+        weight = torch.randn(200)
+        decoded = torch.stack([
+            round_trip({'weight': weight}, ['qsgd_4bit'])[0]['weight']
+            for __ in range(2000)
+        ])
+        self.assertLess((decoded.mean(dim=0) - weight).abs().max(), 0.1)
+
+        onehot = torch.zeros(50)
+        onehot[7] = -2.5
+        decoded, __ = round_trip({'weight': onehot}, ['qsgd_2bit'])
+        self.assertTrue(torch.equal(onehot, decoded['weight']))
+
+    def test_pipeline(self):
+        """Codecs are composed in order, and byte codecs come last."""
+        decoded, size = round_trip(self.weights, ['fp16', 'qsgd_8bit', 'zlib'])
+        self.assertLess(size, self.size / 3)
+        self.assertEqual(torch.float32, decoded['fc.weight'].dtype)
+        error = decoded['fc.weight'] - self.weights['fc.weight']
+        self.assertLess(error.norm() / self.weights['fc.weight'].norm(), 0.15)
+
+        self.assertTrue(codecs.is_lossless(codecs.get(['zlib'])))
+        self.assertFalse(codecs.is_lossless(codecs.get(['fp16', 'zlib'])))
+
+        with self.assertRaises(ValueError):
+            codecs.get(['zlib', 'fp16'])
+        with self.assertRaises(ValueError):
+            codecs.get(['int3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""Unit tests for testing models on test sets kept in memory."""
+import unittest
+
+import torch
+
+from plato.config import Config
+from plato.trainers import evaluation
+
+
+class EvaluationTest(unittest.TestCase):
+    """Tests for converting test sets to tensors and testing models on them."""
+    def setUp(self):
+        super().setUp()
+        __ = Config()
+        torch.manual_seed(1)
+        self.testset = torch.utils.data.TensorDataset(
+            torch.randn(50, 3, 4, 4), torch.randint(0, 10, (50, )))
+        self.model = torch.nn.Sequential(torch.nn.Flatten(),
+                                         torch.nn.Linear(48, 10))
+
+    def test_tensorize(self):
+        """Test sets are kept in memory only if they are small enough."""
+        examples, labels = evaluation.tensorize(self.testset, 16, 50 * 48 * 4)
+        self.assertTrue(torch.equal(self.testset.tensors[0], examples))
+        self.assertTrue(torch.equal(self.testset.tensors[1], labels))
+
+        self.assertIsNone(evaluation.tensorize(self.testset, 16, 50 * 48 * 4 - 1))
+
+    def test_count_correct(self):
+        """Models are tested alike on batches from loaders and from tensors."""
+        examples, labels = self.testset.tensors
+        expected = (self.model(examples).argmax(1) == labels).sum().item()
+
+        loader = torch.utils.data.DataLoader(self.testset, batch_size=7)
+        self.assertEqual(expected,
+                         evaluation.count_correct(self.model, loader, 'cpu'))
+        self.assertEqual(
+            expected,
+            evaluation.count_correct(self.model,
+                                     evaluation.split(examples, labels, 16),
+                                     'cpu'))
+        self.assertEqual(
+            expected,
+            sum(
+                evaluation.count_correct_shard(self.model, shard_examples,
+                                               shard_labels, 16, 1)
+                for shard_examples, shard_labels in zip(
+                    torch.tensor_split(examples, 3),
+                    torch.tensor_split(labels, 3))))
+
+
+if __name__ == '__main__':
+    unittest.main()
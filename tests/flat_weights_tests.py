@@ -0,0 +1,64 @@
+"""
+Unit tests for aggregating model weights as flat vectors.
+"""
+import unittest
+
+import torch
+
+from plato.utils.flat_weights import WeightsLayout, WeightUpdates
+
+
+class FlatWeightsTest(unittest.TestCase):
+    """Tests for flattening, stacking and aggregating model weights."""
+    def setUp(self):
+        super().setUp()
+        torch.manual_seed(1)
+        model = torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3),
+                                    torch.nn.BatchNorm2d(4),
+                                    torch.nn.Flatten(), torch.nn.Linear(4, 2))
+        self.weights = model.state_dict()
+        self.layout = WeightsLayout(self.weights)
+        self.clients = [{
+            name: weight + torch.randn(weight.shape).to(weight.dtype)
+            for name, weight in self.weights.items()
+        } for __ in range(3)]
+
+    def test_round_trip(self):
+        """Unflattening a flattened model restores names, shapes and dtypes."""
+        vector = self.layout.flatten(self.weights)
+        received = self.layout.unflatten(vector, cast=True)
+
+        self.assertEqual(list(self.weights.keys()), list(received.keys()))
+        for name, weight in self.weights.items():
+            self.assertEqual(weight.dtype, received[name].dtype)
+            self.assertTrue(torch.equal(weight, received[name]))
+
+    def test_weighted_average(self):
+        """A matrix product over stacked updates matches a per-tensor weighted sum."""
+        coefficients = [0.2, 0.3, 0.5]
+        matrix = self.layout.stack(self.clients)
+        averaged = self.layout.unflatten(
+            torch.tensor(coefficients, dtype=matrix.dtype) @ matrix)
+
+        for name, weight in self.weights.items():
+            if not weight.dtype.is_floating_point:
+                continue
+            expected = sum(client[name] * coefficient
+                           for client, coefficient in zip(
+                               self.clients, coefficients))
+            self.assertTrue(torch.allclose(expected, averaged[name]))
+
+    def test_weight_updates(self):
+        """Items of stacked updates are views into the rows of the matrix."""
+        updates = WeightUpdates(self.layout.stack(self.clients), self.layout)
+
+        self.assertEqual(3, len(updates))
+        self.assertIs(updates.matrix, self.layout.stack(updates))
+        self.assertEqual(2, len(updates[1:]))
+
+        updates[0]['3.weight'].zero_()
+        self.assertEqual(0, updates.matrix[0, self.layout.slices['3.weight']].abs().sum())
+
+
+if __name__ == '__main__':
+    unittest.main()
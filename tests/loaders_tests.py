@@ -0,0 +1,54 @@
+"""Unit tests for the data loaders of the trainers."""
+import unittest
+from collections import namedtuple
+from unittest import mock
+
+import torch
+
+from plato.config import Config
+from plato.trainers import loaders
+
+
+class LoadersTest(unittest.TestCase):
+    """Tests for configuring and reusing data loaders."""
+    def setUp(self):
+        super().setUp()
+        __ = Config()
+        self.dataset = torch.utils.data.TensorDataset(torch.arange(20.0))
+
+    def set_trainer(self, **options):
+        """Replaces the trainer configuration with the given options."""
+        Config().trainer = namedtuple('trainer', options)(**options)
+
+    def test_auto_workers(self):
+        """The cores are divided among the co-located clients."""
+        with mock.patch.object(loaders, 'available_cores', return_value=16):
+            self.set_trainer(num_workers='auto', max_concurrency=4)
+            self.assertEqual(3, loaders.num_workers())
+
+            self.set_trainer(num_workers='auto', max_concurrency=32)
+            self.assertEqual(0, loaders.num_workers())
+
+    def test_reuse(self):
+        """Loaders with persistent workers are reused for the same partition only."""
+        self.set_trainer(num_workers=1, prefetch_factor=4)
+        data_loaders = loaders.Loaders()
+
+        loader = data_loaders.get('train', self.dataset, 5, partition=1)
+        self.assertTrue(loader.persistent_workers)
+        self.assertEqual(4, loader.prefetch_factor)
+        self.assertEqual(20, sum(len(batch[0]) for batch in loader))
+        self.assertIs(loader,
+                      data_loaders.get('train', self.dataset, 5, partition=1))
+        self.assertIsNot(
+            loader, data_loaders.get('train', self.dataset, 5, partition=2))
+
+        self.set_trainer(num_workers=0)
+        data_loaders = loaders.Loaders()
+        loader = data_loaders.get('test', self.dataset, 5)
+        self.assertEqual(0, loader.num_workers)
+        self.assertIsNot(loader, data_loaders.get('test', self.dataset, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
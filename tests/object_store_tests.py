@@ -0,0 +1,76 @@
+"""
+Unit tests for transmitting payloads through an object store.
+"""
+import os
+import tempfile
+import unittest
+from collections import OrderedDict
+
+import torch
+
+from plato.utils import codecs, s3
+
+
+class ObjectStoreTest(unittest.TestCase):
+    """Tests for uploading and downloading encoded payloads."""
+    def setUp(self):
+        super().setUp()
+        torch.manual_seed(1)
+        self.weights = OrderedDict([
+            ('conv.weight', torch.randn(16, 3, 3, 3)),
+            ('fc.weight', torch.randn(10, 1000)),
+        ])
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = s3.FileObjectStore(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+        super().tearDown()
+
+    def test_buffers_reader(self):
+        """Buffers are read in order, across their boundaries."""
+        buffers = [b'abc', bytearray(b''), memoryview(b'defgh'), b'i']
+        reader = s3.BuffersReader(buffers)
+        self.assertEqual(b'ab', reader.read(2))
+        self.assertEqual(b'cdefg', reader.read(5))
+        self.assertEqual(b'hi', reader.read())
+        self.assertEqual(b'', reader.read(3))
+
+    def test_round_trip(self):
+        """Payloads are decoded exactly from the objects they are uploaded as."""
+        encoded = codecs.dumps(self.weights)
+        url = self.store.send('client_payload_1', encoded)
+        self.assertTrue(url.startswith('file://'))
+
+        decoded = codecs.loads(self.store.receive(url))
+        for name, weight in self.weights.items():
+            self.assertTrue(torch.equal(weight, decoded[name]))
+
+        self.store.delete(url)
+        self.assertEqual([], os.listdir(self.directory.name))
+        self.store.delete(url)
+
+    def test_shared_memory(self):
+        """Payloads are decoded on top of mappings, which are private to the receiver
+        and remain valid after the objects are deleted."""
+        store = s3.SharedMemoryObjectStore(self.directory.name)
+        url = store.send('server_payload_1', codecs.dumps(self.weights))
+
+        decoded = codecs.loads(store.receive(url))
+        decoded['fc.weight'] += 1
+        received = codecs.loads(store.receive(url))
+        store.delete(url)
+        decoded['conv.weight'] += 1
+
+        self.assertTrue(
+            torch.equal(self.weights['fc.weight'] + 1, decoded['fc.weight']))
+        self.assertTrue(
+            torch.equal(self.weights['conv.weight'] + 1,
+                        decoded['conv.weight']))
+        self.assertTrue(
+            torch.equal(self.weights['fc.weight'], received['fc.weight']))
+        self.assertEqual([], os.listdir(self.directory.name))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+Unit tests for the precomputed index of the partitions of a dataset.
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from plato.samplers import partition_index
+
+
+class PartitionIndexTest(unittest.TestCase):
+    """Tests for building a partition index once and looking up partitions."""
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'MNIST_index')
+        generator = np.random.default_rng(1)
+        self.partitions = [
+            generator.permutation(1000)[:size] for size in [50, 0, 120, 7]
+        ]
+        self.builds = 0
+
+    def tearDown(self):
+        partition_index._indices.pop(self.path, None)
+        self.directory.cleanup()
+        super().tearDown()
+
+    def compute_partitions(self):
+        """Returns the partitions, counting how many times they are computed."""
+        self.builds += 1
+        return self.partitions
+
+    def test_lookup(self):
+        """The partition of each client is looked up as it was computed."""
+        index = partition_index.get(self.path, self.compute_partitions)
+
+        self.assertEqual(4, len(index))
+        self.assertEqual(np.int32, index.indices.dtype)
+        for client_id, partition in enumerate(self.partitions, start=1):
+            self.assertTrue(
+                np.array_equal(partition, index.partition(client_id)))
+
+    def test_built_once(self):
+        """The partitions are computed only by the first process needing them."""
+        partition_index.get(self.path, self.compute_partitions)
+        self.assertIs(partition_index.get(self.path, self.compute_partitions),
+                      partition_index._indices[self.path])
+
+        # Another process maps the index already written
+        del partition_index._indices[self.path]
+        index = partition_index.get(self.path, self.compute_partitions)
+
+        self.assertEqual(1, self.builds)
+        self.assertTrue(np.array_equal(self.partitions[2], index.partition(3)))
+        self.assertEqual(
+            [], [name for name in os.listdir(self.path) if 'tmp' in name])
+
+
+if __name__ == '__main__':
+    unittest.main()
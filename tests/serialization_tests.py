@@ -0,0 +1,87 @@
+"""
+Unit tests for the tensor-aware wire format used to transmit payloads between
+clients and servers.
+"""
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+from plato.utils import serialization
+
+
+class SerializationTest(unittest.TestCase):
+    """Tests for encoding and decoding payloads."""
+    @staticmethod
+    def transmit(payload, chunk_size=1000):
+        """Encodes a payload and reassembles it from chunks, as a receiver would."""
+        buffers = serialization.dumps(payload)
+        chunks = list(serialization.chunks(buffers, chunk_size))
+        data = bytearray().join(chunks)
+
+        assert len(data) == serialization.nbytes(buffers)
+        assert all(len(chunk) <= chunk_size for chunk in chunks)
+        return serialization.loads(data)
+
+    def test_state_dict(self):
+        """A state_dict is reconstructed exactly, with names, dtypes and shapes."""
+        model = torch.nn.Sequential(torch.nn.Conv2d(3, 8, 3),
+                                    torch.nn.BatchNorm2d(8),
+                                    torch.nn.Flatten(), torch.nn.Linear(8, 2))
+        weights = model.state_dict()
+        received = SerializationTest.transmit(weights)
+
+        self.assertIsInstance(received, OrderedDict)
+        self.assertEqual(list(weights.keys()), list(received.keys()))
+        for name, weight in weights.items():
+            self.assertEqual(weight.dtype, received[name].dtype)
+            self.assertEqual(weight.shape, received[name].shape)
+            self.assertTrue(torch.equal(weight, received[name]))
+
+        model.load_state_dict(received, strict=True)
+
+    def test_zero_copy_decoding(self):
+        """Decoded tensors share memory with the received buffer."""
+        data = bytearray().join(
+            serialization.dumps({'weight': torch.arange(16.)}))
+        received = serialization.loads(data)
+
+        received['weight'][0] = 42.
+        self.assertEqual(42., serialization.loads(data)['weight'][0].item())
+
+    def test_nested_payload(self):
+        """Tensors nested in lists, tuples and arrays survive a round trip."""
+        payload = [
+            torch.ones(2, 3, dtype=torch.float16),
+            (torch.tensor(7), 'metadata', 3.5),
+            np.arange(10, dtype=np.int32),
+            torch.nn.Parameter(torch.zeros(4)),
+            torch.empty(0, 5),
+            torch.arange(12).reshape(3, 4).t(),
+        ]
+        received = SerializationTest.transmit(payload, chunk_size=7)
+
+        self.assertTrue(torch.equal(payload[0], received[0]))
+        self.assertEqual(7, received[1][0].item())
+        self.assertEqual('metadata', received[1][1])
+        self.assertTrue(np.array_equal(payload[2], received[2]))
+        self.assertIsInstance(received[3], torch.nn.Parameter)
+        self.assertEqual((0, 5), tuple(received[4].shape))
+        self.assertTrue(torch.equal(payload[5], received[5]))
+
+    def test_alignment(self):
+        """Tensor buffers are aligned in the encoded payload."""
+        data = bytearray().join(
+            serialization.dumps([torch.ones(3, dtype=torch.uint8),
+                                 torch.ones(5)]))
+        received = serialization.loads(data)
+        base = np.frombuffer(data, dtype=np.uint8).ctypes.data
+
+        for tensor in received:
+            self.assertEqual(0, (tensor.data_ptr() - base) %
+                             serialization.ALIGNMENT)
+
+
+if __name__ == '__main__':
+    unittest.main()
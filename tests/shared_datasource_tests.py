@@ -0,0 +1,164 @@
+"""
+Unit tests for sharing a decoded data source across processes with array files.
+"""
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+from torchvision import transforms
+
+from plato.config import Config
+from plato.datasources import cifar10, mnist, shared
+
+
+class ImageDataset(torch.utils.data.Dataset):
+    """A dataset of small random images, decoded to PIL images as torchvision does."""
+    def __init__(self, size, transform=None):
+        generator = np.random.default_rng(1)
+        self.data = generator.integers(0, 256, (size, 8, 8, 3), dtype=np.uint8)
+        self.targets = list(generator.integers(0, 3, size))
+        self.classes = ['a', 'b', 'c']
+        self.transform = transform
+        self.target_transform = None
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        example = Image.fromarray(self.data[index])
+        if self.transform is not None:
+            example = self.transform(example)
+        return example, self.targets[index]
+
+
+class ImageDataSource:
+    def __init__(self):
+        self.trainset = ImageDataset(20, transforms.ToTensor())
+        self.testset = None
+
+    def get_train_set(self):
+        return self.trainset
+
+    def get_test_set(self):
+        return self.testset
+
+
+class SharedDataSourceTest(unittest.TestCase):
+    """Tests for decoding a data source once and mapping it from array files."""
+    def setUp(self):
+        super().setUp()
+        self.path = tempfile.mkdtemp()
+        self.datasource = ImageDataSource()
+        shared.DataSource.materialize(self.datasource, self.path)
+
+        with open(os.path.join(self.path, 'metadata.pkl'), 'rb') as metadata:
+            self.splits = pickle.load(metadata)
+
+    def test_examples(self):
+        """The shared examples are transformed as the original examples are."""
+        self.assertIsNone(self.splits['test'])
+        trainset = shared.SharedDataset(os.path.join(self.path, 'train'),
+                                        **self.splits['train'])
+
+        self.assertEqual(len(self.datasource.trainset), len(trainset))
+        self.assertEqual(['a', 'b', 'c'], trainset.classes)
+        for index in range(len(trainset)):
+            example, target = trainset[index]
+            expected_example, expected_target = self.datasource.trainset[index]
+            self.assertTrue(torch.equal(expected_example, example))
+            self.assertEqual(expected_target, target)
+
+    def test_fingerprint(self):
+        """The array files of data sources are told apart by their code, defining their
+        transforms, and by the data configuration."""
+        __ = Config()
+        data = Config().data
+        fingerprint = shared.fingerprint(mnist.DataSource)
+
+        self.assertEqual(fingerprint, shared.fingerprint(mnist.DataSource))
+        self.assertNotEqual(fingerprint, shared.fingerprint(cifar10.DataSource))
+
+        Config().data = data._replace(data_path='/elsewhere')
+        try:
+            self.assertNotEqual(fingerprint,
+                                shared.fingerprint(mnist.DataSource))
+        finally:
+            Config().data = data
+
+    def test_pickling(self):
+        """The mapped examples are not copied when the dataset is pickled."""
+        trainset = shared.SharedDataset(os.path.join(self.path, 'train'),
+                                        **self.splits['train'])
+        trainset[0]
+        self.assertIsInstance(trainset.examples, np.memmap)
+
+        received = pickle.loads(pickle.dumps(trainset))
+        self.assertIsNone(received.examples)
+        self.assertTrue(torch.equal(trainset[3][0], received[3][0]))
+
+    def shared_trainset(self, transform):
+        """Returns the shared train set with a different transform."""
+        splits = dict(self.splits['train'], transform=transform)
+        return shared.SharedDataset(os.path.join(self.path, 'train'), **splits)
+
+    def test_batched_transforms(self):
+        """Batches are transformed as their examples are, one by one."""
+        trainset = self.shared_trainset(
+            transforms.Compose([
+                transforms.CenterCrop(6),
+                transforms.ToTensor(),
+                transforms.Normalize([0.5, 0.4, 0.3], [0.2, 0.3, 0.4])
+            ]))
+        self.assertIsNotNone(trainset.batch_transform)
+
+        batch = trainset.__getitems__([3, 0, 7])
+        for (example, target), index in zip(batch, [3, 0, 7]):
+            expected_example, expected_target = trainset[index]
+            self.assertTrue(torch.allclose(expected_example, example,
+                                           atol=1e-6))
+            self.assertEqual(expected_target, target)
+
+    def test_batched_augmentation(self):
+        """Each example of a batch is cropped and flipped on its own."""
+        trainset = self.shared_trainset(
+            transforms.Compose([
+                transforms.RandomHorizontalFlip(),
+                transforms.RandomCrop(8, 2),
+                transforms.ToTensor()
+            ]))
+
+        batch = trainset.__getitems__(list(range(20)))
+
+        # Every augmented example is a crop of its padded image, flipped or not
+        padded = F.pad(torch.from_numpy(np.array(trainset.examples)).permute(
+            0, 3, 1, 2).float() / 255, [2, 2, 2, 2])
+        for index, (example, __) in enumerate(batch):
+            self.assertEqual((3, 8, 8), tuple(example.shape))
+            candidates = [
+                image[:, top:top + 8, left:left + 8]
+                for image in [padded[index], padded[index].flip(-1)]
+                for top in range(5) for left in range(5)
+            ]
+            self.assertTrue(
+                any(torch.equal(example, candidate)
+                    for candidate in candidates))
+
+    def test_unbatched_transforms(self):
+        """Transforms that cannot be batched are applied to each example."""
+        trainset = self.shared_trainset(
+            transforms.Compose(
+                [transforms.RandomResizedCrop(4),
+                 transforms.ToTensor()]))
+        self.assertIsNone(trainset.batch_transform)
+
+        batch = trainset.__getitems__([1, 2])
+        self.assertEqual((3, 4, 4), tuple(batch[0][0].shape))
+
+
+if __name__ == '__main__':
+    unittest.main()
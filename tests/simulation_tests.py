@@ -0,0 +1,55 @@
+"""
+Unit tests for simulating virtual clients within the server process.
+"""
+import asyncio
+import unittest
+from unittest import mock
+
+import torch
+
+from plato.clients import simple
+from plato.config import Config
+from plato.servers import fedavg as fedavg_server
+
+
+class FailedClientTest(unittest.TestCase):
+    """Tests for virtual clients whose training fails."""
+    def setUp(self):
+        super().setUp()
+        __ = Config()
+
+    def test_failure_raised(self):
+        """A virtual client, without a connection to disconnect, raises its failure."""
+        trainer = mock.Mock()
+        trainer.train.side_effect = ValueError("Training on client #1 failed.")
+        client = simple.Client(trainer=trainer)
+        client.client_id = 1
+
+        with self.assertRaisesRegex(ValueError, 'client #1'):
+            asyncio.run(client.train())
+
+    def test_failed_client_removed(self):
+        """The server removes a virtual client that failed, and closes the round with
+        the reports of the other clients."""
+        server = fedavg_server.Server(model=torch.nn.Linear(1, 1))
+        server.clients = {
+            client_id: {
+                'sid': f'virtual-{client_id}'
+            }
+            for client_id in (1, 2)
+        }
+        server.selected_clients = [1, 2]
+        server.updates = [(simple.Report(1, 0, 0, 0), None)]
+        server.client_pool = mock.Mock()
+        server.client_pool.train = mock.AsyncMock(side_effect=ValueError)
+
+        with mock.patch.object(server, 'close_round') as close_round:
+            asyncio.run(server.simulate_client({'id': 2}, None))
+
+        self.assertEqual([1], list(server.clients))
+        self.assertEqual([1], server.selected_clients)
+        close_round.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Unit tests for streaming encoded payloads as acknowledged chunks.
+"""
+import asyncio
+import random
+import unittest
+
+import torch
+
+from plato.utils import serialization, streaming
+
+
+class StreamingTest(unittest.TestCase):
+    """Tests for sending chunks within a window and reassembling them."""
+    def setUp(self):
+        super().setUp()
+        self.payload = {'weight': torch.randn(1000), 'round': 3}
+        self.encoded = serialization.dumps(self.payload)
+
+    def test_reassembly(self):
+        """A payload is reassembled from chunks received in any order."""
+        chunks = []
+        offset = 0
+        for chunk in serialization.chunks(self.encoded, 256):
+            chunks.append((chunk, offset))
+            offset += len(chunk)
+        random.Random(1).shuffle(chunks)
+
+        reassembler = streaming.Reassembler()
+        for chunk, offset in chunks:
+            self.assertFalse(reassembler.complete())
+            reassembler.add(chunk, offset, serialization.nbytes(self.encoded))
+        self.assertTrue(reassembler.complete())
+
+        received = serialization.loads(reassembler.payload())
+        self.assertTrue(torch.equal(self.payload['weight'], received['weight']))
+        self.assertEqual(3, received['round'])
+        self.assertFalse(reassembler.complete())
+
+    def test_window(self):
+        """No more than a window of chunks is in flight, and sending completes only
+        once every chunk has been acknowledged."""
+        reassembler = streaming.Reassembler()
+        pending = []
+        in_flight = []
+
+        async def emit(event, data, callback):
+            self.assertEqual('chunk', event)
+            reassembler.add(data['data'], data['offset'], data['size'])
+            pending.append(callback)
+            in_flight.append(len(pending))
+
+        async def acknowledge(sending):
+            while not sending.done():
+                if pending:
+                    pending.pop(0)()
+                await asyncio.sleep(0)
+
+        async def transfer():
+            sending = asyncio.ensure_future(
+                streaming.send_chunks(emit,
+                                      self.encoded,
+                                      chunk_size=256,
+                                      window=3))
+            await acknowledge(sending)
+            await sending
+
+        asyncio.run(transfer())
+
+        self.assertEqual(3, max(in_flight))
+        self.assertEqual([], pending)
+        self.assertTrue(reassembler.complete())
+
+    def test_timeout(self):
+        """Sending fails if the receiver stops acknowledging chunks."""
+        async def emit(event, data, callback):
+            pass
+
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(
+                streaming.send_chunks(emit,
+                                      self.encoded,
+                                      chunk_size=256,
+                                      window=2,
+                                      timeout=0.01))
+
+
+if __name__ == '__main__':
+    unittest.main()
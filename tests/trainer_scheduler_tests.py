@@ -0,0 +1,178 @@
+"""
+Unit tests for the scheduler limiting the number of concurrently running trainers.
+"""
+import os
+import queue
+import threading
+import time
+import unittest
+from multiprocessing.connection import Client, wait
+from unittest import mock
+
+import torch
+
+from plato.config import Config
+from plato.trainers import worker
+from plato.utils import trainer_scheduler
+from plato.utils.trainer_scheduler import TokenClient, TokenServer
+
+
+class ScalingTrainer:
+    """A trainer scaling its weights by the sum of a dataset."""
+    def __init__(self):
+        self.model = torch.nn.Linear(2, 1, bias=False)
+        torch.nn.init.ones_(self.model.weight)
+
+    def scale(self, config, dataset, factor):
+        """Scales the weights, and returns the ID of the process that scaled them."""
+        with torch.no_grad():
+            self.model.weight.mul_(sum(dataset) * factor * config['sign'])
+        return os.getpid()
+
+
+class KeyedDataset(list):
+    """A dataset which can be given a key."""
+
+
+class TrainerSchedulerTest(unittest.TestCase):
+    """Tests for granting training slots through the token server."""
+    def setUp(self):
+        super().setUp()
+        self.server = TokenServer(['first', 'second'])
+        self.server.start()
+
+    def requests(self):
+        """Returns the number of tokens requested from the token server."""
+        return len(self.server.waiting) + sum(
+            len(tokens) for tokens in self.server.holders.values())
+
+    def connect(self, count):
+        """Connects trainers to the token server one after another, each requesting a
+        token once the previous request has been registered."""
+        connections = []
+        for __ in range(count):
+            requests = self.requests()
+            connection = Client(self.server.address, family='AF_UNIX')
+            connection.send('acquire')
+            while self.requests() == requests:
+                time.sleep(0.001)
+            connections.append(connection)
+        return connections
+
+    @staticmethod
+    def granted(connections, timeout=0.5):
+        """Returns the tokens granted to the connections, or None for the connections
+        that have not been granted one."""
+        ready = wait(connections, timeout=timeout)
+        return [
+            connection.recv() if connection in ready else None
+            for connection in connections
+        ]
+
+    def test_max_concurrency(self):
+        """Tokens are granted up to the limit, and in order as soon as one is returned."""
+        trainers = self.connect(4)
+
+        self.assertEqual(['first', 'second', None, None],
+                         self.granted(trainers))
+
+        trainers[0].send(('release', 'second'))
+        trainers[1].send(('release', 'second'))
+        self.assertEqual(['second', None], self.granted(trainers[2:]))
+
+        trainers[0].send(('release', 'first'))
+        self.assertEqual(['first'], self.granted(trainers[3:]))
+
+    def test_disconnection(self):
+        """The tokens held by a trainer are returned when it disconnects."""
+        trainers = self.connect(3)
+        self.assertEqual(['first', 'second', None], self.granted(trainers))
+
+        trainers[0].close()
+        self.assertEqual(['first'], self.granted(trainers[2:]))
+
+    def test_threads(self):
+        """The trainers in different threads of a process wait for their own tokens."""
+        granted = queue.Queue()
+        done = threading.Event()
+
+        def train():
+            token = TokenClient.acquire()
+            granted.put(token)
+            done.wait()
+            TokenClient.release(token)
+
+        for __ in range(3):
+            threading.Thread(target=train, daemon=True).start()
+
+        tokens = {granted.get(timeout=5), granted.get(timeout=5)}
+        self.assertEqual({'first', 'second'}, tokens)
+        with self.assertRaises(queue.Empty):
+            granted.get(timeout=0.5)
+
+        done.set()
+        self.assertIn(granted.get(timeout=5), tokens)
+
+
+class WorkerPoolTest(unittest.TestCase):
+    """Tests for running the loops of trainers in the worker processes of a machine."""
+    def setUp(self):
+        super().setUp()
+        __ = Config()
+        Config().trainer = Config().trainer._replace(max_concurrency=1)
+        self.pool = worker.Pool(1)
+        self.pool.start()
+
+    def test_run(self):
+        """The weights are updated in shared memory by a worker process, which keeps
+        the datasets it was sent and reports failures."""
+        address = self.pool.addresses[0]
+        trainer = ScalingTrainer()
+        dataset = [1, 2]
+
+        pid = worker.run(address, 'scale', trainer, {'sign': 1}, dataset, 2)
+        self.assertEqual(self.pool.processes[0].pid, pid)
+        self.assertEqual([[6.0, 6.0]], trainer.model.weight.tolist())
+
+        dataset.append(3)
+        worker.run(address, 'scale', trainer, {'sign': -1}, dataset, 1)
+        self.assertEqual([[-18.0, -18.0]], trainer.model.weight.tolist())
+
+        with self.assertRaises(RuntimeError):
+            worker.run(address, 'scale', trainer, {'sign': 1}, dataset, None)
+
+    def test_dataset_keys(self):
+        """A worker process keeps a single copy of the datasets given the same key, such
+        as by different clients, and only the last datasets_kept datasets."""
+        address = self.pool.addresses[0]
+        trainer = ScalingTrainer()
+        first, second = KeyedDataset([1, 2]), KeyedDataset([3, 4])
+        worker.set_dataset_key(first, 'dataset')
+        worker.set_dataset_key(second, 'dataset')
+
+        worker.run(address, 'scale', trainer, {'sign': 1}, first, 1)
+        worker.run(address, 'scale', trainer, {'sign': 1}, second, 1)
+        self.assertEqual([[9.0, 9.0]], trainer.model.weight.tolist())
+
+        for __ in range(worker.DATASETS_KEPT):
+            worker.run(address, 'scale', trainer, {'sign': 1}, [1], 1)
+        worker.run(address, 'scale', trainer, {'sign': 1}, second, 1)
+        self.assertEqual([[63.0, 63.0]], trainer.model.weight.tolist())
+
+    def test_without_server(self):
+        """Trainers started without a server start a scheduler and worker processes
+        in their own process."""
+        tokens = []
+
+        with mock.patch.dict(os.environ):
+            os.environ.pop(trainer_scheduler.ADDRESS_VARIABLE, None)
+            thread = threading.Thread(
+                target=lambda: tokens.append(TokenClient.acquire()))
+            thread.start()
+            thread.join()
+
+        self.assertEqual(TokenClient.token_server.pool.addresses, tokens)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+"""
+Unit tests for compressing client updates with error feedback, and aggregating them.
+"""
+import unittest
+from collections import OrderedDict
+
+import torch
+
+from plato.utils import update_compression
+from plato.utils.flat_weights import LowRankUpdate, SparseUpdate, WeightsLayout
+
+
+class TopKTest(unittest.TestCase):
+    """Tests for sparsifying updates to their largest values."""
+    def setUp(self):
+        super().setUp()
+        torch.manual_seed(1)
+        self.baseline = OrderedDict([
+            ('fc.weight', torch.randn(20, 50)),
+            ('fc.bias', torch.randn(20)),
+            ('bn.num_batches_tracked', torch.tensor(3)),
+        ])
+        self.layout = WeightsLayout(self.baseline)
+
+    def trained(self):
+        """Returns weights trained from the baseline."""
+        weights = OrderedDict(
+            (name, weight + torch.randn(weight.shape).to(weight.dtype))
+            for name, weight in self.baseline.items())
+        weights['bn.num_batches_tracked'] = torch.tensor(5)
+        return weights
+
+    def test_sparsification(self):
+        """The largest values of each tensor are sent, and integer tensors in full."""
+        compressor = update_compression.TopK(0.1)
+        weights = self.trained()
+        update = compressor.compress(1, weights, self.baseline)
+
+        self.assertIsInstance(update, SparseUpdate)
+        self.assertEqual(100, len(update.indices['fc.weight']))
+        self.assertEqual(2, len(update.indices['fc.bias']))
+
+        delta = (weights['fc.weight'] - self.baseline['fc.weight']).flatten()
+        threshold = delta.abs().topk(100).values.min()
+        self.assertTrue(
+            torch.all(update.values['fc.weight'].abs() >= threshold))
+        self.assertEqual(2, int(update.values['bn.num_batches_tracked']))
+
+    def test_error_feedback(self):
+        """Over two rounds, the values sent and the residual add up to the updates."""
+        compressor = update_compression.TopK(0.1)
+        sent = torch.zeros(self.layout.size)
+        total = torch.zeros(self.layout.size)
+
+        for __ in range(2):
+            weights = self.trained()
+            update = compressor.compress(1, weights, self.baseline)
+            self.layout.scatter_add(update, sent)
+            total += self.layout.flatten(weights) - self.layout.flatten(
+                self.baseline)
+
+        residual = compressor.error_feedback.residuals[1]
+        for name, segment in self.layout.slices.items():
+            if name in residual:
+                self.assertTrue(
+                    torch.allclose(total[segment],
+                                   sent[segment] + residual[name].flatten(),
+                                   atol=1e-5))
+        self.assertNotIn(2, compressor.error_feedback.residuals)
+
+    def test_aggregation(self):
+        """Sparse updates are aggregated as their dense equivalents are."""
+        compressor = update_compression.TopK(0.2)
+        updates = [
+            compressor.compress(client_id, self.trained(), self.baseline)
+            for client_id in range(3)
+        ]
+        coefficients = [0.5, 0.3, 0.2]
+
+        aggregated = torch.zeros(self.layout.size)
+        for update, coefficient in zip(updates, coefficients):
+            self.layout.scatter_add(update, aggregated, coefficient)
+
+        dense = self.layout.stack(updates)
+        self.assertTrue(
+            torch.allclose(torch.tensor(coefficients) @ dense, aggregated))
+
+
+class PowerSGDTest(unittest.TestCase):
+    """Tests for approximating updates with low-rank factors."""
+    def setUp(self):
+        super().setUp()
+        torch.manual_seed(1)
+        self.baseline = OrderedDict([
+            ('conv.weight', torch.randn(16, 3, 3, 3)),
+            ('conv.bias', torch.randn(16)),
+            ('fc.weight', torch.randn(20, 50)),
+            ('bn.num_batches_tracked', torch.tensor(3)),
+        ])
+        self.layout = WeightsLayout(self.baseline)
+
+    def trained(self, rank=None):
+        """Returns weights trained from the baseline, with updates of the given rank."""
+        weights = OrderedDict()
+        for name, weight in self.baseline.items():
+            if not weight.is_floating_point():
+                weights[name] = weight + 2
+            elif rank is not None and weight.dim() >= 2:
+                rows = weight.shape[0]
+                columns = weight.numel() // rows
+                delta = torch.randn(rows, rank) @ torch.randn(rank, columns)
+                weights[name] = weight + delta.reshape(weight.shape)
+            else:
+                weights[name] = weight + torch.randn(weight.shape)
+        return weights
+
+    def test_factorization(self):
+        """Matrices are sent as factors, which are exact for updates of a lower rank,
+        and other tensors as they are."""
+        compressor = update_compression.PowerSGD(4)
+        weights = self.trained(rank=2)
+        update = compressor.compress(1, weights, self.baseline)
+
+        self.assertIsInstance(update, LowRankUpdate)
+        p_factor, q_factor = update.factors['fc.weight']
+        self.assertEqual((20, 4), tuple(p_factor.shape))
+        self.assertEqual((50, 4), tuple(q_factor.shape))
+        self.assertEqual((27, 4), tuple(update.factors['conv.weight'][1].shape))
+        self.assertEqual(['conv.bias', 'bn.num_batches_tracked'],
+                         list(update.values))
+
+        delta = self.layout.flatten(weights) - self.layout.flatten(
+            self.baseline)
+        self.assertTrue(
+            torch.allclose(delta, self.layout.flatten(update), atol=1e-4))
+
+    def test_warm_start(self):
+        """Starting from the previous factors, the approximation of a full-rank update
+        improves when it is sent again."""
+        compressor = update_compression.PowerSGD(2)
+        weights = self.trained()
+        delta = weights['fc.weight'] - self.baseline['fc.weight']
+
+        errors = []
+        for __ in range(3):
+            compressor.error_feedback.residuals.clear()
+            update = compressor.compress(1, weights, self.baseline)
+            p_factor, q_factor = update.factors['fc.weight']
+            errors.append((delta - p_factor @ q_factor.t()).norm())
+
+        self.assertLess(errors[-1], errors[0])
+
+    def test_aggregation(self):
+        """Low-rank updates are aggregated as their dense equivalents are, and as the
+        updates themselves, plus the residuals kept by the clients."""
+        compressor = update_compression.PowerSGD(3)
+        weights = [self.trained() for __ in range(3)]
+        updates = [
+            compressor.compress(client_id, weights[client_id], self.baseline)
+            for client_id in range(3)
+        ]
+        coefficients = [0.5, 0.3, 0.2]
+
+        aggregated = self.layout.add_low_rank(updates, coefficients,
+                                              torch.zeros(self.layout.size))
+        dense = self.layout.stack(updates)
+        self.assertTrue(
+            torch.allclose(torch.tensor(coefficients) @ dense,
+                           aggregated,
+                           atol=1e-5))
+
+        for client_id, update in enumerate(updates):
+            residual = compressor.error_feedback.residuals[client_id]
+            for name in update.factors:
+                segment = self.layout.slices[name]
+                total = (weights[client_id][name] -
+                         self.baseline[name]).flatten()
+                self.assertTrue(
+                    torch.allclose(total,
+                                   dense[client_id][segment] +
+                                   residual[name].flatten(),
+                                   atol=1e-5))
+
+    def test_error_feedback(self):
+        """Over several rounds, the updates sent plus the residual kept add up to the
+        updates trained, for convolutional weights as well as matrices."""
+        compressor = update_compression.PowerSGD(2)
+        trained = torch.zeros(self.layout.size)
+        sent = torch.zeros(self.layout.size)
+
+        for __ in range(3):
+            weights = self.trained()
+            update = compressor.compress(1, weights, self.baseline)
+            self.assertEqual(['conv.weight', 'fc.weight'], list(update.factors))
+
+            trained += self.layout.flatten(weights) - self.layout.flatten(
+                self.baseline)
+            sent += self.layout.flatten(update)
+
+        residual = compressor.error_feedback.residuals[1]
+        for name in ('conv.weight', 'fc.weight'):
+            self.assertEqual(self.baseline[name].shape, residual[name].shape)
+            segment = self.layout.slices[name]
+            self.assertTrue(
+                torch.allclose(trained[segment],
+                               sent[segment] + residual[name].flatten(),
+                               atol=1e-4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Unit tests for encoding model weights as deltas against earlier versions.
+"""
+import unittest
+
+import torch
+
+from plato.utils import serialization, weight_deltas
+
+
+class WeightDeltasTest(unittest.TestCase):
+    """Tests for encoding and decoding deltas between versions of model weights."""
+    def setUp(self):
+        super().setUp()
+        torch.manual_seed(1)
+        model = torch.nn.Sequential(torch.nn.Linear(256, 64),
+                                    torch.nn.BatchNorm1d(64),
+                                    torch.nn.Linear(64, 10))
+        self.base = {
+            name: weight.clone()
+            for name, weight in model.state_dict().items()
+        }
+        self.weights = {
+            name: weight.clone()
+            for name, weight in model.state_dict().items()
+        }
+        self.weights['0.weight'] += 1e-4 * torch.randn(64, 256)
+        self.weights['1.num_batches_tracked'] += 1
+
+    def test_round_trip(self):
+        """The weights are decoded exactly, and unchanged weights are left out."""
+        self.assertTrue(weight_deltas.is_encodable(self.weights))
+        self.assertTrue(weight_deltas.matches(self.weights, self.base))
+
+        delta = weight_deltas.encode(self.weights, self.base)
+        self.assertEqual({'0.weight', '1.num_batches_tracked'}, set(delta))
+
+        decoded = weight_deltas.decode(delta, self.base)
+        self.assertEqual(list(self.weights), list(decoded))
+        for name, weight in self.weights.items():
+            self.assertEqual(weight.dtype, decoded[name].dtype)
+            self.assertTrue(torch.equal(weight, decoded[name]))
+
+    def test_compression(self):
+        """A delta for small changes is smaller than the weights."""
+        delta = weight_deltas.encode(self.weights, self.base)
+        self.assertLess(
+            serialization.nbytes(serialization.dumps(delta)),
+            serialization.nbytes(serialization.dumps(self.weights)))
+
+
+if __name__ == '__main__':
+    unittest.main()